@@ -0,0 +1,134 @@
+"""
+Compares the single pass split of a tessellated shape into face and edge meshes
+against the previous approach of running two vtkExtractCellsByType filters.
+
+Example:
+    python benchmarks/bench_split.py --tolerance 1e-4 --repeat 5
+"""
+
+import time
+import argparse
+
+from vtkmodules.vtkFiltersExtraction import vtkExtractCellsByType
+from vtkmodules.vtkCommonDataModel import VTK_TRIANGLE, VTK_LINE, VTK_VERTEX
+
+import cadquery as cq
+
+from cq_repl.tessellation import split_faces_and_edges
+
+
+def extract_faces_and_edges(data):
+    """
+    The previous split, which copies the points into both meshes.
+    """
+
+    extr = vtkExtractCellsByType()
+    extr.SetInputDataObject(data)
+    extr.AddCellType(VTK_LINE)
+    extr.AddCellType(VTK_VERTEX)
+    extr.Update()
+    data_edges = extr.GetOutput()
+
+    extr = vtkExtractCellsByType()
+    extr.SetInputDataObject(data)
+    extr.AddCellType(VTK_TRIANGLE)
+    extr.Update()
+    data_faces = extr.GetOutput()
+
+    data_edges.GetPointData().RemoveArray("Normals")
+
+    return data_faces, data_edges
+
+
+def make_shape(holes):
+    """
+    Builds a plate with a grid of filleted holes, which has plenty of curved faces and edges.
+    """
+
+    return (
+        cq.Workplane()
+        .box(10 * holes, 10 * holes, 5)
+        .faces(">Z")
+        .workplane()
+        .rarray(10, 10, holes, holes)
+        .hole(4)
+        .edges()
+        .fillet(0.5)
+        .val()
+    )
+
+
+def measure(split, data, repeat):
+    """
+    Returns the fastest time and the memory used by the meshes from a split function.
+    """
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data_faces, data_edges = split(data)
+        elapsed = time.perf_counter() - start
+
+        best = elapsed if best is None else min(best, elapsed)
+
+    # Shared arrays are counted once
+    arrays = {}
+    for mesh in (data_faces, data_edges):
+        for array in [mesh.GetPoints().GetData()] + [
+            mesh.GetPointData().GetArray(i)
+            for i in range(mesh.GetPointData().GetNumberOfArrays())
+        ]:
+            arrays[
+                array.GetAddressAsString("vtkDataArray")
+            ] = array.GetActualMemorySize()
+
+        for cells in (mesh.GetVerts(), mesh.GetLines(), mesh.GetPolys()):
+            for array in (cells.GetOffsetsArray(), cells.GetConnectivityArray()):
+                arrays[
+                    array.GetAddressAsString("vtkDataArray")
+                ] = array.GetActualMemorySize()
+
+    return best, sum(arrays.values()), data_faces, data_edges
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks splitting a tessellated shape into face and edge meshes."
+    )
+    parser.add_argument(
+        "--holes",
+        type=int,
+        default=10,
+        help="Number of holes along each side of the plate.",
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=1e-4, help="Linear tessellation tolerance."
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Number of times to run each split."
+    )
+    args = parser.parse_args()
+
+    data = make_shape(args.holes).toVtkPolyData(args.tolerance, 0.1)
+
+    print(f"Points: {data.GetNumberOfPoints()}, cells: {data.GetNumberOfCells()}")
+
+    for name, split in (
+        ("vtkExtractCellsByType", extract_faces_and_edges),
+        ("single pass", split_faces_and_edges),
+    ):
+        seconds, kib, data_faces, data_edges = measure(split, data, args.repeat)
+
+        print(f"{name}:")
+        print(f"  time => {seconds * 1000:.2f} ms")
+        print(f"  memory => {kib / 1024:.1f} MB")
+        print(
+            f"  faces => {data_faces.GetNumberOfPolys()} triangles, {data_faces.GetNumberOfPoints()} points"
+        )
+        print(
+            f"  edges => {data_edges.GetNumberOfCells()} cells, {data_edges.GetNumberOfPoints()} points"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Runs a set of scripts through cq-repl in headless mode and collects the time
+spent in each stage into a single JSON report.
+
+Example:
+    python benchmarks/run_benchmarks.py --parts 10 50 200 --output results.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+# Scripts from the examples directory that are always benchmarked
+example_scripts = ["box.py", "assy.py"]
+
+# Template for generated assemblies, with a mix of unique and repeated parts. It
+# only uses constructs that the REPL's line buffering understands.
+assembly_template = """import cadquery as cq
+
+def make_part(i):
+    return cq.Workplane().cylinder(10 + (i % {unique}), 4).faces(">Z").workplane().hole(2).edges().fillet(0.5)
+
+def place_part(i):
+    return cq.Location(((i % 20) * 25, (i // 20) * 25, 0))
+
+assy = cq.Assembly()
+parts = [assy.add(make_part(i), name=f"part{{i}}", loc=place_part(i)) for i in range({parts})]
+
+show_object(assy)
+
+assy.objects["part0"].loc = cq.Location((0, 0, 30))
+assy.objects["part0"].color = cq.Color(0, 1.0, 0, 1.0)
+"""
+
+
+def generate_assembly(directory, parts, unique):
+    """
+    Writes a script that builds an assembly with the given number of parts.
+    """
+
+    path = os.path.join(directory, f"assy_{parts}_parts.py")
+
+    with open(path, "w") as script:
+        script.write(assembly_template.format(parts=parts, unique=unique))
+
+    return path
+
+
+def run_script(path, extra_args):
+    """
+    Runs a script through cq-repl in a fresh process and returns its timings.
+    """
+
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as timings_file:
+        timings_path = timings_file.name
+
+    try:
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "cq_repl.main",
+                "--headless",
+                path,
+                "--timings",
+                timings_path,
+            ]
+            + extra_args,
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+
+        with open(timings_path) as timings_file:
+            results = json.load(timings_file)
+    finally:
+        os.remove(timings_path)
+
+    # Add up the stages so that regressions are easy to spot
+    totals = {}
+    for statement in results["statements"]:
+        for stage, seconds in statement["stages"].items():
+            totals[stage] = totals.get(stage, 0.0) + seconds
+    results["stage_totals"] = totals
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks cq-repl by running scripts in headless mode."
+    )
+    parser.add_argument(
+        "--parts",
+        type=int,
+        nargs="*",
+        default=[10, 50, 200],
+        help="Sizes of the generated assemblies.",
+    )
+    parser.add_argument(
+        "--unique",
+        type=int,
+        default=5,
+        help="Number of unique part shapes in the generated assemblies.",
+    )
+    parser.add_argument(
+        "--output", default="benchmark_results.json", help="Path of the JSON report."
+    )
+    parser.add_argument(
+        "repl_args",
+        nargs=argparse.REMAINDER,
+        help="Extra options passed on to cq-repl, after a --",
+    )
+    args = parser.parse_args()
+
+    # Caching between runs would hide the cost of tessellation
+    repl_args = ["--no-disk-cache"] + [arg for arg in args.repl_args if arg != "--"]
+
+    examples_dir = os.path.join(os.path.dirname(__file__), os.pardir, "examples")
+
+    report = {"repl_args": repl_args, "runs": []}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        scripts = [os.path.join(examples_dir, name) for name in example_scripts]
+        scripts += [
+            generate_assembly(temp_dir, parts, args.unique) for parts in args.parts
+        ]
+
+        for script in scripts:
+            print(f"Running {os.path.basename(script)}...", flush=True)
+
+            results = run_script(script, repl_args)
+            results["name"] = os.path.basename(script)
+            report["runs"].append(results)
+
+            print(f"  total => {results['total']:.3f} s")
+            for stage, seconds in sorted(results["stage_totals"].items()):
+                print(f"  {stage} => {seconds:.3f} s")
+
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import copy
+from collections import deque
+
+# Stands in for a name that was not defined when the checkpoint was taken
+_missing = object()
+
+
+def copy_value(value):
+    """
+    Copies an object that a statement is about to change in place, sharing as
+    much as possible with the original. Assemblies get a new tree of nodes that
+    refers to the same shapes, and containers are copied one level deep.
+    Objects that cannot be copied are kept as they are.
+    """
+
+    import cadquery as cq
+
+    if isinstance(value, cq.Assembly):
+        copied = value._copy()
+        copied.constraints = list(value.constraints)
+
+        return copied
+
+    if isinstance(value, cq.Workplane):
+        copied = copy.copy(value)
+        copied.objects = list(value.objects)
+
+        return copied
+
+    try:
+        return copy.copy(value)
+    except Exception:
+        return value
+
+
+class checkpointRing:
+    """
+    Keeps what is needed to undo the last few statements. Before a statement
+    runs, the values of the names it assigns are kept by reference, and the
+    objects it changes in place are copied. The 3D view is kept as a copy of
+    the dictionaries that describe each object, which share their meshes and
+    actors with the view. The oldest checkpoints are dropped once there are
+    more than max_checkpoints of them.
+    """
+
+    def __init__(self, max_checkpoints=0):
+        self.max_checkpoints = max_checkpoints
+        self.checkpoints = deque()
+
+    @property
+    def enabled(self):
+        """
+        Whether checkpoints are being taken.
+        """
+
+        return self.max_checkpoints > 0
+
+    def save(self, view, records):
+        """
+        Starts a new checkpoint with the current 3D view and the statements known
+        to the dependency graph. The names are added by keep.
+        """
+
+        if not self.enabled:
+            return
+
+        self.checkpoints.append(
+            {
+                "values": {},
+                "view": {name: dict(object) for name, object in view.items()},
+                "records": list(records),
+            }
+        )
+
+        while len(self.checkpoints) > self.max_checkpoints:
+            self.checkpoints.popleft()
+
+    def keep(self, namespace, assigned, mutated):
+        """
+        Adds the values of names that are about to change to the latest
+        checkpoint. Names that it already holds keep their older value, so
+        statements that are run again as part of the same update can be undone
+        along with the statement that caused them to run.
+        """
+
+        if not self.checkpoints:
+            return
+
+        values = self.checkpoints[-1]["values"]
+
+        for name in assigned | mutated:
+            if name in values:
+                continue
+
+            value = namespace.get(name, _missing)
+            if name in mutated and value is not _missing:
+                value = copy_value(value)
+
+            values[name] = value
+
+    def restore(self, namespace, count):
+        """
+        Puts the names back the way they were before the last count checkpoints
+        were taken, and returns the oldest of those checkpoints so that the view
+        and the dependency graph can be restored from it. Returns None if there
+        are no checkpoints left.
+        """
+
+        restored = None
+
+        for _ in range(min(count, len(self.checkpoints))):
+            restored = self.checkpoints.pop()
+
+            for name, value in restored["values"].items():
+                if value is _missing:
+                    namespace.pop(name, None)
+                else:
+                    namespace[name] = value
+
+        return restored
+
+    def clear(self):
+        """
+        Forgets all of the checkpoints.
+        """
+
+        self.checkpoints.clear()
+
+    def __len__(self):
+        return len(self.checkpoints)
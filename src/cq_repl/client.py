@@ -0,0 +1,81 @@
+import sys
+import json
+import socket
+import argparse
+
+from cq_repl.server import default_address, parse_address, send_message, receive_message
+
+
+def connect(address):
+    """
+    Opens a connection to a running REPL.
+    """
+
+    address = parse_address(address)
+
+    if isinstance(address, tuple):
+        return socket.create_connection(address)
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(address)
+
+    return connection
+
+
+def send_request(connection, stream, request):
+    """
+    Sends a request to the REPL and waits for the reply, which is read from a file made from the connection.
+    """
+
+    send_message(connection, request)
+
+    return receive_message(stream)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sends code to a cq-repl that was started with --server, and prints the results."
+    )
+    parser.add_argument(
+        "files",
+        nargs="*",
+        help="Python files to run in the REPL. The code is read from stdin if no files are given.",
+    )
+    parser.add_argument(
+        "--server",
+        default=default_address(),
+        help="Unix socket path, port or host:port that the REPL is listening on.",
+    )
+    parser.add_argument(
+        "--command", help="Runs a REPL command like clear or stats instead of code."
+    )
+    args = parser.parse_args()
+
+    if args.command is not None:
+        requests = [{"id": args.command, "command": args.command}]
+    elif args.files:
+        requests = []
+        for path in args.files:
+            with open(path) as code_file:
+                requests.append({"id": path, "code": code_file.read()})
+    else:
+        requests = [{"id": "<stdin>", "code": sys.stdin.read()}]
+
+    ok = True
+    with connect(args.server) as connection, connection.makefile("rb") as stream:
+        for request in requests:
+            reply = send_request(connection, stream, request)
+
+            if reply is None:
+                print("The REPL closed the connection", file=sys.stderr)
+                sys.exit(1)
+
+            print(json.dumps(reply, indent=2))
+
+            ok = ok and reply["ok"]
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
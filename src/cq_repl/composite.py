@@ -0,0 +1,249 @@
+from math import degrees
+
+from vtkmodules.vtkCommonDataModel import vtkMultiBlockDataSet, vtkPolyData
+from vtkmodules.vtkCommonTransforms import vtkTransform
+from vtkmodules.vtkFiltersGeneral import vtkTransformPolyDataFilter
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkCompositeDataDisplayAttributes,
+    vtkCompositePolyDataMapper,
+)
+
+# Before VTK 9.3, only the OpenGL version of the mapper supports per-block attributes
+if not hasattr(vtkCompositePolyDataMapper, "SetCompositeDataDisplayAttributes"):
+    from vtkmodules.vtkRenderingOpenGL2 import (
+        vtkCompositePolyDataMapper2 as vtkCompositePolyDataMapper,
+    )
+
+# Edges are drawn the same way for every object
+edge_color = (0.7, 0.7, 0.7)
+
+
+def place_mesh(data, translation, rotation):
+    """
+    Moves a copy of a mesh into place, the same way that an actor with the
+    translation as its position and the rotation as its orientation would.
+    """
+
+    # Each block needs its own data object, since the display attributes are looked up by it
+    if not any(translation) and not any(rotation):
+        placed = vtkPolyData()
+        placed.ShallowCopy(data)
+
+        return placed
+
+    # Actors are rotated about Z, then X, then Y
+    transform = vtkTransform()
+    transform.Translate(*translation)
+    transform.RotateZ(degrees(rotation[2]))
+    transform.RotateX(degrees(rotation[0]))
+    transform.RotateY(degrees(rotation[1]))
+
+    transform_filter = vtkTransformPolyDataFilter()
+    transform_filter.SetInputData(data)
+    transform_filter.SetTransform(transform)
+    transform_filter.Update()
+
+    placed = vtkPolyData()
+    placed.ShallowCopy(transform_filter.GetOutput())
+
+    return placed
+
+
+class compositeScene:
+    """
+    Draws all of the displayed objects with one actor for the faces and one for
+    the edges, instead of two actors per object. Each object is a block in a
+    multiblock dataset, and its color and opacity are set per block. Placement
+    is applied to the block's copy of the mesh, so only the blocks of the
+    objects that changed are moved or replaced. A third dataset holds the
+    simplified meshes that are drawn while the camera is moving.
+    """
+
+    def __init__(self):
+        # Block index of each object, and the indexes left over from removed objects
+        self.blocks = {}
+        self.free = []
+
+        # What each block was built from, so unchanged blocks are not built again
+        self.built = {}
+
+        # Objects that have changed since the scene was last brought up to date
+        self.stale = set()
+
+        self.data = {}
+        self.attributes = {}
+        self.mappers = {}
+        for kind in ("face", "edge", "proxy"):
+            self.data[kind] = vtkMultiBlockDataSet()
+
+            # The proxies are drawn in place of the faces, and with the same colors
+            if kind != "proxy":
+                self.attributes[kind] = vtkCompositeDataDisplayAttributes()
+
+            self.mappers[kind] = vtkCompositePolyDataMapper()
+            self.mappers[kind].SetInputDataObject(self.data[kind])
+            self.mappers[kind].SetCompositeDataDisplayAttributes(
+                self.attributes["edge" if kind == "edge" else "face"]
+            )
+
+        self.actors = {}
+        for kind in ("face", "edge"):
+            self.actors[kind] = vtkActor()
+            self.actors[kind].SetMapper(self.mappers[kind])
+
+        self.actors["edge"].GetProperty().SetColor(*edge_color)
+        self.actors["edge"].GetProperty().SetLineWidth(1)
+
+    def add_to(self, renderer):
+        """
+        Adds the face and edge actors to a renderer.
+        """
+
+        renderer.AddActor(self.actors["face"])
+        renderer.AddActor(self.actors["edge"])
+
+    def invalidate(self, name):
+        """
+        Marks an object as changed, so that its blocks are updated before the next render.
+        """
+
+        self.stale.add(name)
+
+    def sync(self, display_objects):
+        """
+        Updates the blocks of the objects that have changed, and drops the blocks
+        of the objects that are no longer displayed.
+        """
+
+        if not self.stale:
+            return
+
+        for name in self.stale:
+            object = display_objects.get(name)
+
+            if object is None:
+                self.remove(name)
+            elif "faces" in object and "color" in object:
+                self.update(name, object)
+
+        self.stale.clear()
+
+        for kind in ("face", "edge", "proxy"):
+            self.data[kind].Modified()
+
+    def set_interacting(self, interacting):
+        """
+        Draws the simplified meshes without edges while the camera is moving, and the full meshes once it stops.
+        """
+
+        self.actors["face"].SetMapper(self.mappers["proxy" if interacting else "face"])
+        self.actors["edge"].SetVisibility(not interacting)
+
+    def update(self, name, object):
+        """
+        Builds the blocks for an object if its meshes or placement changed, and sets their color and visibility.
+        """
+
+        if name not in self.blocks:
+            self.blocks[name] = self.free.pop() if self.free else len(self.blocks)
+
+        index = self.blocks[name]
+
+        # A change of color does not need the meshes to be moved again
+        source = (
+            id(object["faces"]),
+            id(object["edges"]),
+            id(object.get("proxy")),
+            object["translation"],
+            object["rotation"],
+        )
+        if self.built.get(name) != source:
+            for kind in ("face", "edge", "proxy"):
+                self.drop_attributes(kind, index)
+
+            for kind, data in (("face", object["faces"]), ("edge", object["edges"])):
+                self.data[kind].SetBlock(
+                    index, place_mesh(data, object["translation"], object["rotation"])
+                )
+
+            # Parts that are small enough are drawn with their full mesh while the camera moves
+            if object.get("proxy") is not None:
+                proxy_block = place_mesh(
+                    object["proxy"], object["translation"], object["rotation"]
+                )
+            else:
+                proxy_block = self.data["face"].GetBlock(index)
+            self.data["proxy"].SetBlock(index, proxy_block)
+
+            self.built[name] = source
+
+        visible = object.get("visible", True)
+
+        for kind in ("face", "proxy"):
+            block = self.data[kind].GetBlock(index)
+            self.attributes["face"].SetBlockColor(block, object["color"][:3])
+            self.attributes["face"].SetBlockOpacity(block, object["color"][3])
+            self.attributes["face"].SetBlockVisibility(block, visible)
+
+        edge_block = self.data["edge"].GetBlock(index)
+        self.attributes["edge"].SetBlockVisibility(edge_block, visible)
+
+    def remove(self, name):
+        """
+        Empties the blocks of an object, so that the index can be reused.
+        """
+
+        index = self.blocks.pop(name, None)
+        if index is None:
+            return
+
+        for kind in ("face", "edge", "proxy"):
+            self.drop_attributes(kind, index)
+            self.data[kind].SetBlock(index, None)
+
+        self.built.pop(name, None)
+        self.free.append(index)
+
+    def drop_attributes(self, kind, index):
+        """
+        Forgets the display attributes of the data that a block holds now.
+        """
+
+        if index >= self.data[kind].GetNumberOfBlocks():
+            return
+
+        block = self.data[kind].GetBlock(index)
+        if block is None:
+            return
+
+        attributes = self.attributes["edge" if kind == "edge" else "face"]
+        attributes.RemoveBlockColor(block)
+        attributes.RemoveBlockOpacity(block)
+        attributes.RemoveBlockVisibility(block)
+
+    def clear(self):
+        """
+        Removes all of the objects from the scene.
+        """
+
+        self.blocks.clear()
+        self.free.clear()
+        self.built.clear()
+        self.stale.clear()
+
+        for kind in ("face", "edge", "proxy"):
+            self.data[kind].SetNumberOfBlocks(0)
+            self.data[kind].Modified()
+
+        for attributes in self.attributes.values():
+            attributes.RemoveBlockColors()
+            attributes.RemoveBlockOpacities()
+            attributes.RemoveBlockVisibilities()
+
+    def count(self):
+        """
+        Gets the number of objects in the scene.
+        """
+
+        return len(self.blocks)
@@ -0,0 +1,315 @@
+import ast
+import types
+import symtable
+import functools
+
+# Values that are compared by equality rather than identity to decide whether a name changed
+_value_types = (bool, int, float, complex, str, bytes, type(None), tuple, frozenset)
+
+# Stands in for a name that is not defined
+_missing = object()
+
+
+def _root_name(node):
+    """
+    Finds the name at the start of an attribute, subscript or call chain, like assy in assy.objects["a"].loc
+    """
+
+    while isinstance(node, (ast.Attribute, ast.Subscript, ast.Call)):
+        node = node.func if isinstance(node, ast.Call) else node.value
+
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def _collect_names(node, reads, assigned, mutated):
+    """
+    Collects the global names that the parts of a statement which run in the module
+    scope read, assign and change in place. Function, lambda, class and
+    comprehension bodies run in their own scopes and are handled by _nested_reads.
+    """
+
+    if isinstance(node, ast.Name):
+        if isinstance(node.ctx, ast.Load):
+            reads.add(node.id)
+        else:
+            assigned.add(node.id)
+        return
+
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        assigned.add(node.name)
+        children = node.decorator_list + node.args.defaults
+        children += [
+            default for default in node.args.kw_defaults if default is not None
+        ]
+    elif isinstance(node, ast.Lambda):
+        children = node.args.defaults
+        children += [
+            default for default in node.args.kw_defaults if default is not None
+        ]
+    elif isinstance(node, ast.ClassDef):
+        assigned.add(node.name)
+        children = node.decorator_list + node.bases
+        children += [keyword.value for keyword in node.keywords]
+    elif isinstance(node, (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+        # Only the first iterable is evaluated in the enclosing scope
+        children = [node.generators[0].iter]
+    elif isinstance(node, (ast.Import, ast.ImportFrom)):
+        for alias in node.names:
+            if alias.name != "*":
+                assigned.add(alias.asname or alias.name.split(".")[0])
+        return
+    else:
+        children = list(ast.iter_child_nodes(node))
+
+    # Augmented assignments read the name before they assign it
+    if isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name):
+        reads.add(node.target.id)
+
+    # Setting an attribute or item, or calling a method, changes an object in place
+    if isinstance(node, (ast.Assign, ast.AugAssign, ast.AnnAssign, ast.Delete)):
+        targets = (
+            node.targets
+            if isinstance(node, (ast.Assign, ast.Delete))
+            else [node.target]
+        )
+        for target in targets:
+            if isinstance(target, (ast.Attribute, ast.Subscript)):
+                mutated.add(_root_name(target))
+    elif isinstance(node, ast.Expr) and isinstance(node.value, ast.Call):
+        if isinstance(node.value.func, ast.Attribute):
+            mutated.add(_root_name(node.value.func))
+
+    for child in children:
+        _collect_names(child, reads, assigned, mutated)
+
+
+def _nested_reads(table, reads):
+    """
+    Collects the global names read by the functions, classes and comprehensions in a
+    statement. Functions read them when they are called, so code that calls a
+    function needs to run again when one of them changes, and the function is
+    defined again to get there.
+    """
+
+    for child in table.get_children():
+        for symbol in child.get_symbols():
+            if symbol.is_global() and symbol.is_referenced():
+                reads.add(symbol.get_name())
+
+        _nested_reads(child, reads)
+
+
+@functools.lru_cache(maxsize=1024)
+def _analyze(source):
+    """
+    Parses a statement and collects its names. The result only depends on the
+    source, so it is cached along with the compiled code of the statement.
+    """
+
+    try:
+        tree = ast.parse(source)
+        table = symtable.symtable(source, "<input>", "exec")
+    except SyntaxError:
+        return None
+
+    reads = set()
+    assigned = set()
+    mutated = set()
+
+    _collect_names(tree, reads, assigned, mutated)
+    _nested_reads(table, reads)
+
+    return frozenset(reads), frozenset(assigned), frozenset(mutated - {None})
+
+
+def statement_names(source, namespace):
+    """
+    Works out which global names a statement reads, which it assigns, and which
+    objects it changes in place. Returns None if the statement cannot be parsed.
+    """
+
+    names = _analyze(source)
+    if names is None:
+        return None
+
+    reads, assigned, mutated = names
+
+    # Calling a function from a module does not change the module
+    mutated = {
+        name
+        for name in mutated
+        if not isinstance(namespace.get(name), types.ModuleType)
+    }
+
+    return set(reads), set(assigned), mutated
+
+
+def snapshot(namespace, names):
+    """
+    Keeps the values of the names so that they can be compared after a statement has run.
+    """
+
+    return {name: namespace.get(name, _missing) for name in names}
+
+
+def same_value(old, new):
+    """
+    Decides whether a name still holds the same value after it was assigned again.
+    """
+
+    if old is new:
+        return True
+
+    if type(old) is not type(new):
+        return False
+
+    try:
+        # Modules are imported again by the REPL, but are the same module
+        if isinstance(old, types.ModuleType):
+            return old.__name__ == new.__name__ and getattr(
+                old, "__file__", None
+            ) == getattr(new, "__file__", None)
+
+        # Functions that were defined again with the same code
+        if isinstance(old, types.FunctionType):
+            return (
+                old.__code__ == new.__code__
+                and old.__defaults__ == new.__defaults__
+                and old.__kwdefaults__ == new.__kwdefaults__
+            )
+
+        if isinstance(old, _value_types):
+            return bool(old == new)
+    except Exception:
+        pass
+
+    return False
+
+
+def changed_names(before, namespace):
+    """
+    Lists the names from a snapshot that hold a different value now.
+    """
+
+    return {
+        name
+        for name, value in before.items()
+        if not same_value(value, namespace.get(name, _missing))
+    }
+
+
+class dependencyGraph:
+    """
+    Keeps the statements that have been run in order, along with the names they
+    read and write, so that the statements which depend on a name can be run
+    again when it is assigned a new value.
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def record(self, source, reads, assigned, mutated, changed):
+        """
+        Adds a statement that has just been run, and returns the source of the
+        earlier statements that need to run again because of the names it changed.
+        A statement that assigns a name which was already assigned takes the place
+        of the statement that assigned it last, or moves after the statements that
+        define the names it reads.
+        """
+
+        # Statements that do not define anything or show anything have nothing depending on them
+        if not assigned and not mutated and "show_object" not in reads:
+            return []
+
+        record = {
+            "source": source,
+            "reads": reads,
+            "assigned": assigned,
+            "mutated": mutated,
+            "writes": assigned | mutated,
+        }
+
+        index = None
+        if assigned:
+            for i in reversed(range(len(self.records))):
+                if self.records[i]["assigned"] & assigned:
+                    index = i
+                    break
+
+        if index is None:
+            self.records.append(record)
+            return []
+
+        # The statement has to come after the statements that define what it reads
+        del self.records[index]
+        for i in range(index, len(self.records)):
+            if self.records[i]["writes"] & reads:
+                index = i + 1
+
+        self.records.insert(index, record)
+
+        if not changed:
+            return []
+
+        return [self.records[i]["source"] for i in self.dependents(index, changed)]
+
+    def definition(self, name, before):
+        """
+        Finds the last statement before an index that assigned a name.
+        """
+
+        for i in reversed(range(before)):
+            if name in self.records[i]["assigned"]:
+                return i
+
+        return None
+
+    def dependents(self, index, changed):
+        """
+        Lists the indexes of the statements after an index that read the changed
+        names, directly or through other statements that read them.
+        """
+
+        seeds = set()
+
+        while True:
+            rerun = set()
+            stale = set()
+
+            for i in range(min(seeds | {index}), len(self.records)):
+                record = self.records[i]
+
+                if i == index:
+                    stale |= changed
+                elif i in seeds or record["reads"] & stale:
+                    rerun.add(i)
+                    stale |= record["writes"]
+                else:
+                    # The name was assigned again by a statement that does not depend on the change
+                    stale -= record["assigned"]
+
+            # Objects that are changed in place have to be built again before the change is replayed
+            extra = set()
+            for i in rerun:
+                for name in self.records[i]["mutated"]:
+                    start = self.definition(name, i)
+                    if start is None:
+                        continue
+
+                    extra |= {
+                        j
+                        for j in range(start, i)
+                        if j != index and name in self.records[j]["writes"]
+                    }
+
+            if extra <= rerun | seeds:
+                return sorted(rerun)
+
+            seeds |= extra
+
+    def clear(self):
+        """
+        Forgets all of the statements that have been run.
+        """
+
+        self.records.clear()
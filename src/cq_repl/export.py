@@ -0,0 +1,458 @@
+import os
+import json
+import time
+import struct
+import threading
+import traceback
+from math import cos, sin, sqrt
+
+import numpy as np
+from vtkmodules.util.numpy_support import vtk_to_numpy
+
+# Triangles converted and written at a time, so that a large part is not copied all at once
+chunk_triangles = 1 << 18
+
+# glTF uses Y as the up direction, while CAD models use Z
+_z_up_to_y_up = [-sqrt(0.5), 0.0, 0.0, sqrt(0.5)]
+
+
+def scene_parts(display_objects):
+    """
+    Collects the face meshes, placement and color of the visible objects in the
+    3D view. The mesh arrays are views of the VTK data, so nothing is copied.
+    Returns the parts and the number of objects that are still being shown as
+    boxes while they are tessellated, which are left out.
+    """
+
+    parts = []
+    loading = 0
+
+    for name, object in display_objects.items():
+        if not object.get("visible", True) or "color" not in object:
+            continue
+
+        if "pending" in object:
+            loading += 1
+            continue
+
+        data = object.get("faces")
+        if data is None or data.GetNumberOfPolys() == 0:
+            continue
+
+        normals = data.GetPointData().GetArray("Normals")
+        polys = data.GetPolys()
+
+        parts.append(
+            {
+                "name": name,
+                # Keeps the VTK arrays alive while the views are being written
+                "data": data,
+                "key": id(data),
+                "points": vtk_to_numpy(data.GetPoints().GetData()).reshape(-1, 3),
+                "normals": None
+                if normals is None
+                else vtk_to_numpy(normals).reshape(-1, 3),
+                "offsets": vtk_to_numpy(polys.GetOffsetsArray()),
+                "connectivity": vtk_to_numpy(polys.GetConnectivityArray()),
+                "color": tuple(object["color"]),
+                "translation": tuple(object["translation"]),
+                "rotation": tuple(object["rotation"]),
+            }
+        )
+
+    return parts, loading
+
+
+def triangle_count(part):
+    """
+    Counts the triangles of a part's face mesh from its offsets alone. A polygon
+    with n points is split into n - 2 triangles.
+    """
+
+    offsets = part["offsets"]
+
+    return int(offsets[-1] - offsets[0]) - 2 * (len(offsets) - 1)
+
+
+def triangle_chunks(part):
+    """
+    Gets the triangles of a part's face mesh as arrays of point indexes, about
+    chunk_triangles at a time, so that the connectivity of a large part is never
+    converted all at once. Tessellated shapes are made of triangles already, but
+    other polygons are split into fans.
+    """
+
+    offsets = part["offsets"]
+    connectivity = part["connectivity"]
+
+    # Every polygon has at least three points, so this only holds when they are all triangles
+    if len(connectivity) == 3 * (len(offsets) - 1):
+        faces = connectivity.reshape(-1, 3)
+
+        for start in range(0, len(faces), chunk_triangles):
+            yield faces[start : start + chunk_triangles].astype(np.uint32, copy=False)
+
+        return
+
+    fans = []
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        for i in range(start + 1, end - 1):
+            fans.append((connectivity[start], connectivity[i], connectivity[i + 1]))
+
+        if len(fans) >= chunk_triangles:
+            yield np.array(fans, dtype=np.uint32)
+            fans = []
+
+    if fans:
+        yield np.array(fans, dtype=np.uint32)
+
+
+def placement_matrix(translation, rotation):
+    """
+    Creates the 4x4 matrix that places a part the same way that an actor with the
+    translation as its position and the rotation as its orientation would.
+    Actors are rotated about Z, then X, then Y.
+    """
+
+    rx, ry, rz = rotation
+
+    about_x = np.array([[1, 0, 0], [0, cos(rx), -sin(rx)], [0, sin(rx), cos(rx)]])
+    about_y = np.array([[cos(ry), 0, sin(ry)], [0, 1, 0], [-sin(ry), 0, cos(ry)]])
+    about_z = np.array([[cos(rz), -sin(rz), 0], [sin(rz), cos(rz), 0], [0, 0, 1]])
+
+    matrix = np.identity(4)
+    matrix[:3, :3] = about_z @ about_x @ about_y
+    matrix[:3, 3] = translation
+
+    return matrix
+
+
+def place(points, matrix):
+    """
+    Moves a copy of some points into place with a placement matrix.
+    """
+
+    return (points @ matrix[:3, :3].T + matrix[:3, 3]).astype(np.float32)
+
+
+def write_stl(path, parts):
+    """
+    Writes the parts as one binary STL file, with each part moved into place.
+    """
+
+    count = sum(triangle_count(part) for part in parts)
+
+    record = np.dtype(
+        [("normal", "<f4", 3), ("vertices", "<f4", (3, 3)), ("attributes", "<u2")]
+    )
+
+    with open(path, "wb") as stl_file:
+        stl_file.write(b"cq-repl export".ljust(80, b" "))
+        stl_file.write(struct.pack("<I", count))
+
+        for part in parts:
+            matrix = placement_matrix(part["translation"], part["rotation"])
+
+            for faces in triangle_chunks(part):
+                corners = place(part["points"][faces], matrix)
+
+                normals = np.cross(
+                    corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]
+                )
+                lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+                normals /= np.where(lengths > 0, lengths, 1)
+
+                records = np.zeros(len(corners), dtype=record)
+                records["normal"] = normals
+                records["vertices"] = corners
+                records.tofile(stl_file)
+
+
+def write_ply(path, parts):
+    """
+    Writes the parts as one binary PLY file, with each part moved into place and
+    its color stored with its vertices.
+    """
+
+    vertex_count = sum(len(part["points"]) for part in parts)
+    face_count = sum(triangle_count(part) for part in parts)
+
+    header = "\n".join(
+        [
+            "ply",
+            "format binary_little_endian 1.0",
+            "comment cq-repl export",
+            f"element vertex {vertex_count}",
+            "property float x",
+            "property float y",
+            "property float z",
+            "property uchar red",
+            "property uchar green",
+            "property uchar blue",
+            "property uchar alpha",
+            f"element face {face_count}",
+            "property list uchar uint vertex_indices",
+            "end_header",
+            "",
+        ]
+    )
+
+    vertex = np.dtype([("position", "<f4", 3), ("color", "u1", 4)])
+    face = np.dtype([("count", "u1"), ("indices", "<u4", 3)])
+
+    with open(path, "wb") as ply_file:
+        ply_file.write(header.encode("ascii"))
+
+        for part in parts:
+            matrix = placement_matrix(part["translation"], part["rotation"])
+            color = np.round(np.clip(part["color"], 0, 1) * 255)
+
+            for start in range(0, len(part["points"]), chunk_triangles):
+                points = part["points"][start : start + chunk_triangles]
+
+                vertices = np.zeros(len(points), dtype=vertex)
+                vertices["position"] = place(points, matrix)
+                vertices["color"] = color
+                vertices.tofile(ply_file)
+
+        # The faces of each part refer to its vertices, which come after those of the earlier parts
+        first = 0
+        for part in parts:
+            for faces in triangle_chunks(part):
+                records = np.zeros(len(faces), dtype=face)
+                records["count"] = 3
+                records["indices"] = faces + first
+                records.tofile(ply_file)
+
+            first += len(part["points"])
+
+
+def gltf_document(parts):
+    """
+    Builds the JSON part of a glTF file. Parts that display the same mesh share
+    its buffers, and parts that also share a color share the glTF mesh, so
+    repeated parts are only stored once. The buffer views are laid out from the
+    sizes of the arrays, which are only converted when they are written. Returns
+    the document and the (part, array name) of each buffer view, in order.
+    """
+
+    document = {
+        "asset": {"version": "2.0", "generator": "cq-repl"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"name": "scene", "rotation": _z_up_to_y_up, "children": []}],
+        "meshes": [],
+        "materials": [],
+        "accessors": [],
+        "bufferViews": [],
+        "buffers": [],
+    }
+
+    views = []
+    offset = 0
+
+    def add_view(part, name, count, target, component_type, kind):
+        nonlocal offset
+
+        # Floats and uint32 indexes both take 4 bytes, which keeps the buffer aligned
+        byte_length = count * (1 if kind == "SCALAR" else 3) * 4
+
+        document["bufferViews"].append(
+            {
+                "buffer": 0,
+                "byteOffset": offset,
+                "byteLength": byte_length,
+                "target": target,
+            }
+        )
+
+        accessor = {
+            "bufferView": len(document["bufferViews"]) - 1,
+            "componentType": component_type,
+            "count": count,
+            "type": kind,
+        }
+        if name == "points":
+            points = part["points"]
+            accessor["min"] = points.min(axis=0).astype(np.float32).tolist()
+            accessor["max"] = points.max(axis=0).astype(np.float32).tolist()
+
+        document["accessors"].append(accessor)
+        views.append((part, name))
+
+        offset += byte_length
+
+        return len(document["accessors"]) - 1
+
+    primitives = {}
+    materials = {}
+    gltf_meshes = {}
+
+    for part in parts:
+        key = part["key"]
+
+        if key not in primitives:
+            count = len(part["points"])
+
+            attributes = {
+                "POSITION": add_view(part, "points", count, 34962, 5126, "VEC3")
+            }
+            if part["normals"] is not None:
+                attributes["NORMAL"] = add_view(
+                    part, "normals", count, 34962, 5126, "VEC3"
+                )
+
+            primitives[key] = {
+                "attributes": attributes,
+                "indices": add_view(
+                    part, "indices", 3 * triangle_count(part), 34963, 5125, "SCALAR"
+                ),
+            }
+
+        color = part["color"]
+        if color not in materials:
+            materials[color] = len(document["materials"])
+            document["materials"].append(
+                {
+                    "pbrMetallicRoughness": {
+                        "baseColorFactor": list(color),
+                        "metallicFactor": 0.0,
+                        "roughnessFactor": 0.6,
+                    },
+                    "alphaMode": "BLEND" if color[3] < 1 else "OPAQUE",
+                    "doubleSided": True,
+                }
+            )
+
+        if (key, color) not in gltf_meshes:
+            gltf_meshes[(key, color)] = len(document["meshes"])
+            document["meshes"].append(
+                {"primitives": [dict(primitives[key], material=materials[color])]}
+            )
+
+        matrix = placement_matrix(part["translation"], part["rotation"])
+
+        document["nodes"][0]["children"].append(len(document["nodes"]))
+        document["nodes"].append(
+            {
+                "name": part["name"],
+                "mesh": gltf_meshes[(key, color)],
+                # glTF matrices are stored column by column
+                "matrix": matrix.T.reshape(-1).tolist(),
+            }
+        )
+
+    document["buffers"].append({"byteLength": offset})
+
+    return document, views
+
+
+def write_views(binary_file, views):
+    """
+    Writes the binary buffer of a glTF file, converting the arrays of each
+    buffer view chunk_triangles rows at a time.
+    """
+
+    for part, name in views:
+        if name == "indices":
+            for faces in triangle_chunks(part):
+                faces.tofile(binary_file)
+
+            continue
+
+        array = part[name]
+        for start in range(0, len(array), chunk_triangles):
+            chunk = array[start : start + chunk_triangles]
+            chunk.astype(np.float32, copy=False).tofile(binary_file)
+
+
+def write_gltf(path, parts):
+    """
+    Writes the parts as a glTF file, with the binary data in a .bin file next to it.
+    """
+
+    document, views = gltf_document(parts)
+
+    bin_path = os.path.splitext(path)[0] + ".bin"
+    document["buffers"][0]["uri"] = os.path.basename(bin_path)
+
+    with open(bin_path, "wb") as bin_file:
+        write_views(bin_file, views)
+
+    with open(path, "w") as gltf_file:
+        json.dump(document, gltf_file)
+
+
+def write_glb(path, parts):
+    """
+    Writes the parts as a binary glTF file.
+    """
+
+    document, views = gltf_document(parts)
+
+    # Both chunks have to be padded to 4 bytes, the JSON one with spaces
+    text = json.dumps(document).encode("utf-8")
+    text += b" " * (-len(text) % 4)
+    byte_length = document["buffers"][0]["byteLength"]
+
+    with open(path, "wb") as glb_file:
+        glb_file.write(
+            struct.pack("<4sII", b"glTF", 2, 12 + 8 + len(text) + 8 + byte_length)
+        )
+        glb_file.write(struct.pack("<I4s", len(text), b"JSON"))
+        glb_file.write(text)
+        glb_file.write(struct.pack("<I4s", byte_length, b"BIN\0"))
+
+        write_views(glb_file, views)
+
+
+# The writer for each file extension that can be exported
+writers = {
+    ".stl": write_stl,
+    ".ply": write_ply,
+    ".gltf": write_gltf,
+    ".glb": write_glb,
+}
+
+
+class sceneExporter:
+    """
+    Writes the objects in the 3D view to a file on a separate thread, using the
+    meshes that are already displayed, so that exporting neither blocks the
+    view nor tessellates anything again.
+    """
+
+    def __init__(self, path, parts):
+        self.path = path
+        self.parts = parts
+        self.writer = writers[os.path.splitext(path)[1].lower()]
+
+        # The export is finished before the REPL exits
+        self.thread = threading.Thread(target=self.run)
+
+    def start(self):
+        """
+        Starts writing the file in the background.
+        """
+
+        self.thread.start()
+
+    def run(self):
+        """
+        Runs on the export thread, and reports when the file has been written.
+        """
+
+        start = time.perf_counter()
+
+        try:
+            self.writer(self.path, self.parts)
+        except Exception:
+            print(f"\nExporting to {self.path} failed")
+            traceback.print_exc()
+        else:
+            print(
+                f"\nExported {len(self.parts)} objects to {self.path} in {time.perf_counter() - start:.1f} s"
+            )
+
+        # Let the user know that we are ready for more input
+        print(">>> ", end="", flush=True)
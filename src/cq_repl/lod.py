@@ -0,0 +1,30 @@
+from vtkmodules.vtkFiltersCore import vtkQuadricClustering
+
+from cq_repl.timing import timed
+
+
+def make_proxy(data, max_triangles):
+    """
+    Simplifies a face mesh so that it can be drawn quickly while the camera is
+    moving. Returns None if the mesh is small enough to be drawn as it is.
+    """
+
+    if max_triangles <= 0 or data.GetNumberOfPolys() <= max_triangles:
+        return None
+
+    # Clustering the points into a grid is a single pass over the mesh, so it
+    # stays fast on meshes with millions of triangles. A curved surface ends up
+    # with roughly eight triangles for each division squared.
+    divisions = max(4, int((max_triangles / 8) ** 0.5))
+
+    with timed("lod"):
+        clustering = vtkQuadricClustering()
+        clustering.SetInputData(data)
+        clustering.SetNumberOfDivisions(divisions, divisions, divisions)
+        clustering.Update()
+
+    proxy = clustering.GetOutput()
+    if proxy.GetNumberOfPolys() >= data.GetNumberOfPolys():
+        return None
+
+    return proxy
@@ -1,31 +1,196 @@
-import os, sys, select
+# Startup is timed from here, before anything slow has been imported
+from cq_repl.startup import (
+    moduleLoader,
+    startup_times,
+    mark_startup,
+    format_startup_times,
+)
+
+import os, re, sys, signal, atexit
 from math import degrees
 import time
-import code
-
-from vtkmodules.vtkInteractionWidgets import vtkOrientationMarkerWidget
-from vtkmodules.vtkRenderingAnnotation import vtkAxesActor
-from vtkmodules.vtkInteractionStyle import vtkInteractorStyleTrackballCamera
-from vtkmodules.vtkRenderingCore import (
-    vtkRenderer,
-    vtkRenderWindow,
-    vtkPolyDataMapper as vtkMapper,
-    vtkActor,
-    vtkRenderWindowInteractor,
+import json
+import traceback
+import queue
+import weakref
+import threading
+from collections import OrderedDict, deque
+from importlib import metadata
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# CadQuery, OCP and the VTK rendering modules are imported where they are used,
+# since they take seconds to import and the prompt should be shown straight away
+
+from cq_repl.mesh_cache import (
+    meshCache,
+    diskMeshCache,
+    shape_hash,
+    polydata_to_arrays,
+    polydata_from_arrays,
+)
+from cq_repl.tessellation import mesh_shape, shape_to_bytes, tessellate_bytes
+from cq_repl.worker import backgroundEvaluator
+from cq_repl.lod import make_proxy
+from cq_repl.streaming import placeholder_meshes, part_priority
+from cq_repl.export import sceneExporter, scene_parts, writers
+from cq_repl.memo import resultCache
+from cq_repl.reload import moduleReloader
+from cq_repl.checkpoints import checkpointRing
+from cq_repl.memory import (
+    distinct_mesh_bytes,
+    brep_bytes,
+    namespace_shapes,
+    format_bytes,
+)
+from cq_repl.watch import fileWatcher, split_statements
+from cq_repl.server import replServer, default_address
+from cq_repl.statements import (
+    statementAccumulator,
+    compile_statement,
+    is_statement,
+    assignment_targets,
 )
-from vtkmodules.vtkFiltersExtraction import vtkExtractCellsByType
-from vtkmodules.vtkCommonDataModel import VTK_TRIANGLE, VTK_LINE, VTK_VERTEX
+from cq_repl.timing import stage_times, session_times, add_times, timed
+from cq_repl.dependencies import (
+    dependencyGraph,
+    statement_names,
+    snapshot,
+    changed_names,
+)
+
+# VTK window and renderer, which are created by create_view once the prompt has been shown
+render_window = None
+renderer = None
+repl_camera = None
 
-import cadquery as cq
+# Loads CadQuery and OCP on a thread while the user types the first statement
+module_loader = moduleLoader(["cadquery"])
 
-# VTK window and renderer
-render_window = vtkRenderWindow()
-renderer = vtkRenderer()
-repl_camera = renderer.GetActiveCamera()
+# Names that statements can use without importing them, and the modules they stand for
+implicit_modules = {"cq": "cadquery", "OCP": "OCP"}
+
+# Set when the startup times should be printed once everything has loaded
+report_import_times = False
 
 # Keeps track of all the objects that we are rendering so they can be updated
 display_objects = {}
 
+# Draws all of the objects with a single pair of actors when composite rendering is turned on
+composite_scene = None
+
+# Face meshes with more triangles than this are drawn with a simplified proxy while the camera moves
+lod_triangles = 10000
+
+# Simplified face meshes, shared by the objects that display the same mesh
+lod_proxies = weakref.WeakValueDictionary()
+
+# Whether the user is rotating, panning or zooming the 3D view
+interacting = False
+
+# Tessellation settings that are passed to toVtkPolyData. The linear tolerance is
+# relative to the size of each shape, so it scales with both large and small parts.
+tolerance = 1e-3
+angular_tolerance = 0.1
+
+# When set, objects are first shown with a coarse mesh and refined when the REPL is idle
+coarse_tolerance = None
+coarse_angular_tolerance = 0.5
+
+# Objects that are waiting for their fine mesh
+refinements = OrderedDict()
+
+# Keeps the meshes of shapes that have already been tessellated so they can be reused
+mesh_cache = meshCache()
+
+# Keeps meshes between REPL sessions, unless it has been turned off
+disk_cache = None
+
+# Mappers for each mesh, so that objects which display the same mesh share a single mapper
+shared_mappers = weakref.WeakValueDictionary()
+
+# Number of processes used to tessellate assembly parts, and the pool they are run in
+tessellation_workers = 1
+tessellation_pool = None
+
+# Evaluates statements in a separate process when background mode is turned on
+background_evaluator = None
+
+# Matches the tolerance command, but not statements that assign a tolerance variable
+tolerance_command = re.compile(r"^\s*tolerance(\s+(coarse|off|[-+.0-9eE]+))*\s*$")
+
+# Commands without arguments that are also valid Python, and are run as code once the user defines the name
+cache_command = re.compile(r"^\s*cache\s*$")
+stats_command = re.compile(r"^\s*stats\s*$")
+overlay_command = re.compile(r"^\s*overlay\s*$")
+mem_command = re.compile(r"^\s*mem\s*$")
+
+# Runs the changed statements of a model file when it is saved, in watch mode
+file_watcher = None
+
+# Results of the functions that the user has decorated with memoize
+result_cache = resultCache()
+
+# Drops the cached results of all memoized functions, or of the ones named
+invalidate_command = re.compile(r"^\s*invalidate(\s+\S+)*\s*$")
+
+# Reloads the user's own modules when they change, created once the working directory is known
+module_reloader = None
+
+# Seconds per tick spent swapping assembly parts in for their placeholders, or None to show them all at once
+stream_budget = None
+
+# Parts that are shown as placeholders, in the order they will be tessellated
+streaming = OrderedDict()
+
+# Names of the parts that were shown for each assembly, so that parts taken out of it can be removed
+assembly_parts = {}
+
+# What is needed to undo the last few statements, when checkpoints are turned on
+checkpoints = checkpointRing()
+
+# Writes the objects in the 3D view to an STL, PLY or glTF file
+export_command = re.compile(r"^\s*export\s+\S.*$")
+
+# Goes back to before the last statement, or the last few statements
+undo_command = re.compile(r"^\s*undo(\s+\d+)?\s*$")
+
+# Commands that hide, show or remove objects by their labels
+object_command = re.compile(r"^\s*(hide|show|remove)(\s+\S+)+\s*$")
+
+# The meshes of hidden objects and stale cache entries are dropped when more memory than this is used
+memory_budget = None
+
+# Accepts code from editors and scripts over a socket, when it is turned on
+repl_server = None
+
+# Names of the objects whose meshes, placement or color changed, which are reported to socket clients
+updated_objects = set()
+
+# Replies to socket clients that are waiting for the background worker, and the errors it has reported
+waiting_replies = []
+background_errors = []
+
+# Set in the background worker process so that meshes are sent back to the REPL instead of displayed
+mesh_sink = None
+
+# Keeps track of which statements read which names, so that they can be run again when a name changes
+dependency_graph = dependencyGraph()
+rerun_dependents = True
+
+# Set when the 3D view has changed and needs to be rendered
+render_pending = False
+
+# Lets the user know when statements are being evaluated in the background
+status_actor = None
+
+# Shows the time taken by the last update in the corner of the 3D view when turned on
+stats_actor = None
+stats_overlay = False
+
+# Set when the stage times have changed and the overlay needs to be updated
+stats_pending = False
+
 
 def process_workplane(wp):
     """
@@ -61,6 +226,8 @@ def process_assembly(assy):
     REPL mechanism.
     """
 
+    import cadquery as cq
+
     objects = {}
 
     # Collect all of the shapes, along with their color, translation and rotation data
@@ -90,6 +257,17 @@ def process_assembly(assy):
     return objects
 
 
+def memoize(function):
+    """
+    Called by the CadQuery script to cache the results of a function that builds
+    geometry, so that calling it again with the same arguments returns the
+    CadQuery objects from the first call. Changing the function, its arguments
+    or the globals it uses runs it again.
+    """
+
+    return result_cache.memoize(function)
+
+
 def show_object(model):
     """
     Called by the CadQuery script to display an Assembly/Workplane object.
@@ -102,435 +280,2334 @@ def show_object(model):
     if type(model).__name__ == "Workplane":
         objects = process_workplane(model)
     elif type(model).__name__ == "Assembly":
-        objects = process_assembly(model)
+        with timed("assembly"):
+            objects = process_assembly(model)
+
+        remove_missing_parts(model, objects)
     elif type(model).__name__ == "Body":
         model.cq().label = model.label
         objects = process_workplane(model.cq())
 
+    # Objects whose geometry changed and need to be tessellated again
+    changed = []
+
     # Step through all the objects and update them
     for name, object in objects.items():
         # Add face and edge related rendering objects to the renderer if they do not already exist
         if name not in display_objects.keys():
-            display_objects[name] = {
-                "face_mapper": vtkMapper(),
-                "face_actor": vtkActor(),
-                "edge_mapper": vtkMapper(),
-                "edge_actor": vtkActor(),
-            }
+            add_display_object(name)
 
-            # Associate the actors and mappers
-            display_objects[name]["face_actor"].SetMapper(
-                display_objects[name]["face_mapper"]
-            )
-            renderer.AddActor(display_objects[name]["face_actor"])
-            display_objects[name]["edge_actor"].SetMapper(
-                display_objects[name]["edge_mapper"]
+        # If the geometry has not changed, only the placement and color need to be updated
+        if is_same_shape(name, object["model"].val()):
+            update_attributes(
+                name, object["color"], object["translation"], object["rotation"]
             )
-            renderer.AddActor(display_objects[name]["edge_actor"])
+        else:
+            changed.append(object)
+
+    # Parts that share the same underlying geometry are only tessellated once
+    originals = []
+    instances = []
+    groups = {}
+    for object in changed:
+        shape = object["model"].val()
+        key = instance_key(shape)
+
+        for original in groups.get(key, []):
+            if shapes_match(original["model"].val(), shape):
+                instances.append((object, original["model"].label))
+                break
+        else:
+            groups.setdefault(key, []).append(object)
+            originals.append(object)
+
+    # Show boxes for the parts straight away, and tessellate them over the next ticks
+    if stream_budget is not None and len(originals) > 1:
+        queue_parts(originals, instances)
+
+        request_render()
+
+        return
+
+    # Spread the tessellation of the changed parts over the pool processes if there is more than one
+    if tessellation_workers > 1 and len(originals) > 1:
+        meshes = tessellate_in_parallel(
+            [object["model"].val() for object in originals],
+            [object["model"].label for object in originals],
+        )
+    else:
+        meshes = [None] * len(originals)
 
+    for object, mesh in zip(originals, meshes):
         update_object(
-            object["model"], object["color"], object["translation"], object["rotation"]
+            object["model"],
+            object["color"],
+            object["translation"],
+            object["rotation"],
+            mesh,
         )
 
+    # Each instance gets its own actors, but reuses the meshes and mappers of the original part
+    for object, original_name in instances:
+        update_object(
+            object["model"],
+            object["color"],
+            object["translation"],
+            object["rotation"],
+            (
+                display_objects[original_name]["faces"],
+                display_objects[original_name]["edges"],
+            ),
+            original_name,
+        )
+
+    request_render()
+
 
-def update_object(obj, color, translation, rotation):
+# Statements are run in a namespace of their own rather than in this module's, so
+# that a model which assigns a name like tolerance or streaming cannot change the
+# state of the REPL. It starts out with only the functions that models call.
+user_namespace = {
+    "__name__": "__main__",
+    "show_object": show_object,
+    "memoize": memoize,
+}
+
+
+def remove_missing_parts(assy, objects):
     """
-    Converts a Workplane object and adds its data to the VTK renderer.
+    Removes the parts that were shown for an assembly the last time, but are no
+    longer in it. Assemblies are told apart by their label, or their name if
+    they do not have one.
     """
 
-    data = obj.val().toVtkPolyData(1e-3, 0.1)
+    key = getattr(assy, "label", None) or assy.name
 
-    # Extract faces
-    extr = vtkExtractCellsByType()
-    extr.SetInputDataObject(data)
+    missing = [
+        name
+        for name in assembly_parts.get(key, ())
+        if name not in objects and name in display_objects.keys()
+    ]
 
-    extr.AddCellType(VTK_LINE)
-    extr.AddCellType(VTK_VERTEX)
-    extr.Update()
-    data_edges = extr.GetOutput()
+    assembly_parts[key] = set(objects)
 
-    # Extract edges
-    extr = vtkExtractCellsByType()
-    extr.SetInputDataObject(data)
+    if not missing:
+        return
 
-    extr.AddCellType(VTK_TRIANGLE)
-    extr.Update()
-    data_faces = extr.GetOutput()
+    remove_objects(missing)
 
-    # Remove normals from edges
-    data_edges.GetPointData().RemoveArray("Normals")
+    # The REPL has to take the parts out of its own view
+    if mesh_sink is not None:
+        for name in missing:
+            mesh_sink.put(("remove", name))
 
-    # The name is based on the user-specified object label for now
-    name = obj.label
 
-    # Update the faces
-    display_objects[name]["face_mapper"].SetInputDataObject(data_faces)
-    display_objects[name]["face_actor"].SetPosition(*translation)
-    display_objects[name]["face_actor"].SetOrientation(*map(degrees, rotation))
-    display_objects[name]["face_actor"].GetProperty().SetColor(*color[:3])
-    display_objects[name]["face_actor"].GetProperty().SetOpacity(color[3])
+def queue_parts(originals, instances):
+    """
+    Shows boxes in place of the changed parts of an assembly, and queues the
+    parts to be tessellated by stream_parts, the ones that look the largest
+    first. Repeated parts share the box and the meshes of their original.
+    """
 
-    # Update the edges
-    display_objects[name]["edge_mapper"].SetInputDataObject(data_edges)
-    display_objects[name]["edge_actor"].SetPosition(*translation)
-    display_objects[name]["edge_actor"].SetOrientation(*map(degrees, rotation))
-    display_objects[name]["edge_actor"].GetProperty().SetColor(0.7, 0.7, 0.7)
-    display_objects[name]["edge_actor"].GetProperty().SetLineWidth(1)
+    # The background worker does not know where the camera is
+    camera_position = None
+    if mesh_sink is None and repl_camera is not None:
+        camera_position = repl_camera.GetPosition()
+
+    repeats = {}
+    for object, original_name in instances:
+        repeats.setdefault(original_name, []).append(object)
+
+    queued = []
+    for object in originals:
+        name = object["model"].label
+        bounds = object["model"].val().BoundingBox()
+
+        placeholder = placeholder_meshes(bounds)
+        parts = [object] + repeats.get(name, [])
+
+        for part in parts:
+            update_object(
+                part["model"],
+                part["color"],
+                part["translation"],
+                part["rotation"],
+                placeholder,
+                None if part is object else name,
+            )
 
-    # Save the high-level attributes that was used to create the mappers and actors
-    display_objects[name]["color"] = color
-    display_objects[name]["translation"] = translation
-    display_objects[name]["rotation"] = rotation
+        display_objects[name]["pending"] = [part["model"] for part in parts]
 
-    # Force an update
-    renderer.Render()
-    render_window.Render()
+        queued.append(
+            (part_priority(bounds, object["translation"], camera_position), name)
+        )
 
+    for _, name in sorted(queued, reverse=True):
+        streaming[name] = None
+        streaming.move_to_end(name)
 
-class replTimerCallback:
+
+def stream_parts(budget=None):
     """
-    Holds the information necessary to present the REPL prompt to the user properly.
+    Swaps the meshes of the queued parts in for their boxes, until the budget of
+    seconds for this tick has been used. At least one part is done per call, and
+    all of them if there is no budget. Returns False if there was nothing left
+    to stream.
     """
 
-    def __init__(self):
-        self.buffer = ""
-        self.def_incomplete = False
-        self.command_incomplete = False
-        self.open_count = 0
-        self.close_count = 0
-        self.parallel_on = False  # Keeps track of the camera perspective mode
-        self.is_front = True
+    if not streaming:
+        return False
 
-    def execute(self, obj, event):
-        """
-        Called periodically to accept REPL input from the user.
-        """
-        if sys.stdin in select.select([sys.stdin], [], [], 0)[0]:
-            line = sys.stdin.readline()
+    start = time.perf_counter()
 
-            # If the line is a comment, there is no reason to execute it
-            if line.strip().startswith("#"):
-                return
+    while streaming:
+        name, _ = streaming.popitem(last=False)
 
-            # Handle license and help requests
-            if line.strip() == "license":
-                # Output the license info
-                print_license()
+        # The part may have been removed, or shown again with its meshes, since it was queued
+        object = display_objects.get(name)
+        models = object.pop("pending", None) if object is not None else None
+        if models is None:
+            continue
 
-                # Let the user know that we are ready for more input
-                print(">>> ", end="", flush=True)
+        placeholder = object.get("faces")
 
-                return
-            elif line.strip() == "help":
-                # Output information on how to use the app
-                print_help()
+        update_object(
+            models[0], object["color"], object["translation"], object["rotation"]
+        )
 
-                # Let the user know that we are ready for more input
-                print(">>> ", end="", flush=True)
+        meshes = (object["faces"], object["edges"])
 
-                return
-            elif line.strip() == "clear":
-                # Clear the 3D viewer
-                clear_viewer()
+        for model in models[1:]:
+            other = display_objects.get(model.label)
+            if other is None or other.get("faces") is not placeholder:
+                continue
 
-                # Let the user know that we are ready for more input
-                print(">>> ", end="", flush=True)
+            update_object(
+                model,
+                other["color"],
+                other["translation"],
+                other["rotation"],
+                meshes,
+                name,
+            )
 
-                return
-
-            # If the line is an import statement, we need to remove it from the sys.modules collection.
-            # If this is not done, iterative development is slower because changes in imported modules
-            # will not be picked up.
-            if "import" in line:
-                # Parse the module out of the import line
-                module_key = line.split(" ")[1]
-
-                # Parse the line to remove the modules from the collection
-                if module_key in sys.modules.keys():
-                    sys.modules.pop(module_key)
-
-            # If the line starts with class or def, expect some indented lines
-            if line.strip().startswith("def") or line.strip().startswith("class"):
-                self.def_incomplete = True
-                self.buffer += line
-                return
-
-            # See if a function is being closed out
-            if line.strip().startswith("return"):
-                self.buffer += line
-                line = self.buffer
-
-                # Reset back to the complete line condition
-                self.def_incomplete = False
-                self.buffer = ""
-
-            # Check for follow-on indented lines
-            if line.startswith(" ") and self.def_incomplete:
-                self.buffer += line
-                return
-
-            # Keep track of the opens and closes in these continuation lines
-            self.open_count += line.count("(")
-            self.close_count += line.count(")")
-            self.open_count += line.count("[")
-            self.close_count += line.count("]")
-
-            if self.open_count != self.close_count:
-                self.command_incomplete = True
-                self.buffer += line
-                return
-
-            # If we had an incomplete command before but it is complete now, finish it out
-            if self.command_incomplete and (self.open_count > 0 and self.close_count > 0) and self.open_count == self.close_count:
-                self.buffer += line
-                line = self.buffer
-
-                # Reset back to the complete line condition
-                self.command_incomplete = False
-                self.buffer = ""
-                self.open_count = 0
-                self.close_count = 0
-
-            # Figure out if the line is code, or the user hitting Ctrl-D
-            if line:
-                # Run the line given by the user
-                code_obj = code.compile_command(line)
-                exec(code_obj, globals())
-
-                # Make sure the user does not get a stray prompt when they hit enter to close something
-                if not line.endswith(os.linesep + os.linesep) and line != os.linesep:
-                    # Let the user know that we are ready for more input
-                    print(">>> ", end="", flush=True)
-            else:
-                # The user hit Ctrl-D
-                exit(0)
+        if budget is not None and time.perf_counter() - start > budget:
+            break
 
-            # If an assembly object location is being updated, handle that specific case
-            if ("].loc" in line or "].color" in line) and "=" in line:
-                # Extract the assembly name from the line
-                assy_name = line.split(".")[0]
+    request_render()
 
-                # Execute the line to update the assembly
-                code_obj = code.compile_command(line)
-                exec(code_obj, globals())
+    return True
 
-                # Force an update of the assembly in the view
-                code_obj = code.compile_command(f"show_object({assy_name})")
-                exec(code_obj, globals())
-            # If the line contains an assignment, inject a label set
-            elif "=" in line and line.split(" ")[1] == "=":
-                obj_name = line.split("=")[0].strip()
 
-                code_obj = code.compile_command(f"{obj_name}.label='{obj_name}'")
+def add_display_object(name):
+    """
+    Adds the face and edge related rendering objects for a new object to the renderer.
+    """
 
-                error_occurred = False
+    # The background worker only needs to keep track of what it has sent to the REPL,
+    # and composite rendering puts all of the objects in the same actors
+    if mesh_sink is not None or composite_scene is not None:
+        display_objects[name] = {}
+        return
 
-                # Use a try in case we are trying to call show_object with something other than a CadQuery object
-                try:
-                    exec(code_obj, globals())
-                except Exception as err:
-                    if type(err).__name__ != "AttributeError":
-                        import traceback
+    from vtkmodules.vtkRenderingCore import vtkActor
 
-                        out_tb = traceback.format_exc()
-                        print(out_tb)
+    # The mappers are associated with the actors once the meshes are known
+    display_objects[name] = {
+        "face_actor": vtkActor(),
+        "edge_actor": vtkActor(),
+    }
 
-                    # Used to keep from executing show_object if it does not apply
-                    error_occurred = True
+    renderer.AddActor(display_objects[name]["face_actor"])
+    renderer.AddActor(display_objects[name]["edge_actor"])
 
-                if not error_occurred:
-                    # Inject an automatic show_object call
-                    code_obj = code.compile_command(f"show_object({obj_name})")
 
-                    # Use a try in case we are trying to call show_object with something other than a CadQuery object
-                    try:
-                        exec(code_obj, globals())
-                    except Exception as err:
-                        import traceback
+def set_meshes(name, data_faces, data_edges):
+    """
+    Associates an object's actors with mappers for its face and edge meshes. Objects
+    that display the same mesh share the mapper, so repeated parts are only
+    uploaded to the GPU once.
+    """
 
-                        out_tb = traceback.format_exc()
-                        print(out_tb)
+    from vtkmodules.vtkRenderingCore import vtkPolyDataMapper as vtkMapper
 
-                        # Let the user know that we are ready for more input
-                        print(">>> ", end="", flush=True)
-            elif "show_object" not in line and "=" not in line:
-                code_obj = code.compile_command(f"show_object(None)")
-                exec(code_obj, globals())
+    # Large meshes also get a simplified version to draw while the camera moves
+    proxy = lod_proxies.get(id(data_faces))
+    if proxy is None:
+        proxy = make_proxy(data_faces, lod_triangles)
 
-    def keypress(self, obj, event):
-        """
-        Handles the event of the user pressing a key on the 3D view.
-        """
-        key = obj.GetKeySym()
+        if proxy is not None:
+            lod_proxies[id(data_faces)] = proxy
 
-        if key == "KP_Enter":
-            # Reset the zoom
-            renderer.ResetCamera()
-        elif key == "KP_Prior":
-            # Reset the position
-            repl_camera.SetPosition(45, 45, 45)
-            repl_camera.SetViewUp(0, 0, 1)
-            repl_camera.SetFocalPoint(0.0, 0.0, 0.0)
+    display_objects[name]["proxy"] = proxy
 
-            # Reset the zoom
-            # renderer.ResetCamera()
-        elif key == "KP_Home":
-            # Reset the position
-            repl_camera.SetPosition(45, -45, 45)
-            repl_camera.SetViewUp(0, 0, 1)
-            repl_camera.SetFocalPoint(0.0, 0.0, 0.0)
+    # The blocks of the composite scene are updated together before the next render
+    if composite_scene is not None:
+        display_objects[name]["faces"] = data_faces
+        display_objects[name]["edges"] = data_edges
 
-            # Reset the zoom
-            # renderer.ResetCamera()
-        elif key == "KP_Up":
-            # Reset the position
-            repl_camera.SetPosition(0, 0, 45)
-            repl_camera.SetViewUp(0, 1, 0)
-            repl_camera.SetFocalPoint(0.0, 0.0, 0.0)
+        composite_scene.invalidate(name)
+        updated_objects.add(name)
 
-            # Reset the zoom
-            # renderer.ResetCamera()
-        elif key == "KP_Down":
-            # Reset the position
-            repl_camera.SetPosition(0, 0, -45)
-            repl_camera.SetViewUp(0, 1, 0)
-            repl_camera.SetFocalPoint(0.0, 0.0, 0.0)
+        return
 
-            # Reset the zoom
-            # renderer.ResetCamera()
-        elif key == "KP_Right":
-            # Reset the position
-            repl_camera.SetViewUp(0, 0, 1)
-            repl_camera.SetPosition(45, 0, 0)
-            repl_camera.SetFocalPoint(0.0, 0.0, 0.0)
+    for kind, data in (("face", data_faces), ("edge", data_edges), ("proxy", proxy)):
+        if data is None:
+            display_objects[name].pop(kind + "_mapper", None)
+            continue
 
-            # Reset the zoom
-            # renderer.ResetCamera()
-        elif key == "KP_Left":
-            # Reset the position
-            repl_camera.SetViewUp(0, 0, 1)
-            repl_camera.SetPosition(-45, 0, 0)
-            repl_camera.SetFocalPoint(0.0, 0.0, 0.0)
+        mapper = shared_mappers.get(id(data))
 
-            # Reset the zoom
-            # renderer.ResetCamera()
-        elif key == "KP_Begin":
-            # Toggle the view
-            pos = -45
-            if self.is_front:
-                pos = -45
-                self.is_front = False
-            else:
-                self.is_front = True
-                pos = 45
+        if mapper is None:
+            mapper = vtkMapper()
+            mapper.SetInputDataObject(data)
 
-            # Reset the position
-            repl_camera.SetViewUp(0, 0, 1)
-            repl_camera.SetPosition(0, pos, 0)
-            repl_camera.SetFocalPoint(0.0, 0.0, 0.0)
+            shared_mappers[id(data)] = mapper
 
-            # Reset the zoom
-            # renderer.ResetCamera()
-        elif key == "p":
-            # Allows for toggling the state
-            if self.parallel_on:
-                repl_camera.ParallelProjectionOff()
-                self.parallel_on = False
-            else:
-                repl_camera.ParallelProjectionOn()
-                self.parallel_on = True
-        # else:
-        #     print(key)
+        display_objects[name][kind + "_mapper"] = mapper
 
-        # Make sure the window updates
-        renderer.Render()
-        render_window.Render()
+    show_detail(display_objects[name])
 
+    display_objects[name]["faces"] = data_faces
+    display_objects[name]["edges"] = data_edges
 
-def init_vtkwindow(render_window, renderer, repl_cb):
+    updated_objects.add(name)
+
+
+def show_detail(object):
     """
-    Sets up the VTK render window and displays a 3D model in it.
+    Sets up an object's actors to draw its full meshes, or its proxy without edges while the camera is moving.
     """
 
-    # VTK window
-    render_window.AddRenderer(renderer)
+    if interacting and "proxy_mapper" in object:
+        object["face_actor"].SetMapper(object["proxy_mapper"])
+    else:
+        object["face_actor"].SetMapper(object["face_mapper"])
 
-    render_window.SetWindowName("cq-repl")
+    visible = object.get("visible", True)
 
-    # rendering related settings
-    render_window.SetMultiSamples(16)
-    vtkMapper.SetResolveCoincidentTopologyToPolygonOffset()
-    vtkMapper.SetResolveCoincidentTopologyPolygonOffsetParameters(1, 0)
-    vtkMapper.SetResolveCoincidentTopologyLineOffsetParameters(-1, 0)
+    object["edge_actor"].SetMapper(object["edge_mapper"])
+    object["face_actor"].SetVisibility(visible)
+    object["edge_actor"].SetVisibility(visible and not interacting)
 
-    # VTK interactor
-    interactor = vtkRenderWindowInteractor()
-    interactor.SetInteractorStyle(vtkInteractorStyleTrackballCamera())
-    interactor.SetRenderWindow(render_window)
 
-    # Axes indicator
-    axes = vtkAxesActor()
-    axes.SetDragable(0)
-    tp = axes.GetXAxisCaptionActor2D().GetCaptionTextProperty()
-    tp.SetColor(0, 0, 0)
-    axes.GetYAxisCaptionActor2D().GetCaptionTextProperty().ShallowCopy(tp)
-    axes.GetZAxisCaptionActor2D().GetCaptionTextProperty().ShallowCopy(tp)
+def set_interacting(flag):
+    """
+    Switches the 3D view between the simplified meshes that are drawn while the
+    camera moves, and the full meshes that are drawn once it stops.
+    """
 
-    # Orientation widget
-    orient_widget = vtkOrientationMarkerWidget()
-    orient_widget.SetOrientationMarker(axes)
-    orient_widget.SetViewport(0.9, 0.0, 1.0, 0.2)
-    orient_widget.SetZoom(1.1)
-    orient_widget.SetInteractor(interactor)
-    orient_widget.EnabledOn()
-    orient_widget.InteractiveOff()
+    global interacting
 
-    # Use gradient background
-    renderer = render_window.GetRenderers().GetFirstRenderer()
-    renderer.GradientBackgroundOn()
+    interacting = flag
 
-    # Camera setup
-    repl_camera.SetClippingRange(0, 1000)
-    repl_camera.Roll(-35)
-    repl_camera.Elevation(-45)
-    repl_camera.SetViewUp(0, 0, 1)
-    renderer.ResetCamera()
+    if composite_scene is not None:
+        composite_scene.set_interacting(flag)
+        return
 
-    # Set window dimensions
-    interactor.Initialize()
-    interactor.Enable()
-    render_window.SetSize(800, 600)  # *win.GetScreenSize())
-    render_window.SetPosition(-10, 0)
+    for object in display_objects.values():
+        if "face_mapper" in object:
+            show_detail(object)
 
-    # Timer to handle command line REPL input
-    interactor.AddObserver("TimerEvent", repl_cb.execute)
-    timerId = interactor.CreateRepeatingTimer(10)
 
-    # Handle keypress events
-    interactor.AddObserver("KeyPressEvent", repl_cb.keypress)
+def instance_key(shape):
+    """
+    Creates a key that is the same for shapes with the same underlying geometry,
+    without having to serialize the shapes. Shapes with the same key still need
+    to be compared with shapes_match.
+    """
 
-    # show and return
-    render_window.Render()
-    interactor.Start()
+    from OCP.TopAbs import TopAbs_COMPOUND
+    from OCP.TopoDS import TopoDS_Iterator
 
-    render_window.Finalize()
-    render_window.GetInteractor().TerminateApp()
+    wrapped = shape.wrapped
 
+    if wrapped.ShapeType() != TopAbs_COMPOUND:
+        return hash(wrapped)
 
-def clear_viewer():
+    # Assemblies wrap the contents of Workplanes in a new compound, so use its children
+    children = []
+    child = TopoDS_Iterator(wrapped)
+    while child.More():
+        children.append(hash(child.Value()))
+        child.Next()
+
+    return tuple(children)
+
+
+def is_same_shape(name, shape):
     """
-    Removes previous objects from the 3D viewer.
+    Checks whether the shape being displayed for a name is the same one that is passed in.
     """
 
-    # Remove all objects that are being tracked right now
-    display_objects.clear()
+    if "shape" not in display_objects[name].keys():
+        return False
 
-    # Remove all displayed objects from the 3D viewer, but not the Python interpreter
-    renderer.RemoveAllViewProps()
+    return shapes_match(display_objects[name]["shape"], shape)
 
-    # Force an update
-    renderer.Render()
+
+def shapes_match(old_shape, new_shape):
+    """
+    Checks whether two shapes have the same underlying geometry and placement.
+    """
+
+    from OCP.TopAbs import TopAbs_COMPOUND
+    from OCP.TopoDS import TopoDS_Iterator
+
+    old_shape = old_shape.wrapped
+    new_shape = new_shape.wrapped
+
+    if old_shape.IsEqual(new_shape):
+        return True
+
+    # Assemblies wrap the contents of Workplanes in a new compound each time they are
+    # traversed, so compare the children of the compounds instead
+    if (
+        old_shape.ShapeType() != TopAbs_COMPOUND
+        or new_shape.ShapeType() != TopAbs_COMPOUND
+        or not old_shape.Location().IsEqual(new_shape.Location())
+    ):
+        return False
+
+    old_children = TopoDS_Iterator(old_shape)
+    new_children = TopoDS_Iterator(new_shape)
+    while old_children.More() and new_children.More():
+        if not old_children.Value().IsEqual(new_children.Value()):
+            return False
+
+        old_children.Next()
+        new_children.Next()
+
+    return not old_children.More() and not new_children.More()
+
+
+def display_tolerances(digest, name):
+    """
+    Picks the tolerances to display a shape with. When progressive display is
+    turned on, the coarse tolerances are used and the object is queued to be
+    refined later, unless the fine mesh is already cached.
+    """
+
+    if coarse_tolerance is None or (digest, tolerance, angular_tolerance) in mesh_cache:
+        return tolerance, angular_tolerance
+
+    refinements[name] = None
+
+    return coarse_tolerance, coarse_angular_tolerance
+
+
+def tessellate(shape, linear_tolerance, angular_tol, digest=None):
+    """
+    Converts a shape into separate face and edge meshes. Meshes are reused from
+    the cache if the same geometry has been tessellated with the same settings before.
+    """
+
+    if digest is None:
+        digest = shape_hash(shape)
+
+    key = (digest, linear_tolerance, angular_tol)
+
+    cached = load_cached_meshes(key)
+    if cached:
+        return cached
+
+    data_faces, data_edges = mesh_shape(shape, linear_tolerance, angular_tol)
+
+    mesh_cache.put(key, data_faces, data_edges)
+
+    if disk_cache is not None:
+        disk_cache.put(
+            key, polydata_to_arrays(data_faces), polydata_to_arrays(data_edges)
+        )
+
+    return data_faces, data_edges
+
+
+def load_cached_meshes(key):
+    """
+    Looks for the meshes of a key in the in-memory cache, and then in the on-disk
+    cache from earlier sessions. Returns None if neither has them.
+    """
+
+    cached = mesh_cache.get(key)
+    if cached:
+        return cached
+
+    if disk_cache is None:
+        return None
+
+    arrays = disk_cache.get(key)
+    if arrays is None:
+        return None
+
+    # The arrays are memory-mapped, so building the meshes does not copy them
+    meshes = (polydata_from_arrays(arrays[0]), polydata_from_arrays(arrays[1]))
+    mesh_cache.put(key, *meshes)
+
+    return meshes
+
+
+def tessellate_in_parallel(shapes, names):
+    """
+    Tessellates a list of shapes for display using the tessellation pool. Shapes that
+    are already in the cache, or that appear more than once, are only tessellated once.
+    """
+
+    global tessellation_pool
+
+    if tessellation_pool is None:
+        tessellation_pool = ProcessPoolExecutor(
+            max_workers=tessellation_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    keys = []
+    for shape, name in zip(shapes, names):
+        digest = shape_hash(shape)
+
+        keys.append((digest, *display_tolerances(digest, name)))
+
+    # Send the shapes that are not cached to the pool
+    meshes = {}
+    futures = {}
+    for shape, key in zip(shapes, keys):
+        if key in meshes.keys() or key in futures.keys():
+            continue
+
+        cached = load_cached_meshes(key)
+        if cached:
+            meshes[key] = cached
+            continue
+
+        futures[key] = tessellation_pool.submit(
+            tessellate_bytes, shape_to_bytes(shape), key[1], key[2]
+        )
+
+    # Only the VTK objects need to be built from the arrays that come back
+    for key, future in futures.items():
+        with timed("tessellation"):
+            face_arrays, edge_arrays = future.result()
+
+        meshes[key] = (
+            polydata_from_arrays(face_arrays),
+            polydata_from_arrays(edge_arrays),
+        )
+        mesh_cache.put(key, *meshes[key])
+
+        if disk_cache is not None:
+            disk_cache.put(key, face_arrays, edge_arrays)
+
+    return [meshes[key] for key in keys]
+
+
+def update_object(obj, color, translation, rotation, meshes=None, instance_of=None):
+    """
+    Converts a Workplane object and adds its data to the VTK renderer. The face
+    and edge meshes can be passed in if they have already been tessellated, and
+    instance_of names the object they were taken from if the object is a repeated part.
+    """
+
+    # The name is based on the user-specified object label for now
+    name = obj.label
+
+    if meshes is None:
+        digest = shape_hash(obj.val())
+        meshes = tessellate(obj.val(), *display_tolerances(digest, name), digest)
+
+    data_faces, data_edges = meshes
+
+    display_objects[name]["shape"] = obj.val()
+
+    # The REPL process owns the 3D view when statements are evaluated in the background
+    if mesh_sink is not None:
+        display_objects[name]["faces"] = data_faces
+        display_objects[name]["edges"] = data_edges
+
+        # Repeated parts are not sent again, the REPL reuses the meshes it already has
+        if instance_of is not None:
+            mesh_sink.put(("instance", name, instance_of))
+        else:
+            mesh_sink.put(
+                (
+                    "mesh",
+                    name,
+                    polydata_to_arrays(data_faces),
+                    polydata_to_arrays(data_edges),
+                )
+            )
+        update_attributes(name, color, translation, rotation)
+
+        return
+
+    # Update the meshes
+    set_meshes(name, data_faces, data_edges)
+
+    update_attributes(name, color, translation, rotation)
+
+    request_render()
+
+
+def update_attributes(name, color, translation, rotation):
+    """
+    Updates the placement and color of an object that is already in the VTK renderer.
+    """
+
+    attributes = (color, translation, rotation)
+    if attributes != tuple(
+        display_objects[name].get(key) for key in ("color", "translation", "rotation")
+    ):
+        updated_objects.add(name)
+
+    # Save the high-level attributes that was used to create the mappers and actors
+    display_objects[name]["color"] = color
+    display_objects[name]["translation"] = translation
+    display_objects[name]["rotation"] = rotation
+
+    if mesh_sink is not None:
+        mesh_sink.put(("attributes", name, color, translation, rotation))
+        return
+
+    if composite_scene is not None:
+        composite_scene.invalidate(name)
+        return
+
+    # Update the faces
+    display_objects[name]["face_actor"].SetPosition(*translation)
+    display_objects[name]["face_actor"].SetOrientation(*map(degrees, rotation))
+    display_objects[name]["face_actor"].GetProperty().SetColor(*color[:3])
+    display_objects[name]["face_actor"].GetProperty().SetOpacity(color[3])
+
+    # Update the edges
+    display_objects[name]["edge_actor"].SetPosition(*translation)
+    display_objects[name]["edge_actor"].SetOrientation(*map(degrees, rotation))
+    display_objects[name]["edge_actor"].GetProperty().SetColor(0.7, 0.7, 0.7)
+    display_objects[name]["edge_actor"].GetProperty().SetLineWidth(1)
+
+
+def refine_next():
+    """
+    Swaps the fine mesh in for the next object that is displayed with a coarse mesh,
+    along with any repeated parts that share the coarse mesh. Returns False if there
+    was nothing left to refine.
+    """
+
+    while refinements:
+        name, _ = refinements.popitem(last=False)
+
+        # The object may have been cleared, or its meshes dropped, since it was queued
+        if (
+            name not in display_objects.keys()
+            or "shape" not in display_objects[name]
+            or "faces" not in display_objects[name]
+        ):
+            continue
+
+        coarse_faces = display_objects[name]["faces"]
+        data_faces, data_edges = tessellate(
+            display_objects[name]["shape"], tolerance, angular_tolerance
+        )
+
+        # Find the instances that were displaying the same coarse mesh
+        names = [name] + [
+            other
+            for other, object in display_objects.items()
+            if other != name and object.get("faces") is coarse_faces
+        ]
+
+        for other in names:
+            if mesh_sink is None:
+                set_meshes(other, data_faces, data_edges)
+                continue
+
+            display_objects[other]["faces"] = data_faces
+            display_objects[other]["edges"] = data_edges
+
+            if other == name:
+                mesh_sink.put(
+                    (
+                        "mesh",
+                        name,
+                        polydata_to_arrays(data_faces),
+                        polydata_to_arrays(data_edges),
+                    )
+                )
+            else:
+                mesh_sink.put(("instance", other, name))
+
+        return True
+
+    return False
+
+
+def set_tolerances(args):
+    """
+    Handles the tolerance REPL command, which shows or changes the tessellation tolerances.
+    """
+
+    global tolerance, angular_tolerance, coarse_tolerance, coarse_angular_tolerance
+
+    try:
+        if args == ["coarse", "off"]:
+            coarse_tolerance = None
+        elif len(args) == 2:
+            tolerance, angular_tolerance = float(args[0]), float(args[1])
+
+            # Show everything that is displayed already with the new tolerances
+            for name in display_objects.keys():
+                refinements[name] = None
+        elif len(args) == 3 and args[0] == "coarse":
+            coarse_tolerance = float(args[1])
+            coarse_angular_tolerance = float(args[2])
+        elif args:
+            print(
+                "Usage: tolerance [coarse] <linear> <angular>, or tolerance coarse off"
+            )
+    except ValueError:
+        print("The tolerances need to be numbers")
+
+    print(f"Tolerances: linear {tolerance}, angular {angular_tolerance}")
+    if coarse_tolerance is None:
+        print("Coarse tolerances: off")
+    else:
+        print(
+            f"Coarse tolerances: linear {coarse_tolerance}, angular {coarse_angular_tolerance}"
+        )
+
+
+def apply_background_updates(updates):
+    """
+    Displays the meshes and attribute changes sent back by the background worker.
+    """
+
+    for update in updates:
+        # The worker times its own stages, which are added to the ones timed here
+        if update[0] == "stats":
+            add_times(update[1])
+            request_stats_update()
+            continue
+
+        if update[0] == "error":
+            if repl_server is not None:
+                background_errors.append(update[1])
+            continue
+
+        name = update[1]
+
+        # Objects that an undo took out of the view
+        if update[0] == "remove":
+            if name in display_objects.keys():
+                remove_objects([name])
+            continue
+
+        if name not in display_objects.keys():
+            add_display_object(name)
+
+        if update[0] == "mesh":
+            set_meshes(
+                name, polydata_from_arrays(update[2]), polydata_from_arrays(update[3])
+            )
+        elif update[0] == "instance":
+            set_meshes(
+                name,
+                display_objects[update[2]]["faces"],
+                display_objects[update[2]]["edges"],
+            )
+        elif update[0] == "attributes":
+            update_attributes(*update[1:])
+        elif update[0] == "visible":
+            display_objects[name]["visible"] = update[2]
+            if not update[2]:
+                display_objects[name].setdefault("hidden_at", time.monotonic())
+
+            if "faces" in display_objects[name]:
+                refresh_object(name)
+            elif update[2]:
+                # The meshes were dropped here to save memory, so the worker has to send them again
+                background_evaluator.send("show", [name], [name])
+
+    if updates:
+        request_render()
+
+
+def set_status(text):
+    """
+    Shows a short status message in the corner of the 3D view.
+    """
+
+    if status_actor.GetInput() == text:
+        return
+
+    status_actor.SetInput(text)
+
+    request_render()
+
+
+def request_render():
+    """
+    Marks the 3D view as needing to be rendered. All of the changes made during a
+    timer tick or event are rendered together by flush_render, rather than
+    rendering the whole scene after every single change.
+    """
+
+    global render_pending
+
+    render_pending = True
+
+
+def flush_render():
+    """
+    Renders the 3D view if anything has changed since it was last rendered.
+    """
+
+    global render_pending
+
+    if not render_pending:
+        return
+
+    render_pending = False
+
+    # Move the changed objects into place in the composite scene
+    if composite_scene is not None:
+        with timed("composite"):
+            composite_scene.sync(display_objects)
+
+    with timed("render"):
+        render_window.Render()
+
+
+def begin_update():
+    """
+    Starts timing the stages of a new update, which begins with a statement from the user.
+    """
+
+    stage_times.clear()
+
+    request_stats_update()
+
+
+def request_stats_update():
+    """
+    Marks the stage times as changed so that the overlay is updated after the next render.
+    """
+
+    global stats_pending
+
+    stats_pending = True
+
+
+def count_triangles():
+    """
+    Adds up the number of triangles in the face meshes of all the displayed objects.
+    """
+
+    return sum(
+        object["faces"].GetNumberOfPolys()
+        for object in display_objects.values()
+        if "faces" in object
+    )
+
+
+def format_stats(times):
+    """
+    Formats the time taken by each stage, along with the size of the scene, as lines of text.
+    """
+
+    # Keep the stages in the order that they happen in
+    stages = [
+        "reload",
+        "exec",
+        "memo",
+        "assembly",
+        "tessellation",
+        "extraction",
+        "lod",
+        "composite",
+        "render",
+    ]
+    stages += sorted(stage for stage in times if stage not in stages)
+
+    lines = [
+        f"{stage}: {times[stage] * 1000:.1f} ms" for stage in stages if stage in times
+    ]
+    lines.append(f"total: {sum(times.values()) * 1000:.1f} ms")
+    lines.append(f"triangles: {count_triangles()}")
+    lines.append(f"actors: {renderer.GetActors().GetNumberOfItems()}")
+    if composite_scene is not None:
+        lines.append(f"composite blocks: {composite_scene.count()}")
+
+    return lines
+
+
+def update_stats_overlay():
+    """
+    Shows the breakdown of the last update in the overlay, if it is turned on.
+    """
+
+    global stats_pending
+
+    stats_pending = False
+
+    if not stats_overlay:
+        return
+
+    # The overlay is rendered on the next tick, so its render time is not counted in the update
+    stats_actor.SetInput("\n".join(format_stats(stage_times)))
+
+    request_render()
+
+
+def toggle_stats_overlay():
+    """
+    Turns the overlay with the breakdown of the last update on or off.
+    """
+
+    global stats_overlay
+
+    stats_overlay = not stats_overlay
+
+    stats_actor.SetVisibility(stats_overlay)
+
+    update_stats_overlay()
+    request_render()
+
+
+def handle_interrupt(signum, frame):
+    """
+    Cancels the statement being evaluated in the background when the user hits Ctrl-C.
+    """
+
+    if background_evaluator is not None and background_evaluator.busy:
+        background_evaluator.cancel()
+    else:
+        signal.default_int_handler(signum, frame)
+
+
+def apply_settings(settings):
+    """
+    Applies the settings from the command line, so that the REPL and the
+    background worker process are configured the same way.
+    """
+
+    global tessellation_workers, tolerance, angular_tolerance, coarse_tolerance, coarse_angular_tolerance, disk_cache, rerun_dependents, lod_triangles, memory_budget, stream_budget, module_reloader
+
+    mesh_cache.max_bytes = settings["cache_size"]
+    result_cache.max_entries = settings["memo_size"]
+    checkpoints.max_checkpoints = settings["checkpoints"]
+
+    if settings["cache_dir"] is not None:
+        disk_cache = diskMeshCache(
+            settings["cache_dir"],
+            settings["disk_cache_size"],
+            f"cadquery {package_version('cadquery')}, OCP {package_version('cadquery-ocp')}",
+        )
+    else:
+        disk_cache = None
+
+    tessellation_workers = settings["workers"]
+    tolerance = settings["tolerance"]
+    angular_tolerance = settings["angular_tolerance"]
+    coarse_tolerance = settings["coarse_tolerance"]
+    coarse_angular_tolerance = settings["coarse_angular_tolerance"]
+    rerun_dependents = settings["rerun_dependents"]
+    lod_triangles = settings["lod_triangles"]
+    memory_budget = settings["memory_budget"]
+    stream_budget = settings["stream_budget"]
+
+    # The user's modules are reloaded by the process that runs their statements
+    module_reloader = moduleReloader(settings["working_dir"])
+
+
+def is_command(line, pattern):
+    """
+    Checks whether a line is a REPL command. Some commands also compile as
+    Python, like "show = 1", "stats" or "export /tmp/model.stl", which is a
+    division. They are run as code if they do not read the command's name, or
+    if a variable with that name has been defined, here or in the background worker.
+    """
+
+    if not pattern.match(line):
+        return False
+
+    if not is_statement(line):
+        return True
+
+    name = line.split()[0]
+    if name in user_namespace:
+        return False
+
+    if background_evaluator is not None and name in background_evaluator.assigned:
+        return False
+
+    names = statement_names(line, user_namespace)
+
+    return names is not None and name in names[0]
+
+
+def run_statement(line, rerun=False):
+    """
+    Executes a complete statement from the user and shows any CadQuery objects it
+    changes. Earlier statements that read a name the statement changed are run
+    again afterwards. Statements that are being run again, as dependents or from a
+    watched file, are not tracked and do not print a prompt.
+    """
+
+    # Statements that use cq or OCP without importing them wait for them to be loaded
+    for name, module in implicit_modules.items():
+        if name not in user_namespace and re.search(rf"\b{name}\b", line):
+            user_namespace[name] = module_loader.require(module)
+
+    # Reload the user's modules that changed since they were imported, so that
+    # iterative development picks up the changes. Unchanged modules are not
+    # imported again.
+    reloaded = []
+    if "import" in line and module_reloader is not None:
+        with timed("reload"):
+            reloaded = module_reloader.refresh()
+
+    # Statements that need to run again because this one changed a name they read
+    dependents = []
+
+    # Run the line given by the user. Statements that are run again do not echo the values of expressions again.
+    code_obj = compile_statement(line, "exec" if rerun else "single")
+
+    names = None
+    if rerun_dependents and not rerun:
+        names = statement_names(line, user_namespace)
+
+    # Keep the values that the statement changes, so that it can be undone. Statements
+    # that are run again belong to the checkpoint of the update that ran them.
+    if checkpoints.enabled:
+        if not rerun:
+            save_checkpoint()
+
+        changes = names if names is not None else statement_names(line, user_namespace)
+        if changes is not None:
+            checkpoints.keep(user_namespace, changes[1], changes[2])
+
+    # Keep the old values so that re-assigning the same value does not run anything again
+    before = snapshot(user_namespace, names[1]) if names is not None else {}
+
+    with timed("exec"):
+        exec(code_obj, user_namespace)
+
+    # Start tracking the user modules that the statement imported
+    if "import" in line and module_reloader is not None:
+        module_reloader.track()
+
+    if names is not None:
+        reads, assigned, mutated = names
+
+        # A reloaded module is the same object, so the statements that use it are run again as if it was changed in place
+        reloaded_ids = {id(module) for module in reloaded}
+        mutated = mutated | {
+            name for name in assigned if id(user_namespace.get(name)) in reloaded_ids
+        }
+
+        dependents = dependency_graph.record(
+            line,
+            reads,
+            assigned,
+            mutated,
+            changed_names(before, user_namespace) | mutated,
+        )
+
+    # Statements that are run again are part of a larger update, which prints its own prompt
+    prompt = not rerun
+    if prompt and not dependents:
+        # Let the user know that we are ready for more input
+        print(">>> ", end="", flush=True)
+
+    # If an assembly object location is being updated, handle that specific case
+    if ("].loc" in line or "].color" in line) and "=" in line:
+        # Extract the assembly name from the line
+        assy_name = line.split(".")[0]
+
+        # The line has already been executed above, so the assembly only needs to be
+        # shown again. Parts whose shapes did not change only get their placement and
+        # color updated, so this does not tessellate the whole assembly again.
+        code_obj = compile_statement(f"show_object({assy_name})")
+        exec(code_obj, user_namespace)
+    # If the line assigns names, inject a label set and show each of them
+    elif assignment_targets(line):
+        for obj_name in assignment_targets(line):
+            code_obj = compile_statement(f"{obj_name}.label='{obj_name}'")
+
+            # Use a try in case we are trying to call show_object with something other than a CadQuery object
+            try:
+                exec(code_obj, user_namespace)
+            except Exception as err:
+                if type(err).__name__ != "AttributeError":
+                    import traceback
+
+                    out_tb = traceback.format_exc()
+                    print(out_tb)
+
+                # Keeps from executing show_object if it does not apply
+                continue
+
+            # Inject an automatic show_object call
+            code_obj = compile_statement(f"show_object({obj_name})")
+
+            # Use a try in case we are trying to call show_object with something other than a CadQuery object
+            try:
+                exec(code_obj, user_namespace)
+            except Exception as err:
+                import traceback
+
+                out_tb = traceback.format_exc()
+                print(out_tb)
+
+                # Let the user know that we are ready for more input
+                print(">>> ", end="", flush=True)
+    elif "show_object" not in line and "=" not in line:
+        code_obj = compile_statement(f"show_object(None)")
+        exec(code_obj, user_namespace)
+
+    if dependents:
+        run_dependents(dependents)
+
+        if prompt:
+            # Let the user know that we are ready for more input
+            print(">>> ", end="", flush=True)
+
+
+def run_watched_file():
+    """
+    Runs the statements of the watched file from the first one that changed since
+    the file was last run, so the unchanged statements before it are not run again.
+    """
+
+    changes = file_watcher.poll()
+    if changes is None:
+        return
+
+    start, statements = changes
+
+    print(
+        f"{os.path.basename(file_watcher.path)} changed, running {len(statements)} of its statements"
+    )
+
+    begin_update()
+
+    # Undoing goes back to before the file was saved
+    if background_evaluator is not None:
+        background_evaluator.send("checkpoint")
+    else:
+        save_checkpoint()
+
+    for index, statement in enumerate(statements, start):
+        # The worker reports its own errors
+        if background_evaluator is not None:
+            background_evaluator.submit(statement, rerun=True)
+            continue
+
+        try:
+            run_statement(statement, rerun=True)
+        except Exception:
+            traceback.print_exc()
+
+            # The statements after this one may depend on it, so run them all again on the next save
+            file_watcher.failed(index)
+            break
+
+    # Let the user know that we are ready for more input
+    print(">>> ", end="", flush=True)
+
+
+def run_request(client, request, repl_cb):
+    """
+    Runs a request from a client of the socket server. Requests either hold a
+    block of code, which is split into top-level statements and run like typed
+    input, or a REPL command. The reply reports any error, the time taken by each
+    stage and which objects were updated. In background mode, the reply is sent
+    once the worker has finished.
+    """
+
+    reply = {"id": request.get("id"), "ok": True, "error": None}
+
+    if "command" in request:
+        try:
+            if not repl_cb.handle_command(str(request["command"])):
+                reply["ok"] = False
+                reply["error"] = f"Unknown command: {request['command']}"
+        except Exception:
+            reply["ok"] = False
+            reply["error"] = traceback.format_exc()
+
+        client.send(reply)
+        return
+
+    try:
+        statements = split_statements(str(request.get("code", "")))
+    except SyntaxError:
+        reply["ok"] = False
+        reply["error"] = traceback.format_exc(limit=0)
+        reply["statements"] = 0
+
+        client.send(reply)
+        return
+
+    begin_update()
+    start = time.perf_counter()
+
+    # Requests that are still waiting share the updates and errors from the worker
+    if not waiting_replies:
+        updated_objects.clear()
+        background_errors.clear()
+
+    reply["statements"] = 0
+    for statement in statements:
+        if background_evaluator is not None:
+            background_evaluator.submit(statement)
+        else:
+            try:
+                run_statement(statement)
+            except Exception:
+                reply["ok"] = False
+                reply["error"] = traceback.format_exc()
+                break
+
+        reply["statements"] += 1
+
+    if background_evaluator is not None:
+        waiting_replies.append((client, reply, start))
+    else:
+        send_reply(client, reply, start)
+
+
+def send_reply(client, reply, start):
+    """
+    Adds the timings and updated objects to a reply, and sends it to the client.
+    """
+
+    reply["time"] = time.perf_counter() - start
+    reply["stages"] = dict(stage_times)
+    reply["updated"] = sorted(updated_objects)
+
+    client.send(reply)
+
+
+def handle_requests(repl_cb):
+    """
+    Runs the requests that socket clients have sent since the last tick, and
+    sends the replies that were waiting for the background worker.
+    """
+
+    while True:
+        try:
+            client, request = repl_server.requests.get_nowait()
+        except queue.Empty:
+            break
+
+        run_request(client, request, repl_cb)
+
+    if waiting_replies and not background_evaluator.busy:
+        # The worker runs the statements in order, so any errors belong to the waiting requests
+        error = "\n".join(background_errors) or None
+        background_errors.clear()
+
+        for client, reply, start in waiting_replies:
+            reply["ok"] = error is None
+            reply["error"] = error
+            send_reply(client, reply, start)
+
+        waiting_replies.clear()
+
+
+def run_dependents(statements):
+    """
+    Runs the earlier statements that read names which have just changed, in the
+    order they were first run, so that the view does not show stale geometry.
+    """
+
+    print(
+        f"Running {len(statements)} dependent statement{'s' if len(statements) > 1 else ''} again"
+    )
+
+    for statement in statements:
+        try:
+            run_statement(statement, rerun=True)
+        except Exception:
+            # The statements after this one may depend on it, so stop here
+            traceback.print_exc()
+            break
+
+
+class replTimerCallback:
+    """
+    Holds the information necessary to present the REPL prompt to the user properly.
+    """
+
+    def __init__(self):
+        self.statements = statementAccumulator()  # Joins lines into complete statements
+        self.ready = deque()  # Complete statements that have not been run yet
+        self.parallel_on = False  # Keeps track of the camera perspective mode
+        self.is_front = True
+        self.lines = queue.Queue()  # Lines of input that have not been handled yet
+        self.last_statement = None  # The last complete statement that was run
+        self.max_statements = None  # Limits the statements run per tick, if set
+        self.batch_time = 0.05  # Seconds of input per tick before the view is updated
+        self.busy_interval = 10  # Milliseconds between ticks while there is work to do
+        self.idle_interval = 50  # Milliseconds between ticks while the REPL is idle
+        self.timer_id = None
+
+    def start_reader(self, stream):
+        """
+        Reads the input on a separate thread, so that lines are queued as soon as
+        they arrive and the 3D view does not have to poll for them.
+        """
+
+        threading.Thread(target=self.read_lines, args=(stream,), daemon=True).start()
+
+    def read_lines(self, stream):
+        """
+        Runs on the reader thread and queues each line of input, including the empty one at the end of the input.
+        """
+
+        while True:
+            line = stream.readline()
+            self.lines.put(line)
+
+            if not line:
+                break
+
+    def schedule(self, interactor):
+        """
+        Sets up the timer for the next tick. Ticks come quickly while there is work
+        to do, and slowly while the REPL is idle so that it uses almost no CPU time.
+        """
+
+        if (
+            not self.lines.empty()
+            or self.ready
+            or (repl_server is not None and not repl_server.requests.empty())
+        ):
+            interval = 1
+        elif (
+            streaming
+            or refinements
+            or self.statements
+            or waiting_replies
+            or (
+                background_evaluator is not None
+                and (background_evaluator.busy or background_evaluator.streaming)
+            )
+        ):
+            interval = self.busy_interval
+        else:
+            interval = self.idle_interval
+
+        self.timer_id = interactor.CreateOneShotTimer(interval)
+
+    def execute(self, obj, event):
+        """
+        Called on each timer tick to accept REPL input from the user.
+        """
+
+        # Ignore timers that were not set up by the REPL
+        if obj is not None and obj.GetTimerEventId() != self.timer_id:
+            return
+
+        try:
+            self.read_input()
+        finally:
+            # Render once for everything that changed during this tick
+            flush_render()
+
+            if stats_pending:
+                update_stats_overlay()
+
+            if obj is not None:
+                self.schedule(obj)
+
+    def read_input(self):
+        """
+        Handles the work for one timer tick, including the lines of REPL input that have arrived since the last one.
+        """
+
+        global report_import_times
+
+        # Pick up any work that the background worker has finished
+        if background_evaluator is not None:
+            apply_background_updates(background_evaluator.drain())
+
+            if background_evaluator.busy:
+                set_status("Evaluating...")
+            elif background_evaluator.streaming:
+                set_status(f"Loading {background_evaluator.streaming} parts...")
+            else:
+                set_status("")
+
+        # Pick up changes to the watched model file
+        if file_watcher is not None:
+            run_watched_file()
+
+        # Run the code that has been sent over the socket
+        if repl_server is not None:
+            handle_requests(self)
+
+        # Handle all of the input that has arrived, so that pasted blocks are not run one line per tick
+        start = time.perf_counter()
+        statements = 0
+        had_input = False
+
+        while True:
+            if not self.ready:
+                try:
+                    line = self.lines.get_nowait()
+                except queue.Empty:
+                    # A pasted block is complete once the input goes quiet
+                    statement = self.statements.flush()
+                    if statement is None:
+                        break
+
+                    self.ready.append(statement)
+                    continue
+
+                had_input = True
+
+                self.handle_line(line)
+                continue
+
+            had_input = True
+
+            self.run_ready(self.ready.popleft())
+            statements += 1
+
+            # Leave the rest for the next tick so that the view can be updated in between
+            if (
+                self.max_statements is not None and statements >= self.max_statements
+            ) or time.perf_counter() - start > self.batch_time:
+                break
+
+        if background_evaluator is None:
+            # Swap the meshes of assembly parts in for their boxes a few at a time, and
+            # use the idle time after that to swap in a fine mesh for one of the coarse ones
+            if not stream_parts(stream_budget) and not had_input and refine_next():
+                request_render()
+
+        # Anything that changed the view may have added meshes
+        if render_pending:
+            enforce_memory_budget()
+
+        # Report the startup times once everything has loaded
+        if report_import_times and module_loader.done.is_set():
+            print_import_times()
+            print(">>> ", end="", flush=True)
+
+            report_import_times = False
+
+    def handle_line(self, line):
+        """
+        Handles one line of REPL input. REPL commands are handled straight away,
+        and complete statements are queued up to be run.
+        """
+
+        # The user hit Ctrl-D, so finish what was entered and then exit
+        if not line:
+            statement = self.statements.flush(end_of_input=True)
+            if statement is not None:
+                self.ready.append(statement)
+
+            # Keep running for the socket clients when there is no terminal input
+            if repl_server is None:
+                self.ready.append(None)
+
+            return
+
+        # Commands are only recognized between statements
+        if not self.statements and self.handle_command(line):
+            return
+
+        self.ready.extend(self.statements.add(line))
+
+    def handle_command(self, line):
+        """
+        Handles the REPL commands. Returns True if the line was a command.
+        """
+
+        # Handle license and help requests
+        if line.strip() == "license":
+            # Output the license info
+            print_license()
+
+            # Let the user know that we are ready for more input
+            print(">>> ", end="", flush=True)
+
+            return True
+        elif line.strip() == "help":
+            # Output information on how to use the app
+            print_help()
+
+            # Let the user know that we are ready for more input
+            print(">>> ", end="", flush=True)
+
+            return True
+        elif is_command(line, cache_command):
+            # Output the tessellation cache statistics, which are kept by the worker in background mode
+            if background_evaluator is not None:
+                background_evaluator.send("cache")
+            else:
+                print_cache_stats()
+
+                # Let the user know that we are ready for more input
+                print(">>> ", end="", flush=True)
+
+            return True
+        elif is_command(line, stats_command):
+            # Output where the time went in the last update
+            print_stats()
+
+            # Let the user know that we are ready for more input
+            print(">>> ", end="", flush=True)
+
+            return True
+        elif is_command(line, overlay_command):
+            # Show or hide the breakdown of the last update in the 3D view
+            toggle_stats_overlay()
+
+            # Let the user know that we are ready for more input
+            print(">>> ", end="", flush=True)
+
+            return True
+        elif is_command(line, tolerance_command):
+            # Show or change the tessellation tolerances, which are used by the worker in background mode
+            if background_evaluator is not None:
+                background_evaluator.send("tolerance", line.split()[1:])
+            else:
+                set_tolerances(line.split()[1:])
+
+                # Let the user know that we are ready for more input
+                print(">>> ", end="", flush=True)
+
+            return True
+        elif is_command(line, mem_command):
+            # Output the memory used by each object, which the worker holds in background mode
+            if background_evaluator is not None:
+                print(f"Meshes in the 3D view: {format_bytes(memory_in_use())}")
+                background_evaluator.send("mem")
+            else:
+                print_memory()
+
+                # Let the user know that we are ready for more input
+                print(">>> ", end="", flush=True)
+
+            return True
+        elif is_command(line, object_command):
+            command, *names = line.split()
+
+            unknown = [name for name in names if name not in display_objects.keys()]
+            if unknown:
+                print(f"No objects named: {', '.join(unknown)}")
+
+            names = [name for name in names if name in display_objects.keys()]
+
+            # The worker has to send the meshes that were dropped here to save memory
+            missing = [name for name in names if "faces" not in display_objects[name]]
+
+            if command == "hide":
+                hide_objects(names)
+            elif command == "show":
+                show_objects(names)
+            else:
+                remove_objects(names)
+
+            # Keep the background worker in step, so that it drops and sends the right meshes
+            if background_evaluator is not None:
+                background_evaluator.send(command, names, missing)
+
+            # Let the user know that we are ready for more input
+            print(">>> ", end="", flush=True)
+
+            return True
+        elif is_command(line, invalidate_command):
+            # Forget cached function results, which are kept by the worker in background mode
+            if background_evaluator is not None:
+                background_evaluator.send("invalidate", line.split()[1:])
+            else:
+                invalidate_results(line.split()[1:])
+
+                # Let the user know that we are ready for more input
+                print(">>> ", end="", flush=True)
+
+            return True
+        elif is_command(line, undo_command):
+            count = int(line.split()[1]) if len(line.split()) > 1 else 1
+
+            # The namespace and the checkpoints are kept by the worker in background mode
+            if background_evaluator is not None:
+                background_evaluator.send("undo", count)
+            else:
+                undo_statements(count)
+
+                # Let the user know that we are ready for more input
+                print(">>> ", end="", flush=True)
+
+            return True
+        elif is_command(line, export_command):
+            # The REPL has the meshes of everything in the view, even in background mode
+            export_scene(line.split(None, 1)[1].strip())
+
+            # Let the user know that we are ready for more input
+            print(">>> ", end="", flush=True)
+
+            return True
+        elif line.strip() == "clear":
+            # Clear the 3D viewer
+            clear_viewer()
+
+            # Make sure the background worker does not think the objects are still displayed
+            if background_evaluator is not None:
+                background_evaluator.send("clear")
+
+            # Let the user know that we are ready for more input
+            print(">>> ", end="", flush=True)
+
+            return True
+
+        return False
+
+    def run_ready(self, statement):
+        """
+        Runs a complete statement, or exits at the end of the input.
+        """
+
+        if statement is None:
+            exit(0)
+
+        self.last_statement = statement
+
+        begin_update()
+
+        # Hand the statement off to the background worker if there is one
+        if background_evaluator is not None:
+            background_evaluator.submit(statement)
+        else:
+            run_statement(statement)
+
+    def start_interaction(self, obj, event):
+        """
+        Called when the user starts to rotate, pan or zoom the 3D view.
+        """
+
+        set_interacting(True)
+
+    def end_interaction(self, obj, event):
+        """
+        Called when the camera stops moving, just before the view is rendered again at full detail.
+        """
+
+        set_interacting(False)
+
+    def keypress(self, obj, event):
+        """
+        Handles the event of the user pressing a key on the 3D view.
+        """
+        key = obj.GetKeySym()
+
+        if key == "KP_Enter":
+            # Reset the zoom
+            renderer.ResetCamera()
+        elif key == "KP_Prior":
+            # Reset the position
+            repl_camera.SetPosition(45, 45, 45)
+            repl_camera.SetViewUp(0, 0, 1)
+            repl_camera.SetFocalPoint(0.0, 0.0, 0.0)
+
+            # Reset the zoom
+            # renderer.ResetCamera()
+        elif key == "KP_Home":
+            # Reset the position
+            repl_camera.SetPosition(45, -45, 45)
+            repl_camera.SetViewUp(0, 0, 1)
+            repl_camera.SetFocalPoint(0.0, 0.0, 0.0)
+
+            # Reset the zoom
+            # renderer.ResetCamera()
+        elif key == "KP_Up":
+            # Reset the position
+            repl_camera.SetPosition(0, 0, 45)
+            repl_camera.SetViewUp(0, 1, 0)
+            repl_camera.SetFocalPoint(0.0, 0.0, 0.0)
+
+            # Reset the zoom
+            # renderer.ResetCamera()
+        elif key == "KP_Down":
+            # Reset the position
+            repl_camera.SetPosition(0, 0, -45)
+            repl_camera.SetViewUp(0, 1, 0)
+            repl_camera.SetFocalPoint(0.0, 0.0, 0.0)
+
+            # Reset the zoom
+            # renderer.ResetCamera()
+        elif key == "KP_Right":
+            # Reset the position
+            repl_camera.SetViewUp(0, 0, 1)
+            repl_camera.SetPosition(45, 0, 0)
+            repl_camera.SetFocalPoint(0.0, 0.0, 0.0)
+
+            # Reset the zoom
+            # renderer.ResetCamera()
+        elif key == "KP_Left":
+            # Reset the position
+            repl_camera.SetViewUp(0, 0, 1)
+            repl_camera.SetPosition(-45, 0, 0)
+            repl_camera.SetFocalPoint(0.0, 0.0, 0.0)
+
+            # Reset the zoom
+            # renderer.ResetCamera()
+        elif key == "KP_Begin":
+            # Toggle the view
+            pos = -45
+            if self.is_front:
+                pos = -45
+                self.is_front = False
+            else:
+                self.is_front = True
+                pos = 45
+
+            # Reset the position
+            repl_camera.SetViewUp(0, 0, 1)
+            repl_camera.SetPosition(0, pos, 0)
+            repl_camera.SetFocalPoint(0.0, 0.0, 0.0)
+
+            # Reset the zoom
+            # renderer.ResetCamera()
+        elif key == "p":
+            # Allows for toggling the state
+            if self.parallel_on:
+                repl_camera.ParallelProjectionOff()
+                self.parallel_on = False
+            else:
+                repl_camera.ParallelProjectionOn()
+                self.parallel_on = True
+        # else:
+        #     print(key)
+
+        # Make sure the window updates
+        request_render()
+        flush_render()
+
+
+def create_view():
+    """
+    Creates the VTK render window, renderer and text actors. This is left until
+    the prompt has been shown, since the VTK rendering modules take a while to load.
+    """
+
+    global render_window, renderer, repl_camera, status_actor, stats_actor
+
+    # The OpenGL and FreeType modules provide the implementations of the window and text
+    import vtkmodules.vtkRenderingOpenGL2
+    import vtkmodules.vtkRenderingFreeType
+    from vtkmodules.vtkRenderingCore import vtkRenderer, vtkRenderWindow, vtkTextActor
+
+    render_window = vtkRenderWindow()
+    renderer = vtkRenderer()
+    repl_camera = renderer.GetActiveCamera()
+
+    status_actor = vtkTextActor()
+    stats_actor = vtkTextActor()
+
+    mark_startup("window")
+
+
+def init_vtkwindow(render_window, renderer, repl_cb):
+    """
+    Sets up the VTK render window and displays a 3D model in it.
+    """
+
+    from vtkmodules.vtkInteractionWidgets import vtkOrientationMarkerWidget
+    from vtkmodules.vtkRenderingAnnotation import vtkAxesActor
+    from vtkmodules.vtkInteractionStyle import vtkInteractorStyleTrackballCamera
+    from vtkmodules.vtkRenderingCore import (
+        vtkPolyDataMapper as vtkMapper,
+        vtkRenderWindowInteractor,
+    )
+
+    # VTK window
+    render_window.AddRenderer(renderer)
+
+    render_window.SetWindowName("cq-repl")
+
+    # rendering related settings
+    render_window.SetMultiSamples(16)
+    vtkMapper.SetResolveCoincidentTopologyToPolygonOffset()
+    vtkMapper.SetResolveCoincidentTopologyPolygonOffsetParameters(1, 0)
+    vtkMapper.SetResolveCoincidentTopologyLineOffsetParameters(-1, 0)
+
+    # VTK interactor
+    interactor = vtkRenderWindowInteractor()
+    interactor.SetInteractorStyle(vtkInteractorStyleTrackballCamera())
+    interactor.SetRenderWindow(render_window)
+
+    # Axes indicator
+    axes = vtkAxesActor()
+    axes.SetDragable(0)
+    tp = axes.GetXAxisCaptionActor2D().GetCaptionTextProperty()
+    tp.SetColor(0, 0, 0)
+    axes.GetYAxisCaptionActor2D().GetCaptionTextProperty().ShallowCopy(tp)
+    axes.GetZAxisCaptionActor2D().GetCaptionTextProperty().ShallowCopy(tp)
+
+    # Orientation widget
+    orient_widget = vtkOrientationMarkerWidget()
+    orient_widget.SetOrientationMarker(axes)
+    orient_widget.SetViewport(0.9, 0.0, 1.0, 0.2)
+    orient_widget.SetZoom(1.1)
+    orient_widget.SetInteractor(interactor)
+    orient_widget.EnabledOn()
+    orient_widget.InteractiveOff()
+
+    # Use gradient background
+    renderer = render_window.GetRenderers().GetFirstRenderer()
+    renderer.GradientBackgroundOn()
+
+    # Status text for background evaluation
+    status_actor.SetPosition(10, 10)
+    status_actor.GetTextProperty().SetFontSize(14)
+    status_actor.GetTextProperty().SetColor(0, 0, 0)
+    renderer.AddViewProp(status_actor)
+
+    # Breakdown of the last update, which is hidden unless the overlay is turned on
+    stats_actor.GetPositionCoordinate().SetCoordinateSystemToNormalizedViewport()
+    stats_actor.SetPosition(0.01, 0.98)
+    stats_actor.GetTextProperty().SetVerticalJustificationToTop()
+    stats_actor.GetTextProperty().SetFontSize(14)
+    stats_actor.GetTextProperty().SetColor(0, 0, 0)
+    stats_actor.SetVisibility(stats_overlay)
+    renderer.AddViewProp(stats_actor)
+
+    # Camera setup
+    repl_camera.SetClippingRange(0, 1000)
+    repl_camera.Roll(-35)
+    repl_camera.Elevation(-45)
+    repl_camera.SetViewUp(0, 0, 1)
+    renderer.ResetCamera()
+
+    # Set window dimensions
+    interactor.Initialize()
+    interactor.Enable()
+    render_window.SetSize(800, 600)  # *win.GetScreenSize())
+    render_window.SetPosition(-10, 0)
+
+    # Timer to handle command line REPL input
+    interactor.AddObserver("TimerEvent", repl_cb.execute)
+    repl_cb.schedule(interactor)
+
+    # Handle keypress events
+    interactor.AddObserver("KeyPressEvent", repl_cb.keypress)
+
+    # Draw simplified meshes while the camera is moving
+    style = interactor.GetInteractorStyle()
+    style.AddObserver("StartInteractionEvent", repl_cb.start_interaction)
+    style.AddObserver("EndInteractionEvent", repl_cb.end_interaction)
+
+    # show and return
     render_window.Render()
+    interactor.Start()
+
+    render_window.Finalize()
+    render_window.GetInteractor().TerminateApp()
+
+
+def run_headless(script_path, timings_path, repl_cb):
+    """
+    Feeds a script through the REPL line by line without opening a window, using
+    VTK offscreen rendering. The time spent in each stage of every statement is
+    written to a JSON file so that performance can be tracked without a desktop session.
+    """
+
+    from vtkmodules.vtkRenderingCore import vtkPolyDataMapper as vtkMapper
+
+    render_window.SetOffScreenRendering(True)
+    render_window.AddRenderer(renderer)
+    render_window.SetSize(800, 600)
+
+    # Use the same rendering settings as the interactive window
+    render_window.SetMultiSamples(16)
+    vtkMapper.SetResolveCoincidentTopologyToPolygonOffset()
+    vtkMapper.SetResolveCoincidentTopologyPolygonOffsetParameters(1, 0)
+    vtkMapper.SetResolveCoincidentTopologyLineOffsetParameters(-1, 0)
+    renderer.GradientBackgroundOn()
+    renderer.AddViewProp(status_actor)
+    renderer.AddViewProp(stats_actor)
+
+    statements = []
+    script_start = time.perf_counter()
+
+    # Run one statement per tick so that each one can be timed on its own
+    with open(script_path) as script:
+        for line in script:
+            repl_cb.lines.put(line)
+    repl_cb.lines.put("")
+    repl_cb.max_statements = 1
+
+    while True:
+        stage_times.clear()
+        repl_cb.last_statement = None
+
+        start = time.perf_counter()
+        error = None
+
+        try:
+            repl_cb.execute(None, None)
+        except SystemExit:
+            # The end of the script looks the same as the user hitting Ctrl-D
+            break
+        except Exception:
+            error = traceback.format_exc()
+            print(error)
+
+        # Lines that only continue a statement, and blank lines, are not recorded on their own
+        if repl_cb.last_statement is None or not repl_cb.last_statement.strip():
+            continue
+
+        statements.append(
+            {
+                "statement": repl_cb.last_statement,
+                "total": time.perf_counter() - start,
+                "stages": dict(stage_times),
+                "error": error,
+            }
+        )
+
+    # Finish tessellating the assembly parts that are still shown as boxes
+    while background_evaluator is None and stream_parts(stream_budget):
+        flush_render()
+
+    # Swap in the fine meshes, so that the totals describe the final view
+    while background_evaluator is None and refine_next():
+        request_render()
+    flush_render()
+
+    # Wait for the statements that are still being evaluated in the background, and
+    # for the worker to send the meshes of the parts that it is showing as boxes and
+    # the fine meshes of the objects it is showing with coarse ones
+    while background_evaluator is not None and (
+        background_evaluator.busy
+        or background_evaluator.streaming
+        or background_evaluator.refining
+    ):
+        apply_background_updates(background_evaluator.drain())
+        flush_render()
+        time.sleep(0.01)
+
+    # A script that never uses CadQuery would otherwise report the imports before they finish
+    module_loader.wait()
+
+    results = {
+        "script": script_path,
+        "total": time.perf_counter() - script_start,
+        "statements": statements,
+        "stages": dict(session_times),
+        "cache": mesh_cache.stats(),
+        "display_objects": len(display_objects),
+        "triangles": count_triangles(),
+        "startup": dict(startup_times),
+        "imports": dict(module_loader.times),
+    }
+
+    if timings_path is not None:
+        with open(timings_path, "w") as timings_file:
+            json.dump(results, timings_file, indent=2)
+
+    return results
+
+
+def clear_viewer():
+    """
+    Removes previous objects from the 3D viewer.
+    """
+
+    # Remove all objects that are being tracked right now
+    display_objects.clear()
+    refinements.clear()
+    streaming.clear()
+    assembly_parts.clear()
+
+    # Remove all displayed objects from the 3D viewer, but not the Python interpreter
+    renderer.RemoveAllViewProps()
+
+    if composite_scene is not None:
+        composite_scene.clear()
+        composite_scene.add_to(renderer)
+
+    # Keep the status text and the overlay
+    renderer.AddViewProp(status_actor)
+    renderer.AddViewProp(stats_actor)
+
+    request_render()
+
+
+def refresh_object(name):
+    """
+    Updates the 3D view after an object has been hidden or shown.
+    """
+
+    if mesh_sink is not None:
+        return
+
+    if composite_scene is not None:
+        composite_scene.invalidate(name)
+    elif "face_mapper" in display_objects[name]:
+        show_detail(display_objects[name])
+
+    request_render()
+
+
+def hide_objects(names):
+    """
+    Hides objects in the 3D view. They are kept so that they can be shown again
+    without running any code, but their meshes can be dropped to save memory.
+    """
+
+    for name in names:
+        display_objects[name]["visible"] = False
+        display_objects[name]["hidden_at"] = time.monotonic()
+
+        refresh_object(name)
+
+
+def show_objects(names, missing=()):
+    """
+    Shows hidden objects again. Objects whose meshes were dropped are tessellated
+    again, and the meshes of the objects that the REPL is missing are sent to it
+    when this runs in the background worker.
+    """
+
+    for name in names:
+        display_objects[name]["visible"] = True
+        display_objects[name].pop("hidden_at", None)
+
+        if "faces" not in display_objects[name] or name in missing:
+            restore_meshes(name)
+
+        refresh_object(name)
+
+
+def restore_meshes(name):
+    """
+    Brings back the meshes of an object that were dropped to save memory.
+    """
+
+    object = display_objects[name]
+
+    if "faces" in object:
+        data_faces, data_edges = object["faces"], object["edges"]
+    elif "shape" in object:
+        digest = shape_hash(object["shape"])
+        data_faces, data_edges = tessellate(
+            object["shape"], *display_tolerances(digest, name), digest
+        )
+    else:
+        # The background worker sends the meshes instead
+        return
+
+    if mesh_sink is None:
+        set_meshes(name, data_faces, data_edges)
+        return
+
+    object["faces"] = data_faces
+    object["edges"] = data_edges
+
+    mesh_sink.put(
+        ("mesh", name, polydata_to_arrays(data_faces), polydata_to_arrays(data_edges))
+    )
+
+
+def remove_objects(names):
+    """
+    Removes objects from the 3D view and forgets about them, unlike hiding them.
+    """
+
+    for name in names:
+        object = display_objects.pop(name)
+        refinements.pop(name, None)
+
+        if mesh_sink is not None:
+            continue
+
+        if composite_scene is not None:
+            composite_scene.invalidate(name)
+        else:
+            renderer.RemoveActor(object["face_actor"])
+            renderer.RemoveActor(object["edge_actor"])
+
+    request_render()
+
+
+def drop_meshes(name):
+    """
+    Drops the meshes of a hidden object, along with its entries in the
+    tessellation cache. Meshes that other objects display are kept, since
+    dropping them would not free anything. Returns the number of bytes freed.
+    """
+
+    object = display_objects[name]
+    data_faces = object.get("faces")
+
+    if data_faces is None or any(
+        other is not object and other.get("faces") is data_faces
+        for other in display_objects.values()
+    ):
+        return 0
+
+    freed = distinct_mesh_bytes([data_faces, object["edges"], object.get("proxy")])
+
+    for key, entry in list(mesh_cache.entries.items()):
+        if entry[0] is data_faces:
+            mesh_cache.remove(key)
+
+    for key in (
+        "faces",
+        "edges",
+        "proxy",
+        "face_mapper",
+        "edge_mapper",
+        "proxy_mapper",
+    ):
+        object.pop(key, None)
+
+    refinements.pop(name, None)
+
+    if composite_scene is not None:
+        composite_scene.remove(name)
+    elif "face_actor" in object:
+        object["face_actor"].SetMapper(None)
+        object["edge_actor"].SetMapper(None)
+
+    return freed
+
+
+def memory_in_use():
+    """
+    Adds up the memory used by the displayed meshes and the tessellation cache.
+    """
+
+    meshes = []
+    for object in display_objects.values():
+        meshes += [object.get("faces"), object.get("edges"), object.get("proxy")]
+
+    for data_faces, data_edges, _ in mesh_cache.entries.values():
+        meshes += [data_faces, data_edges]
+
+    return distinct_mesh_bytes(meshes)
+
+
+def enforce_memory_budget():
+    """
+    Frees memory when the meshes use more than the budget. Cached tessellations
+    that are no longer displayed go first, starting with the least recently
+    used, followed by the meshes of the objects that have been hidden the longest.
+    """
+
+    if memory_budget is None:
+        return
+
+    used = memory_in_use()
+    if used <= memory_budget:
+        return
+
+    displayed = {
+        id(object["faces"]) for object in display_objects.values() if "faces" in object
+    }
+
+    for key, (data_faces, _, size) in list(mesh_cache.entries.items()):
+        if used <= memory_budget:
+            return
+
+        if id(data_faces) not in displayed:
+            mesh_cache.remove(key)
+            used -= size
+
+    hidden = sorted(
+        (object["hidden_at"], name)
+        for name, object in display_objects.items()
+        if not object.get("visible", True) and "faces" in object
+    )
+
+    for _, name in hidden:
+        if used <= memory_budget:
+            return
+
+        used -= drop_meshes(name)
+
+
+def export_scene(path):
+    """
+    Handles the export REPL command, which writes the visible objects to a file
+    from the meshes that are already displayed. The file is written on a
+    separate thread.
+    """
+
+    path = os.path.expanduser(path)
+
+    if os.path.splitext(path)[1].lower() not in writers:
+        print(f"Can only export to {', '.join(writers)} files")
+        return
+
+    parts, loading = scene_parts(display_objects)
+    if not parts:
+        print("There is nothing in the 3D view to export")
+        return
+
+    if loading:
+        print(f"Leaving out {loading} objects that are still being tessellated")
+
+    print(f"Exporting {len(parts)} objects to {path} in the background")
+
+    sceneExporter(path, parts).start()
+
+
+def save_checkpoint():
+    """
+    Starts a new checkpoint that the next statements can be undone to.
+    """
+
+    checkpoints.save(display_objects, dependency_graph.records)
+
+
+def undo_statements(count):
+    """
+    Handles the undo REPL command, which puts the namespace and the 3D view back
+    the way they were before the last count statements.
+    """
+
+    if not checkpoints.enabled:
+        print(
+            "Checkpoints are off, start cq-repl with --checkpoints to be able to undo"
+        )
+        return
+
+    count = min(count, len(checkpoints))
+
+    checkpoint = checkpoints.restore(user_namespace, count)
+    if checkpoint is None:
+        print("Nothing to undo")
+        return
+
+    dependency_graph.records[:] = checkpoint["records"]
+    restore_view(checkpoint["view"])
+
+    print(f"Undid {count} statement{'s' if count > 1 else ''}")
+
+
+def restore_view(view):
+    """
+    Puts the 3D view back the way it was at a checkpoint. The objects that were
+    displayed then still hold their meshes and actors, so they are only added
+    back to the renderer and set up again. The background worker sends the
+    changes to the REPL instead.
+    """
+
+    current = dict(display_objects)
+
+    if mesh_sink is not None:
+        restore_worker_view(current, view)
+        return
+
+    for name, object in current.items():
+        refinements.pop(name, None)
+
+        if composite_scene is not None:
+            composite_scene.invalidate(name)
+        elif "face_actor" in object:
+            renderer.RemoveActor(object["face_actor"])
+            renderer.RemoveActor(object["edge_actor"])
+
+    display_objects.clear()
+
+    for name, object in view.items():
+        display_objects[name] = dict(object)
+
+        # Parts that were still shown as boxes are tessellated again
+        if "pending" in object:
+            streaming[name] = None
+
+        if composite_scene is not None:
+            composite_scene.invalidate(name)
+        elif "face_actor" in object:
+            renderer.AddActor(object["face_actor"])
+            renderer.AddActor(object["edge_actor"])
+
+        if "color" not in object:
+            continue
+
+        if "faces" in object:
+            set_meshes(name, object["faces"], object["edges"])
+        elif object.get("visible", True):
+            restore_meshes(name)
+        elif composite_scene is not None:
+            # The meshes of the hidden object had been dropped to save memory
+            composite_scene.remove(name)
+        else:
+            object["face_actor"].SetMapper(None)
+            object["edge_actor"].SetMapper(None)
+
+        update_attributes(
+            name, object["color"], object["translation"], object["rotation"]
+        )
+
+    request_render()
+
+
+def restore_worker_view(current, view):
+    """
+    Sends the REPL the changes that put its 3D view back the way it was at a
+    checkpoint, when this runs in the background worker. Meshes are only sent
+    for the objects that the REPL does not have them for.
+    """
+
+    for name in current.keys() - view.keys():
+        refinements.pop(name, None)
+        mesh_sink.put(("remove", name))
+
+    display_objects.clear()
+
+    for name, object in view.items():
+        display_objects[name] = dict(object)
+
+        # Parts that were still shown as boxes are tessellated again
+        if "pending" in object:
+            streaming[name] = None
+
+        if "color" not in object:
+            continue
+
+        old = current.get(name, {})
+        if "faces" not in object:
+            if object.get("visible", True):
+                restore_meshes(name)
+        elif old.get("faces") is not object["faces"]:
+            mesh_sink.put(
+                (
+                    "mesh",
+                    name,
+                    polydata_to_arrays(object["faces"]),
+                    polydata_to_arrays(object["edges"]),
+                )
+            )
+
+        mesh_sink.put(
+            (
+                "attributes",
+                name,
+                object["color"],
+                object["translation"],
+                object["rotation"],
+            )
+        )
+        mesh_sink.put(("visible", name, object.get("visible", True)))
+
+
+def invalidate_results(names):
+    """
+    Handles the invalidate REPL command, which drops cached function results.
+    """
+
+    dropped = result_cache.invalidate(names)
+
+    print(f"Dropped {dropped} cached results")
 
 
 def print_license():
@@ -542,6 +2619,116 @@ def print_license():
     print("https://www.gnu.org/licenses/old-licenses/lgpl-2.1.en.html")
 
 
+def print_cache_stats():
+    """
+    Output information on how well the tessellation cache is working.
+    """
+
+    stats = mesh_cache.stats()
+
+    print(f"Tessellation cache: {stats['entries']} entries")
+    print(
+        f"  size => {stats['bytes'] / 1024 / 1024:.1f} MB of {stats['max_bytes'] / 1024 / 1024:.1f} MB"
+    )
+    print(f"  hits => {stats['hits']}")
+    print(f"  misses => {stats['misses']}")
+
+    stats = result_cache.stats()
+
+    print(f"Memoized results: {stats['entries']} of {stats['max_entries']} entries")
+    print(f"  hits => {stats['hits']}")
+    print(f"  misses => {stats['misses']}")
+    print(f"  not cacheable => {stats['uncached']}")
+
+    if disk_cache is None:
+        print("Disk cache: off")
+        return
+
+    stats = disk_cache.stats()
+
+    print(f"Disk cache: {stats['directory']}")
+    print(
+        f"  size => {stats['bytes'] / 1024 / 1024:.1f} MB of {stats['max_bytes'] / 1024 / 1024:.1f} MB"
+    )
+    print(f"  hits => {stats['hits']}")
+    print(f"  misses => {stats['misses']}")
+
+
+def print_memory():
+    """
+    Output the memory used by the meshes and BRep data of each object, and by the
+    CadQuery objects that are kept in the namespace.
+    """
+
+    print(f"Displayed objects: {len(display_objects)}")
+
+    for name, object in display_objects.items():
+        details = []
+
+        if "faces" in object:
+            size = distinct_mesh_bytes(
+                [object["faces"], object["edges"], object.get("proxy")]
+            )
+            shared = any(
+                other is not object and other.get("faces") is object["faces"]
+                for other in display_objects.values()
+            )
+            details.append(
+                f"mesh {format_bytes(size)}" + (" (shared)" if shared else "")
+            )
+        else:
+            details.append("mesh dropped")
+
+        if "shape" in object:
+            details.append(f"BRep {format_bytes(brep_bytes(object['shape']))}")
+
+        if not object.get("visible", True):
+            details.append("hidden")
+
+        print(f"  {name} => {', '.join(details)}")
+
+    used = format_bytes(memory_in_use())
+    if memory_budget is None:
+        print(f"Meshes in memory: {used}, including the tessellation cache")
+    else:
+        print(
+            f"Meshes in memory: {used} of {format_bytes(memory_budget)}, including the tessellation cache"
+        )
+
+    count, shapes = namespace_shapes(user_namespace)
+    print(
+        f"Namespace: {count} CadQuery objects, BRep {format_bytes(sum(map(brep_bytes, shapes)))}"
+    )
+
+
+def print_stats():
+    """
+    Output where the time went in the last update and over the whole session.
+    """
+
+    print("Last update:")
+    for line in format_stats(stage_times):
+        print(f"  {line}")
+
+    print("Session:")
+    for line in format_stats(session_times)[:-2]:
+        print(f"  {line}")
+
+
+def write_profile(profiler, path):
+    """
+    Saves the profile of the session when the REPL exits, and outputs the most expensive calls.
+    """
+
+    import pstats
+
+    profiler.disable()
+    profiler.dump_stats(path)
+
+    print(f"Profile written to {path}")
+    pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+
+
 def print_help():
     """
     Output information on how to use the app.
@@ -551,6 +2738,23 @@ def print_help():
     print("Commands:")
     print("  help => Prints this help message and exits")
     print("  clear => Clears the 3D view, but does not reset the Python interpreter")
+    print("  cache => Outputs the hit/miss statistics of the tessellation cache")
+    print("  stats => Outputs the time taken by each stage of the last update")
+    print("  overlay => Toggles the breakdown of the last update in the 3D view")
+    print("  mem => Outputs the memory used by each object and the namespace")
+    print(
+        "  invalidate [function]... => Drops the cached results of memoized functions"
+    )
+    print("  undo [n] => Undoes the last statement, or the last n statements")
+    print(
+        "  export <path> => Writes the visible objects to an STL, PLY, glTF or GLB file"
+    )
+    print("  hide <label>... => Hides objects without forgetting them")
+    print("  show <label>... => Shows hidden objects again")
+    print("  remove <label>... => Removes objects from the 3D view")
+    print(
+        "  tolerance [coarse] <linear> <angular> => Shows or sets the tessellation tolerances"
+    )
     print("  license => Outputs the license for this software and exits")
     # Output the keybindings for the 3D viewer
     print("Key bindings:")
@@ -566,18 +2770,34 @@ def print_help():
     print("  keypad 9 => top-right view")
 
 
-def main():
-    # So that the version number is kept only in pyproject.toml
-    import pkg_resources
+def package_version(name):
+    """
+    Gets the version of an installed package from its metadata, without importing it.
+    """
+
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def print_import_times():
+    """
+    Output how long it took to show the prompt, create the window and load the libraries.
+    """
+
+    print("Startup times:")
+    for line in format_startup_times(module_loader):
+        print(f"  {line}")
 
-    cur_version = pkg_resources.get_distribution("cq-repl").version
+
+def main():
+    global background_evaluator, file_watcher, repl_server, composite_scene, report_import_times
 
     import argparse
 
     # So that the version number is kept only in pyproject.toml
-    import pkg_resources
-
-    cur_version = pkg_resources.get_distribution("cq-repl").version
+    cur_version = package_version("cq-repl")
 
     # Set up the command line option parser
     parser = argparse.ArgumentParser(
@@ -589,6 +2809,180 @@ def main():
         version=f"%(prog)s {cur_version}",
         help="Outputs the version number of this application and then exits.",
     )
+    parser.add_argument(
+        "--cache-size",
+        type=float,
+        default=512,
+        help="Maximum size in MB of the in-memory tessellation cache.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=os.path.join(
+            os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "cq-repl"
+        ),
+        help="Directory that tessellated meshes are kept in between sessions.",
+    )
+    parser.add_argument(
+        "--stream",
+        type=float,
+        nargs="?",
+        const=50,
+        default=None,
+        metavar="MS",
+        help="Show boxes for the parts of an assembly straight away, and tessellate them over the following ticks, spending up to MS milliseconds per tick (50 by default).",
+    )
+    parser.add_argument(
+        "--checkpoints",
+        type=int,
+        default=0,
+        help="Number of statements that can be undone with the undo command. Off by default.",
+    )
+    parser.add_argument(
+        "--memo-size",
+        type=int,
+        default=128,
+        help="Maximum number of results kept for the functions decorated with memoize.",
+    )
+    parser.add_argument(
+        "--disk-cache-size",
+        type=float,
+        default=2048,
+        help="Maximum size in MB of the on-disk tessellation cache.",
+    )
+    parser.add_argument(
+        "--no-disk-cache",
+        action="store_true",
+        help="Turns off the on-disk tessellation cache.",
+    )
+    parser.add_argument(
+        "--headless",
+        metavar="SCRIPT",
+        help="Runs a script through the REPL with offscreen rendering instead of opening a window, and then exits.",
+    )
+    parser.add_argument(
+        "--timings",
+        metavar="PATH",
+        help="Writes the time taken by each statement of a headless run to a JSON file.",
+    )
+    parser.add_argument(
+        "--no-rerun",
+        action="store_true",
+        help="Turns off running dependent statements again when a name they read is assigned.",
+    )
+    parser.add_argument(
+        "--overlay",
+        action="store_true",
+        help="Shows the time taken by each stage of the last update in the 3D view.",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="Profiles the REPL session with cProfile and writes the stats to a file on exit.",
+    )
+    parser.add_argument(
+        "--watch",
+        metavar="FILE",
+        help="Runs a model file and runs its changed statements again each time it is saved.",
+    )
+    parser.add_argument(
+        "--server",
+        nargs="?",
+        const=default_address(),
+        metavar="ADDRESS",
+        help=f"Accepts code from editors and scripts on a Unix socket path, a local port or a loopback host:port (default: {default_address()}).",
+    )
+    parser.add_argument(
+        "--composite",
+        action="store_true",
+        help="Draws all of the objects with one face and one edge actor, which keeps large assemblies fast to rotate.",
+    )
+    parser.add_argument(
+        "--lod-triangles",
+        type=int,
+        default=10000,
+        help="Parts with more triangles than this are drawn with a simplified mesh of about this size, and without edges, while the camera moves. 0 turns this off.",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=float,
+        default=None,
+        metavar="MB",
+        help="Drops stale tessellations and the meshes of hidden objects when the meshes use more memory than this.",
+    )
+    parser.add_argument(
+        "--import-time",
+        action="store_true",
+        help="Outputs how long startup took, and how long CadQuery and OCP took to load, once they have loaded.",
+    )
+    parser.add_argument(
+        "--background",
+        action="store_true",
+        help="Evaluates statements in a separate process so that the 3D view stays responsive.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used to tessellate the parts of assemblies in parallel.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=1e-3,
+        help="Linear tessellation tolerance, relative to the size of each shape.",
+    )
+    parser.add_argument(
+        "--angular-tolerance",
+        type=float,
+        default=0.1,
+        help="Angular tessellation tolerance in radians.",
+    )
+    parser.add_argument(
+        "--coarse-tolerance",
+        type=float,
+        default=None,
+        help="Shows objects with a coarse mesh of this linear tolerance first, and refines them when the REPL is idle.",
+    )
+    parser.add_argument(
+        "--coarse-angular-tolerance",
+        type=float,
+        default=0.5,
+        help="Angular tolerance in radians of the coarse mesh.",
+    )
+
+    args = parser.parse_args()
+
+    settings = {
+        "cache_size": int(args.cache_size * 1024 * 1024),
+        "memo_size": args.memo_size,
+        "checkpoints": args.checkpoints,
+        "stream_budget": None if args.stream is None else args.stream / 1000,
+        "cache_dir": None if args.no_disk_cache else args.cache_dir,
+        "disk_cache_size": int(args.disk_cache_size * 1024 * 1024),
+        "workers": args.workers,
+        "tolerance": args.tolerance,
+        "angular_tolerance": args.angular_tolerance,
+        "coarse_tolerance": args.coarse_tolerance,
+        "coarse_angular_tolerance": args.coarse_angular_tolerance,
+        "rerun_dependents": not args.no_rerun,
+        "lod_triangles": args.lod_triangles,
+        "memory_budget": (
+            None
+            if args.memory_budget is None
+            else int(args.memory_budget * 1024 * 1024)
+        ),
+        "working_dir": os.getcwd(),
+    }
+    apply_settings(settings)
+
+    # The profile is saved however the session ends
+    if args.profile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+        atexit.register(write_profile, profiler, args.profile)
 
     # Make sure that any user-created modules are found
     this_path = os.getcwd()
@@ -602,10 +2996,63 @@ def main():
 
     # Let the user know we are ready for the next command
     print(">>> ", end="", flush=True)
+    mark_startup("prompt")
+
+    report_import_times = args.import_time
+
+    # The window is only created once the user can start typing
+    create_view()
+
+    # Load CadQuery while the user types the first statement. Importing OCP holds
+    # the GIL for long stretches, so this waits until the prompt and window are up.
+    module_loader.start()
+
+    if args.overlay:
+        toggle_stats_overlay()
+
+    # Pack the objects into blocks of a single dataset instead of giving each one its own actors
+    if args.composite:
+        from cq_repl.composite import compositeScene
+
+        composite_scene = compositeScene()
+        composite_scene.add_to(renderer)
+
+    # Start the worker process for background evaluation and let Ctrl-C cancel what it is doing
+    if args.background:
+        background_evaluator = backgroundEvaluator(settings)
+
+        signal.signal(signal.SIGINT, handle_interrupt)
+
+    # Listen for code from editors and scripts
+    if args.server:
+        try:
+            repl_server = replServer(args.server)
+        except ValueError as error:
+            parser.error(str(error))
+        atexit.register(repl_server.close)
+
+        print(f"Listening for code on {repl_server.describe()}")
+
+    # Run the model file straight away, and again whenever it is saved
+    if args.watch:
+        file_watcher = fileWatcher(args.watch)
+
+        # Let the model import modules that sit next to it
+        sys.path.append(os.path.dirname(os.path.abspath(args.watch)))
 
     repl_cb = replTimerCallback()
 
-    # Create and show the render window
+    # Run a script without a window, for benchmarks and automated runs
+    if args.headless:
+        run_headless(args.headless, args.timings, repl_cb)
+
+        if background_evaluator is not None:
+            background_evaluator.stop()
+
+        return
+
+    # Read the input on its own thread, and create and show the render window
+    repl_cb.start_reader(sys.stdin)
     init_vtkwindow(render_window, renderer, repl_cb)
 
 
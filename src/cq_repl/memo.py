@@ -0,0 +1,285 @@
+import dis
+import types
+import marshal
+import hashlib
+import functools
+from collections import OrderedDict
+
+from cq_repl.mesh_cache import shape_hash
+from cq_repl.checkpoints import copy_value
+from cq_repl.timing import timed
+
+# Values that are compared directly in the keys of cached results
+_plain_types = (bool, int, float, complex, str, bytes, type(None))
+
+
+class uncacheableValue(Exception):
+    """
+    Raised when an argument or global of a memoized function cannot be compared
+    between calls, so that the function is called without using the cache.
+    """
+
+
+@functools.lru_cache(maxsize=1024)
+def code_hash(code):
+    """
+    Hashes the bytecode and constants of a function, including the code of any functions nested in it.
+    """
+
+    return hashlib.sha1(marshal.dumps(code)).hexdigest()
+
+
+# Instructions that look a name up in the globals of a function
+_global_opnames = {"LOAD_GLOBAL", "LOAD_NAME", "STORE_GLOBAL", "DELETE_GLOBAL"}
+
+
+@functools.lru_cache(maxsize=1024)
+def global_names(code):
+    """
+    Lists the names that a function's code, or the code nested in it, looks up
+    as globals. Attribute names are left out, so that a global which happens to
+    have the same name as an attribute is not part of the key.
+    """
+
+    names = {
+        instruction.argval
+        for instruction in dis.get_instructions(code)
+        if instruction.opname in _global_opnames
+    }
+
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= global_names(const)
+
+    return frozenset(names)
+
+
+class keyBuilder:
+    """
+    Creates the key for a call of a memoized function. The globals of the
+    functions that the user defined in the REPL namespace are followed, so that
+    a change to a helper function or a parameter it reads changes the key.
+    Functions from other modules, including the REPL's own functions like
+    show_object, are keyed by their code only.
+    """
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self.seen = set()
+
+    def function_key(self, function):
+        """
+        Creates a key for a function from its code, its defaults and closure, and
+        the values of the globals it uses. Functions that call each other are only
+        followed once.
+        """
+
+        # Memoized functions are keyed by the function that they wrap
+        function = getattr(function, "__wrapped__", function)
+        code = function.__code__
+
+        if id(function) in self.seen or function.__globals__ is not self.namespace:
+            return (
+                "function",
+                function.__module__,
+                function.__qualname__,
+                code_hash(code),
+            )
+        self.seen.add(id(function))
+
+        used_globals = tuple(
+            (name, self.value_key(function.__globals__[name]))
+            for name in sorted(global_names(code))
+            if name in function.__globals__
+        )
+
+        closure = tuple(
+            self.value_key(cell.cell_contents) for cell in function.__closure__ or ()
+        )
+
+        return (
+            "function",
+            function.__qualname__,
+            code_hash(code),
+            self.value_key(function.__defaults__),
+            self.value_key(function.__kwdefaults__),
+            closure,
+            used_globals,
+        )
+
+    def value_key(self, value):
+        """
+        Creates a key for a value that stays the same for equal values.
+        """
+
+        if isinstance(value, _plain_types):
+            # True and 1 are equal, so the type is part of the key
+            return (type(value).__name__, value)
+
+        if isinstance(value, (tuple, list)):
+            return (type(value).__name__, tuple(self.value_key(item) for item in value))
+
+        if isinstance(value, dict):
+            return (
+                "dict",
+                tuple((self.value_key(k), self.value_key(v)) for k, v in value.items()),
+            )
+
+        if isinstance(value, (set, frozenset)):
+            return ("set", frozenset(self.value_key(item) for item in value))
+
+        if isinstance(value, types.ModuleType):
+            return ("module", value.__name__)
+
+        if isinstance(value, types.FunctionType):
+            return self.function_key(value)
+
+        # Classes are compared by identity, so a class that is defined again is a different key
+        if isinstance(value, type):
+            return ("class", value)
+
+        if type(value).__module__.startswith("cadquery"):
+            return self.cadquery_key(value)
+
+        # Objects that are only equal to themselves could be changed in place without changing the key
+        if type(value).__hash__ in (None, object.__hash__):
+            raise uncacheableValue(type(value).__name__)
+
+        return ("object", value)
+
+    def cadquery_key(self, value):
+        """
+        Creates a key for a CadQuery object. Shapes are keyed by their geometry,
+        and Workplanes by their plane, the objects on their stack and the
+        Workplanes they were made from.
+        """
+
+        import cadquery as cq
+
+        if isinstance(value, (cq.Vector, cq.Location, cq.Color)):
+            return (type(value).__name__, value.toTuple())
+
+        if isinstance(value, cq.Plane):
+            return (
+                "Plane",
+                value.origin.toTuple(),
+                value.xDir.toTuple(),
+                value.zDir.toTuple(),
+            )
+
+        if isinstance(value, cq.Shape):
+            return ("Shape", shape_hash(value))
+
+        if isinstance(value, cq.Workplane):
+            return (
+                "Workplane",
+                self.cadquery_key(value.plane),
+                tuple(self.value_key(item) for item in value.objects),
+                None if value.parent is None else self.cadquery_key(value.parent),
+            )
+
+        # Assemblies and sketches are changed in place
+        raise uncacheableValue(type(value).__name__)
+
+
+def copy_result(value):
+    """
+    Copies a cached result for a hit. The REPL labels the object that a statement
+    assigns, so two names assigned from calls with the same arguments must not
+    end up with the same object. The copies share their shapes with the cached
+    result, so they are not tessellated again.
+    """
+
+    if type(value) in (tuple, list):
+        return type(value)(copy_value(item) for item in value)
+
+    return copy_value(value)
+
+
+class resultCache:
+    """
+    Least recently used cache of the results of memoized functions. Results are
+    keyed by the code of the function and the values of its arguments and of the
+    globals it uses, so changing any of them runs the function again. A hit
+    returns a shallow copy of what the function returned the first time.
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.uncached = 0
+
+        # Functions that have been reported as not cacheable, so that they are only reported once
+        self.reported = set()
+
+    def memoize(self, function):
+        """
+        Wraps a function so that its results are cached.
+        """
+
+        @functools.wraps(function)
+        def memoized(*args, **kwargs):
+            try:
+                with timed("memo"):
+                    builder = keyBuilder(function.__globals__)
+                    key = (
+                        builder.function_key(function),
+                        builder.value_key(args),
+                        builder.value_key(kwargs),
+                    )
+            except uncacheableValue as error:
+                self.uncached += 1
+
+                if function.__qualname__ not in self.reported:
+                    self.reported.add(function.__qualname__)
+                    print(
+                        f"{function.__qualname__} is not being cached, since it uses a {error} that can be changed in place"
+                    )
+
+                return function(*args, **kwargs)
+
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+
+                return copy_result(self.entries[key])
+
+            self.misses += 1
+
+            result = function(*args, **kwargs)
+
+            self.entries[key] = result
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+            return result
+
+        return memoized
+
+    def invalidate(self, names=()):
+        """
+        Drops the cached results of the functions with the given names, or all of
+        them if no names are given. Returns the number of results dropped.
+        """
+
+        stale = [key for key in self.entries if not names or key[0][1] in names]
+
+        for key in stale:
+            del self.entries[key]
+
+        return len(stale)
+
+    def stats(self):
+        """
+        Returns a summary of how the cache is being used.
+        """
+
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "uncached": self.uncached,
+        }
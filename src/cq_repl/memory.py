@@ -0,0 +1,68 @@
+from cq_repl.tessellation import shape_to_bytes
+
+
+def mesh_bytes(data):
+    """
+    Gets the memory used by a face or edge mesh in bytes. VTK reports it in kibibytes.
+    """
+
+    return data.GetActualMemorySize() * 1024
+
+
+def distinct_mesh_bytes(meshes):
+    """
+    Adds up the memory used by a list of meshes, counting meshes that appear more than once only once.
+    """
+
+    sizes = {id(data): mesh_bytes(data) for data in meshes if data is not None}
+
+    return sum(sizes.values())
+
+
+def brep_bytes(shape):
+    """
+    Gets the size of a shape's BRep data, measured as the size of its serialized form.
+    """
+
+    return len(shape_to_bytes(shape))
+
+
+def namespace_shapes(namespace):
+    """
+    Finds the distinct shapes held by the CadQuery objects in a namespace, which
+    includes the intermediate Workplanes of a model that are kept alive by the
+    variables they are assigned to. Returns the number of objects and the shapes.
+    """
+
+    import cadquery as cq
+
+    count = 0
+    shapes = {}
+
+    for value in list(namespace.values()):
+        if isinstance(value, cq.Workplane):
+            values = value.vals()
+        elif isinstance(value, cq.Shape):
+            values = [value]
+        elif isinstance(value, cq.Assembly):
+            values = [value.toCompound()]
+        else:
+            continue
+
+        count += 1
+        for shape in values:
+            if isinstance(shape, cq.Shape):
+                shapes[hash(shape.wrapped)] = shape
+
+    return count, list(shapes.values())
+
+
+def format_bytes(size):
+    """
+    Formats a number of bytes in MB, or in KB for small sizes.
+    """
+
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+
+    return f"{size / 1024 / 1024:.1f} MB"
@@ -0,0 +1,335 @@
+import io
+import os
+import re
+import shutil
+import hashlib
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+
+from vtkmodules.vtkCommonCore import vtkPoints
+from vtkmodules.vtkCommonDataModel import vtkPolyData, vtkCellArray
+from vtkmodules.util.numpy_support import (
+    vtk_to_numpy,
+    numpy_to_vtk,
+    numpy_to_vtkIdTypeArray,
+)
+
+# Matches the TShape flag lines of a BRep file, which change when a shape is meshed
+_flags_line = re.compile(rb"^[01]{7}$", re.MULTILINE)
+
+
+def shape_hash(shape):
+    """
+    Creates a hash of the geometry of a CadQuery shape. The hash is based on the
+    serialized BRep data without any triangulation or flags, so it stays the same
+    for the same geometry no matter how many times the shape has been tessellated.
+    """
+
+    # OCP is imported when it is needed, so that the REPL can start before it has loaded
+    from OCP.BRepTools import BRepTools
+    from OCP.TopTools import TopTools_FormatVersion_VERSION_1
+
+    stream = io.BytesIO()
+    BRepTools.Write_s(
+        shape.wrapped, stream, False, False, TopTools_FormatVersion_VERSION_1
+    )
+
+    return hashlib.sha1(_flags_line.sub(b"", stream.getvalue())).hexdigest()
+
+
+def polydata_to_arrays(data):
+    """
+    Flattens a face or edge mesh into a dict of NumPy arrays so that it can be
+    passed between processes or written to disk.
+    """
+
+    arrays = {"points": vtk_to_numpy(data.GetPoints().GetData())}
+
+    normals = data.GetPointData().GetArray("Normals")
+    if normals is not None:
+        arrays["normals"] = vtk_to_numpy(normals)
+
+    # Each kind of cell is stored as a pair of offset and connectivity arrays
+    for kind, cells in (
+        ("verts", data.GetVerts()),
+        ("lines", data.GetLines()),
+        ("polys", data.GetPolys()),
+    ):
+        if cells.GetNumberOfCells() > 0:
+            arrays[kind + "_offsets"] = vtk_to_numpy(cells.GetOffsetsArray())
+            arrays[kind + "_connectivity"] = vtk_to_numpy(cells.GetConnectivityArray())
+
+    return arrays
+
+
+def polydata_from_arrays(arrays):
+    """
+    Rebuilds a face or edge mesh from the arrays created by polydata_to_arrays.
+    The arrays are used in place rather than copied.
+    """
+
+    data = vtkPolyData()
+
+    points = vtkPoints()
+    points.SetData(numpy_to_vtk(arrays["points"]))
+    data.SetPoints(points)
+
+    if "normals" in arrays:
+        normals = numpy_to_vtk(arrays["normals"])
+        normals.SetName("Normals")
+        data.GetPointData().SetNormals(normals)
+
+    for kind, setter in (
+        ("verts", data.SetVerts),
+        ("lines", data.SetLines),
+        ("polys", data.SetPolys),
+    ):
+        if kind + "_offsets" in arrays:
+            cells = vtkCellArray()
+            cells.SetData(
+                numpy_to_vtkIdTypeArray(arrays[kind + "_offsets"]),
+                numpy_to_vtkIdTypeArray(arrays[kind + "_connectivity"]),
+            )
+            setter(cells)
+
+    return data
+
+
+class meshCache:
+    """
+    In-memory least recently used cache of tessellated face and edge meshes.
+    The total size of the cached meshes is kept under a byte budget.
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        """
+        Returns the (faces, edges) pair stored for the key, or None if it is not cached.
+        """
+
+        if key not in self.entries:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+
+        # Mark the entry as the most recently used one
+        self.entries.move_to_end(key)
+
+        return self.entries[key][:2]
+
+    def put(self, key, faces, edges):
+        """
+        Stores the face and edge meshes for a key, evicting the least recently
+        used entries when the byte budget is exceeded.
+        """
+
+        # VTK reports the memory size in kibibytes
+        size = (faces.GetActualMemorySize() + edges.GetActualMemorySize()) * 1024
+
+        # A mesh that can never fit is not worth evicting everything else for
+        if size > self.max_bytes:
+            return
+
+        if key in self.entries:
+            self.total_bytes -= self.entries.pop(key)[2]
+
+        self.entries[key] = (faces, edges, size)
+        self.total_bytes += size
+
+        while self.total_bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.total_bytes -= evicted[2]
+
+    def remove(self, key):
+        """
+        Removes the meshes stored for a key, if there are any.
+        """
+
+        if key in self.entries:
+            self.total_bytes -= self.entries.pop(key)[2]
+
+    def clear(self):
+        """
+        Removes all of the cached meshes, but leaves the hit/miss counts alone.
+        """
+
+        self.entries.clear()
+        self.total_bytes = 0
+
+    def stats(self):
+        """
+        Returns a summary of how the cache is being used.
+        """
+
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class diskMeshCache:
+    """
+    Cache of tessellated meshes that is kept on disk between REPL sessions. Each
+    entry is a directory of .npy files, one per mesh array, so that the arrays can
+    be memory-mapped when they are loaded. The least recently used entries are
+    removed when the total size goes over the byte budget.
+    """
+
+    def __init__(self, directory, max_bytes=2048 * 1024 * 1024, version=""):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = version
+        self.total_bytes = None
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+    def entry_path(self, key):
+        """
+        Gets the directory that the meshes for a key are stored in. The library
+        versions are part of the key, since a different version may mesh differently.
+        """
+
+        name = hashlib.sha1(repr((key, self.version)).encode()).hexdigest()
+
+        return os.path.join(self.directory, name[:2], name)
+
+    def get(self, key):
+        """
+        Returns the (faces, edges) arrays stored for the key, or None if they are not cached.
+        """
+
+        path = self.entry_path(key)
+
+        try:
+            arrays = ({}, {})
+            for file_name in os.listdir(path):
+                mesh, array = file_name[: -len(".npy")].split(".")
+                arrays[mesh == "edges"][array] = np.load(
+                    os.path.join(path, file_name), mmap_mode="r"
+                )
+
+            # Keep track of when the entry was last used for eviction
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+
+        return arrays
+
+    def put(self, key, face_arrays, edge_arrays):
+        """
+        Writes the face and edge arrays for a key to the cache directory.
+        """
+
+        path = self.entry_path(key)
+        if os.path.isdir(path):
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary directory first so that other sessions never see partial entries
+        temp_path = tempfile.mkdtemp(dir=os.path.dirname(path))
+        size = 0
+        for mesh, arrays in (("faces", face_arrays), ("edges", edge_arrays)):
+            for array, data in arrays.items():
+                file_path = os.path.join(temp_path, f"{mesh}.{array}.npy")
+                np.save(file_path, np.ascontiguousarray(data))
+                size += os.path.getsize(file_path)
+
+        try:
+            os.rename(temp_path, path)
+        except OSError:
+            # Another session stored the same meshes first
+            shutil.rmtree(temp_path, ignore_errors=True)
+            return
+
+        if self.total_bytes is None:
+            self.total_bytes = self.size()
+        else:
+            self.total_bytes += size
+
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def entries(self):
+        """
+        Lists the (last used time, size, path) of each entry in the cache directory.
+        """
+
+        entries = []
+        for prefix in os.listdir(self.directory):
+            prefix_path = os.path.join(self.directory, prefix)
+            if not os.path.isdir(prefix_path):
+                continue
+
+            for name in os.listdir(prefix_path):
+                path = os.path.join(prefix_path, name)
+
+                # Skip entries that are still being written
+                if name.startswith("tmp"):
+                    continue
+
+                try:
+                    size = sum(
+                        os.path.getsize(os.path.join(path, file_name))
+                        for file_name in os.listdir(path)
+                    )
+                    entries.append((os.path.getmtime(path), size, path))
+                except OSError:
+                    continue
+
+        return entries
+
+    def size(self):
+        """
+        Adds up the size of all the entries in the cache directory.
+        """
+
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache is back under its budget.
+        """
+
+        entries = sorted(self.entries())
+        self.total_bytes = sum(size for _, size, _ in entries)
+
+        for _, size, path in entries:
+            if self.total_bytes <= self.max_bytes:
+                break
+
+            shutil.rmtree(path, ignore_errors=True)
+            self.total_bytes -= size
+
+    def stats(self):
+        """
+        Returns a summary of how the cache is being used.
+        """
+
+        return {
+            "directory": self.directory,
+            "bytes": self.total_bytes if self.total_bytes is not None else self.size(),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
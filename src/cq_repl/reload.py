@@ -0,0 +1,270 @@
+import os
+import ast
+import sys
+import hashlib
+import importlib
+import sysconfig
+
+# Top-level packages that take seconds to load and are never changed by the user
+_protected_packages = {"cadquery", "OCP", "OCP_stubs", "vtk", "vtkmodules", "cq_repl"}
+
+
+def _installed_paths():
+    """
+    Lists the directories that installed packages live in, including a virtual
+    environment that happens to be inside the user's working directory.
+    """
+
+    paths = {sys.prefix, sys.base_prefix, sys.exec_prefix}
+    paths |= {sysconfig.get_path(name) for name in ("purelib", "platlib", "stdlib")}
+
+    return [os.path.realpath(path) for path in paths if path]
+
+
+def _is_under(path, directory):
+    """
+    Checks whether a path is inside a directory.
+    """
+
+    try:
+        return os.path.commonpath([path, directory]) == directory
+    except ValueError:
+        # Paths on different drives
+        return False
+
+
+def module_imports(name, source, is_package):
+    """
+    Finds the absolute names of the modules that a module's source imports,
+    including the submodules named by statements like from package import module.
+    """
+
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        # The error is raised when the module is reloaded
+        return set()
+
+    # Relative imports are resolved against the package that the module is in
+    package = name if is_package else name.rpartition(".")[0]
+
+    imports = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports |= {alias.name for alias in node.names}
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ""
+            if node.level:
+                parent = (
+                    package.rsplit(".", node.level - 1)[0]
+                    if node.level > 1
+                    else package
+                )
+                base = f"{parent}.{base}" if base else parent
+
+            imports.add(base)
+            imports |= {
+                f"{base}.{alias.name}" for alias in node.names if alias.name != "*"
+            }
+
+    return imports
+
+
+class moduleReloader:
+    """
+    Keeps the user's own modules up to date between statements. The modules that
+    were loaded from files under the working directory are tracked by the mtime,
+    size and hash of their source. When one of them changes, it is reloaded,
+    followed by the tracked modules that import it, so that names they imported
+    from it are bound again. Installed packages are never reloaded.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.realpath(root)
+        self.installed = _installed_paths()
+
+        # File, mtime, size and source hash of each tracked module when it was last loaded
+        self.signatures = {}
+
+        # Names of the tracked modules that each tracked module imports
+        self.imports = {}
+
+        # Modules that are not the user's, so that their paths are only checked once
+        self.ignored = set()
+
+    def user_file(self, name, module):
+        """
+        Gets the source file of a module if it is one of the user's own modules, or None.
+        """
+
+        if name.split(".")[0] in _protected_packages:
+            return None
+
+        path = getattr(module, "__file__", None)
+        if not path or not path.endswith(".py"):
+            return None
+
+        path = os.path.realpath(path)
+        if not _is_under(path, self.root):
+            return None
+
+        # A virtual environment can be inside the project
+        if any(_is_under(path, directory) for directory in self.installed):
+            return None
+
+        return path
+
+    def signature(self, path, previous=None):
+        """
+        Gets the signature of a module's source file. The file is only hashed when
+        its mtime or size changed, so that touching a file does not reload it.
+        """
+
+        stat = os.stat(path)
+
+        if previous is not None and previous[1:3] == (stat.st_mtime_ns, stat.st_size):
+            return previous
+
+        with open(path, "rb") as source_file:
+            source = source_file.read()
+
+        return (path, stat.st_mtime_ns, stat.st_size, hashlib.sha1(source).hexdigest())
+
+    def track(self):
+        """
+        Starts tracking the user modules that have been imported since the last call.
+        """
+
+        # Another thread can be importing modules at the same time
+        for name, module in list(sys.modules.items()):
+            if name in self.signatures or name in self.ignored or module is None:
+                continue
+
+            path = self.user_file(name, module)
+            if path is None:
+                self.ignored.add(name)
+                continue
+
+            try:
+                self.record(name, path)
+            except OSError:
+                continue
+
+    def record(self, name, path):
+        """
+        Stores the signature of a module's source and the modules it imports.
+        """
+
+        stat = os.stat(path)
+
+        with open(path, "rb") as source_file:
+            source = source_file.read()
+
+        self.signatures[name] = (
+            path,
+            stat.st_mtime_ns,
+            stat.st_size,
+            hashlib.sha1(source).hexdigest(),
+        )
+
+        is_package = os.path.basename(path) == "__init__.py"
+        self.imports[name] = module_imports(name, source, is_package)
+
+    def forget(self, name):
+        """
+        Stops tracking a module and removes it from sys.modules, so that importing it again fails cleanly.
+        """
+
+        self.signatures.pop(name, None)
+        self.imports.pop(name, None)
+        sys.modules.pop(name, None)
+
+    def changed(self):
+        """
+        Finds the tracked modules whose source changed since they were loaded.
+        Modules whose files were deleted are forgotten.
+        """
+
+        changed = set()
+
+        for name, previous in list(self.signatures.items()):
+            try:
+                current = self.signature(previous[0], previous)
+            except OSError:
+                self.forget(name)
+                continue
+
+            if current[3] != previous[3]:
+                changed.add(name)
+            else:
+                # Keep the new mtime, so that the file is not hashed again
+                self.signatures[name] = current
+
+        return changed
+
+    def reload_order(self, changed):
+        """
+        Orders the changed modules and the modules that depend on them, so that
+        each module is reloaded after the modules it imports.
+        """
+
+        # Modules that import each tracked module
+        importers = {}
+        for name, imports in self.imports.items():
+            for imported in imports:
+                if imported in self.signatures and imported != name:
+                    importers.setdefault(imported, set()).add(name)
+
+        stale = set()
+        pending = list(changed)
+        while pending:
+            name = pending.pop()
+            if name not in stale:
+                stale.add(name)
+                pending.extend(importers.get(name, ()))
+
+        order = []
+        visited = set()
+
+        def visit(name):
+            if name in visited:
+                return
+            visited.add(name)
+
+            for imported in sorted(self.imports.get(name, ())):
+                if imported in stale:
+                    visit(imported)
+
+            order.append(name)
+
+        # Circular imports are reloaded in the order they are reached
+        for name in sorted(stale):
+            visit(name)
+
+        return order
+
+    def refresh(self):
+        """
+        Reloads the tracked modules that changed, and the modules that import
+        them. Returns the modules that were reloaded. A module that fails to
+        reload is tried again the next time.
+        """
+
+        order = self.reload_order(self.changed())
+
+        reloaded = []
+        for name in order:
+            module = sys.modules.get(name)
+            if module is None:
+                self.forget(name)
+                continue
+
+            importlib.reload(module)
+            self.record(name, self.signatures[name][0])
+
+            reloaded.append(module)
+
+        # Reloading can import new modules
+        self.track()
+
+        return reloaded
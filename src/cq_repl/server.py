@@ -0,0 +1,221 @@
+import os
+import json
+import stat
+import queue
+import socket
+import struct
+import tempfile
+import threading
+import socketserver
+
+# Each message is a JSON object, preceded by its length in bytes
+_header = struct.Struct("!I")
+
+
+def default_address():
+    """
+    Gets the path of the Unix socket that the REPL listens on when no address is given.
+    """
+
+    directory = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+
+    return os.path.join(directory, "cq-repl.sock")
+
+
+def parse_address(address):
+    """
+    Turns a server address into either a Unix socket path, or a (host, port) pair
+    for a TCP socket. TCP addresses are given as a port, or as host:port.
+    """
+
+    if address.isdigit():
+        return ("127.0.0.1", int(address))
+
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit() and os.sep not in address:
+        return (host, int(port))
+
+    return address
+
+
+def send_message(stream, message):
+    """
+    Writes a JSON message to a socket or socket file.
+    """
+
+    data = json.dumps(message).encode()
+
+    if hasattr(stream, "sendall"):
+        stream.sendall(_header.pack(len(data)) + data)
+    else:
+        stream.write(_header.pack(len(data)) + data)
+        stream.flush()
+
+
+def receive_message(stream):
+    """
+    Reads a JSON message from a socket file. Returns None once the other end has closed the connection.
+    """
+
+    header = stream.read(_header.size)
+    if len(header) < _header.size:
+        return None
+
+    (length,) = _header.unpack(header)
+
+    data = stream.read(length)
+    if len(data) < length:
+        return None
+
+    return json.loads(data)
+
+
+class replClient:
+    """
+    A connection from an editor or script. Replies are sent from the REPL's main
+    thread, so sending is locked in case a client has several requests in flight.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.lock = threading.Lock()
+
+    def send(self, message):
+        """
+        Sends a reply, ignoring clients that have already gone away.
+        """
+
+        with self.lock:
+            try:
+                send_message(self.connection, message)
+            except OSError:
+                pass
+
+
+class _requestHandler(socketserver.StreamRequestHandler):
+    """
+    Runs on its own thread for each client, and passes the client's requests on
+    to the REPL. The requests are run on the main thread along with the 3D view.
+    """
+
+    def handle(self):
+        client = replClient(self.connection)
+
+        while True:
+            try:
+                message = receive_message(self.rfile)
+            except (OSError, ValueError):
+                break
+
+            if message is None:
+                break
+
+            if not isinstance(message, dict):
+                client.send({"ok": False, "error": "Requests must be JSON objects"})
+                continue
+
+            self.server.requests.put((client, message))
+
+
+class _unixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def is_loopback(host):
+    """
+    Checks whether a host name or address only accepts connections from this machine.
+    """
+
+    try:
+        addresses = socket.getaddrinfo(host, None, socket.AF_INET)
+    except socket.gaierror:
+        return False
+
+    return all(address[4][0].startswith("127.") for address in addresses)
+
+
+def is_listening(path):
+    """
+    Checks whether something is accepting connections on a Unix socket.
+    """
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(path)
+    except OSError:
+        return False
+    finally:
+        connection.close()
+
+    return True
+
+
+class _tcpServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class replServer:
+    """
+    Listens on a Unix socket or a local TCP port for code to run in the REPL.
+    Any number of clients can be connected, and their requests are queued up
+    for the REPL to handle on its timer ticks.
+    """
+
+    def __init__(self, address):
+        self.address = parse_address(address)
+        self.requests = queue.Queue()
+
+        # Anyone who can connect can run code, and there is no authentication
+        if isinstance(self.address, tuple) and not is_loopback(self.address[0]):
+            raise ValueError(
+                f"The server only listens on this machine, {self.address[0]} is not a loopback address"
+            )
+
+        if isinstance(self.address, tuple):
+            self.server = _tcpServer(self.address, _requestHandler)
+        else:
+            # Clean up after a REPL that did not shut down properly, but leave other
+            # files and the sockets of REPLs that are still running alone
+            if os.path.lexists(self.address):
+                if not stat.S_ISSOCK(os.lstat(self.address).st_mode):
+                    raise ValueError(f"{self.address} exists and is not a socket")
+
+                if is_listening(self.address):
+                    raise ValueError(
+                        f"Another REPL is already listening on {self.address}"
+                    )
+
+                os.remove(self.address)
+
+            # Only the user should be able to send code to run
+            old_umask = os.umask(0o177)
+            try:
+                self.server = _unixServer(self.address, _requestHandler)
+            finally:
+                os.umask(old_umask)
+
+        self.server.requests = self.requests
+
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def describe(self):
+        """
+        Gets the address that clients should connect to.
+        """
+
+        if isinstance(self.address, tuple):
+            return f"{self.address[0]}:{self.server.server_address[1]}"
+
+        return self.address
+
+    def close(self):
+        """
+        Stops listening, and removes the Unix socket.
+        """
+
+        self.server.shutdown()
+        self.server.server_close()
+
+        if not isinstance(self.address, tuple) and os.path.exists(self.address):
+            os.remove(self.address)
@@ -0,0 +1,101 @@
+import time
+import threading
+import importlib
+
+# When the REPL started loading, which the startup times are measured from
+load_start = time.perf_counter()
+
+# Seconds from the start of loading until each step of startup was done
+startup_times = {}
+
+
+def mark_startup(step):
+    """
+    Records how long it took from the start of loading until a step of startup was done.
+    """
+
+    startup_times.setdefault(step, time.perf_counter() - load_start)
+
+
+class moduleLoader:
+    """
+    Imports modules on a thread, so that the REPL can show its prompt while
+    CadQuery and OCP, which take seconds to import, are still loading. Code that
+    imports one of the modules as usual waits for the thread to finish loading
+    it, since Python only lets one thread import a module at a time.
+    """
+
+    def __init__(self, modules):
+        self.modules = modules
+        self.times = {}
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self.load, daemon=True)
+
+    def start(self):
+        """
+        Starts loading the modules in the background.
+        """
+
+        self.thread.start()
+
+    def load(self):
+        """
+        Runs on the loader thread and imports each of the modules in turn.
+        """
+
+        for name in self.modules:
+            start = time.perf_counter()
+
+            try:
+                importlib.import_module(name)
+            except Exception:
+                # The error is raised again when the module is needed
+                pass
+
+            self.times[name] = time.perf_counter() - start
+
+        mark_startup("modules loaded")
+
+        self.done.set()
+
+    def wait(self):
+        """
+        Waits until all of the modules have been loaded, if they are being loaded in the background.
+        """
+
+        if self.thread.ident is None:
+            return
+
+        start = time.perf_counter()
+        self.thread.join()
+
+        startup_times.setdefault("waited for loading", time.perf_counter() - start)
+
+    def require(self, name):
+        """
+        Imports a module that a statement needs, waiting for the loader thread if
+        it is still loading it. The first wait for each module is recorded.
+        """
+
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+
+        startup_times.setdefault(f"waited for {name}", time.perf_counter() - start)
+
+        return module
+
+
+def format_startup_times(loader):
+    """
+    Formats the startup times, and how long each of the background imports took, as lines of text.
+    """
+
+    lines = [
+        f"{step}: {seconds * 1000:.0f} ms" for step, seconds in startup_times.items()
+    ]
+    lines += [
+        f"import {name}: {seconds * 1000:.0f} ms"
+        for name, seconds in loader.times.items()
+    ]
+
+    return lines
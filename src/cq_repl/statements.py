@@ -0,0 +1,215 @@
+import io
+import ast
+import time
+import tokenize
+import functools
+
+# Clauses that continue a compound statement even though they are not indented
+_continuations = ("else", "elif", "except", "finally")
+
+# Keywords that start statements which can have more indented lines after them
+_compound = ("def", "class", "if", "for", "while", "with", "try", "async", "@")
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_statement(source, symbol="single"):
+    """
+    Compiles a complete statement. The code objects are cached, so statements that
+    are run again, like dependents and the lines of a watched file, are only compiled once.
+    """
+
+    return compile(source, "<input>", symbol)
+
+
+def is_statement(source):
+    """
+    Checks whether the source compiles as Python, so that REPL commands which
+    look like code, like "show = 1", are run as code.
+    """
+
+    try:
+        compile_statement(source)
+    except (SyntaxError, ValueError):
+        return False
+
+    return True
+
+
+@functools.lru_cache(maxsize=1024)
+def assignment_targets(source):
+    """
+    Finds the names that a statement assigns with "=" at the top level, like x in
+    "x=1", a and b in "a = b = box()" or "a, b = parts", in the order that they
+    appear. Returns an empty tuple if the statement cannot be parsed.
+    """
+
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return ()
+
+    names = []
+    for node in tree.body:
+        if not isinstance(node, ast.Assign):
+            continue
+
+        for target in node.targets:
+            elements = (
+                target.elts if isinstance(target, (ast.Tuple, ast.List)) else [target]
+            )
+            for element in elements:
+                if isinstance(element, ast.Name) and element.id not in names:
+                    names.append(element.id)
+
+    return tuple(names)
+
+
+def scan_statement(source):
+    """
+    Checks whether the source could be a complete statement, and whether it is a
+    compound statement, using the tokenizer rather than the compiler. Brackets and
+    strings have to be closed, and the source must not end with a block header
+    like "def f():" or a decorator that still needs its function.
+    """
+
+    logical_lines = []
+    current = []
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(source).readline):
+            if token.type == tokenize.NEWLINE:
+                logical_lines.append(current)
+                current = []
+            elif token.type not in (
+                tokenize.NL,
+                tokenize.COMMENT,
+                tokenize.INDENT,
+                tokenize.DEDENT,
+                tokenize.ENDMARKER,
+            ):
+                current.append(token)
+    except tokenize.TokenError:
+        # An open bracket, string or line continuation
+        return False, False
+    except SyntaxError:
+        # Let the compiler report the error
+        return True, False
+
+    if not logical_lines:
+        return False, False
+
+    first, last = logical_lines[0], logical_lines[-1]
+
+    # match is only a keyword when it starts a block
+    compound = first[0].string in _compound or (
+        first[0].string == "match" and first[-1].string == ":"
+    )
+    complete = last[-1].string != ":" and last[0].string != "@"
+
+    return complete, compound
+
+
+class statementAccumulator:
+    """
+    Collects lines of REPL input into complete top-level statements. Simple
+    statements are ready as soon as they are complete. Compound statements like
+    def, class, for and with blocks are ready when the next top-level line
+    arrives. A pasted block is also ready once no more input has arrived for a
+    short time, so blank lines inside a pasted function do not end it early,
+    while a block that is typed in ends with a blank line like in the Python REPL.
+    """
+
+    def __init__(self, idle_time=0.05):
+        self.lines = []
+        self.idle_time = idle_time
+        self.last_line_time = 0.0
+        self.typed = False
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def add(self, line):
+        """
+        Adds a line of input, and returns the statements that it completed.
+        """
+
+        ready = []
+
+        # Blank lines and comments on their own have nothing to run
+        if not self.lines and (not line.strip() or line.strip().startswith("#")):
+            return ready
+
+        # A new top-level line ends the compound statement before it
+        if (
+            self.lines
+            and line.strip()
+            and not line[0].isspace()
+            and not line.startswith("#")
+            and line.split()[0].rstrip(":") not in _continuations
+            and scan_statement(self.source())[0]
+        ):
+            ready.append(self.take())
+
+        # Lines that arrive slowly are being typed rather than pasted
+        now = time.monotonic()
+        if self.lines and now - self.last_line_time > self.idle_time:
+            self.typed = True
+
+        self.lines.append(line)
+        self.last_line_time = now
+
+        complete, compound = scan_statement(self.source())
+        if complete and not compound:
+            ready.append(self.take())
+
+        return ready
+
+    def flush(self, end_of_input=False):
+        """
+        Returns the buffered compound statement once the input has gone quiet and
+        it is complete, or None if it is not ready. At the end of the input, a
+        complete statement is always ready.
+        """
+
+        if not self.lines:
+            return None
+
+        if not end_of_input:
+            if time.monotonic() - self.last_line_time < self.idle_time:
+                return None
+
+            if self.typed and self.lines[-1].strip():
+                return None
+
+        if not scan_statement(self.source())[0]:
+            return None
+
+        return self.take()
+
+    def source(self):
+        """
+        Joins the buffered lines into the source of a statement.
+        """
+
+        return "".join(self.lines)
+
+    def take(self):
+        """
+        Removes the buffered statement and returns its source.
+        """
+
+        source = self.source()
+        if not source.endswith("\n"):
+            source += "\n"
+
+        self.lines = []
+        self.typed = False
+
+        return source
+
+    def clear(self):
+        """
+        Drops any partly entered statement.
+        """
+
+        self.lines = []
+        self.typed = False
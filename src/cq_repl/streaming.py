@@ -0,0 +1,50 @@
+from math import dist
+
+from vtkmodules.vtkCommonDataModel import vtkPolyData
+from vtkmodules.vtkFiltersSources import vtkCubeSource, vtkOutlineSource
+
+
+def placeholder_meshes(bounds):
+    """
+    Creates a box and its outline to stand in for a part until it has been
+    tessellated. The bounds are a CadQuery BoundBox.
+    """
+
+    extents = (
+        bounds.xmin,
+        bounds.xmax,
+        bounds.ymin,
+        bounds.ymax,
+        bounds.zmin,
+        bounds.zmax,
+    )
+
+    meshes = []
+    for source in (vtkCubeSource(), vtkOutlineSource()):
+        source.SetBounds(*extents)
+        source.Update()
+
+        data = vtkPolyData()
+        data.ShallowCopy(source.GetOutput())
+        meshes.append(data)
+
+    return tuple(meshes)
+
+
+def part_priority(bounds, translation, camera_position=None):
+    """
+    Works out how soon a part should be tessellated. Parts that look larger come
+    first, which is their size compared to their distance from the camera, or
+    just their size when there is no camera. The rotation of the part is not
+    taken into account, since this only needs to be roughly right.
+    """
+
+    size = bounds.DiagonalLength
+
+    if camera_position is None:
+        return size
+
+    center = bounds.center.toTuple()
+    center = tuple(c + t for c, t in zip(center, translation))
+
+    return size / max(dist(center, camera_position), size, 1e-9)
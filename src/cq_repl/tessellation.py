@@ -0,0 +1,112 @@
+import io
+
+import numpy as np
+
+from vtkmodules.vtkCommonCore import vtkPoints
+from vtkmodules.vtkCommonDataModel import vtkPolyData
+from vtkmodules.util.numpy_support import vtk_to_numpy
+
+from cq_repl.mesh_cache import polydata_to_arrays, polydata_from_arrays
+from cq_repl.timing import timed
+
+
+def mesh_shape(shape, tolerance, angular_tolerance):
+    """
+    Tessellates a shape and splits the result into separate face and edge meshes.
+    """
+
+    with timed("tessellation"):
+        data = shape.toVtkPolyData(tolerance, angular_tolerance)
+
+    with timed("extraction"):
+        return split_faces_and_edges(data)
+
+
+def split_faces_and_edges(data):
+    """
+    Splits the output of toVtkPolyData into a mesh of the faces and a mesh of the edges.
+    The tessellator already keeps the triangles, lines and vertices in separate cell
+    arrays, so the face mesh shares them and the points with the original mesh. Only
+    the points used by the edges are copied, in one NumPy pass.
+    """
+
+    points = data.GetPoints()
+    if points is None:
+        points = vtkPoints()
+
+    # Faces reuse the points, normals and triangles without copying them
+    data_faces = vtkPolyData()
+    data_faces.SetPoints(points)
+    data_faces.SetPolys(data.GetPolys())
+
+    normals = data.GetPointData().GetArray("Normals")
+    if normals is not None:
+        data_faces.GetPointData().SetNormals(normals)
+
+    # Edges only need their own points, which are a small part of the mesh
+    edge_cells = [("verts", data.GetVerts()), ("lines", data.GetLines())]
+    connectivity = [
+        vtk_to_numpy(cells.GetConnectivityArray()) for _, cells in edge_cells
+    ]
+
+    used = np.zeros(points.GetNumberOfPoints(), dtype=bool)
+    for ids in connectivity:
+        used[ids] = True
+
+    # Maps the original point ids to the ids in the edge mesh
+    new_ids = np.cumsum(used) - 1
+
+    arrays = {"points": vtk_to_numpy(points.GetData()).reshape(-1, 3)[used]}
+    for (kind, cells), ids in zip(edge_cells, connectivity):
+        if cells.GetNumberOfCells() > 0:
+            arrays[kind + "_offsets"] = vtk_to_numpy(cells.GetOffsetsArray())
+            arrays[kind + "_connectivity"] = new_ids[ids]
+
+    data_edges = polydata_from_arrays(arrays)
+
+    return data_faces, data_edges
+
+
+def shape_to_bytes(shape):
+    """
+    Serializes a shape to the binary BRep format so it can be sent to another process.
+    """
+
+    # OCP is imported when it is needed, so that the REPL can start before it has loaded
+    from OCP.BinTools import BinTools, BinTools_FormatVersion_CURRENT
+
+    stream = io.BytesIO()
+    BinTools.Write_s(
+        shape.wrapped, stream, False, False, BinTools_FormatVersion_CURRENT
+    )
+
+    return stream.getvalue()
+
+
+def shape_from_bytes(data):
+    """
+    Restores a shape that was serialized with shape_to_bytes.
+    """
+
+    import cadquery as cq
+    from OCP.BinTools import BinTools
+    from OCP.TopoDS import TopoDS_Shape
+
+    shape = TopoDS_Shape()
+    BinTools.Read_s(shape, io.BytesIO(data))
+
+    return cq.Shape.cast(shape)
+
+
+def tessellate_bytes(data, tolerance, angular_tolerance):
+    """
+    Runs in a tessellation pool process. Takes a serialized shape and returns its
+    face and edge meshes as flat arrays, so that only the VTK objects need to be
+    built in the REPL process.
+    """
+
+    data_faces, data_edges = mesh_shape(
+        shape_from_bytes(data), tolerance, angular_tolerance
+    )
+
+    return polydata_to_arrays(data_faces), polydata_to_arrays(data_edges)
@@ -0,0 +1,44 @@
+import time
+from contextlib import contextmanager
+
+# Total time in seconds spent in each stage since the times were last cleared
+stage_times = {}
+
+# Total time in seconds spent in each stage over the whole session
+session_times = {}
+
+# Time spent in stages nested inside each of the stages that are running
+_nested_times = []
+
+
+def add_times(times):
+    """
+    Adds the stage times from another process or run to the current and session totals.
+    """
+
+    for stage, seconds in times.items():
+        stage_times[stage] = stage_times.get(stage, 0.0) + seconds
+        session_times[stage] = session_times.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage):
+    """
+    Adds the time spent in the body of a with block to the total for a stage.
+    Time spent in stages nested inside the block is only counted for the inner
+    stage, so the stage times add up to the total time.
+    """
+
+    start = time.perf_counter()
+    _nested_times.append(0.0)
+
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        nested = _nested_times.pop()
+
+        if _nested_times:
+            _nested_times[-1] += elapsed
+
+        add_times({stage: elapsed - nested})
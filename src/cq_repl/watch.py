@@ -0,0 +1,106 @@
+import os
+import ast
+import time
+import hashlib
+
+
+def split_statements(source):
+    """
+    Splits the source of a file into its top-level statements. Each statement
+    includes its decorators, and statements that share a line are kept together.
+    """
+
+    tree = ast.parse(source)
+    lines = source.splitlines(keepends=True)
+
+    ranges = []
+    for node in tree.body:
+        start = min(
+            [node.lineno]
+            + [decorator.lineno for decorator in getattr(node, "decorator_list", [])]
+        )
+
+        # Statements separated by semicolons are run together
+        if ranges and start <= ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], node.end_lineno)
+        else:
+            ranges.append([start, node.end_lineno])
+
+    # A trailing blank line lets compound statements like def and class compile on their own
+    return ["".join(lines[start - 1 : end]).rstrip() + "\n\n" for start, end in ranges]
+
+
+class fileWatcher:
+    """
+    Watches a model file and works out which of its top-level statements need to be
+    run again when it is saved. Statements are compared by a hash of their source,
+    so everything from the first changed statement onwards is run again, and the
+    unchanged statements before it are not.
+    """
+
+    def __init__(self, path, interval=0.2):
+        self.path = path
+        self.interval = interval
+        self.mtime = None
+        self.last_check = 0.0
+        self.hashes = []
+
+    def poll(self):
+        """
+        Checks whether the file has been saved since it was last run. Returns the
+        index of the first statement to run and the statements from there on, or
+        None if nothing needs to run.
+        """
+
+        now = time.monotonic()
+        if now - self.last_check < self.interval:
+            return None
+        self.last_check = now
+
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+        if mtime == self.mtime:
+            return None
+        self.mtime = mtime
+
+        try:
+            with open(self.path) as model_file:
+                statements = split_statements(model_file.read())
+        except (OSError, UnicodeDecodeError) as err:
+            print(f"Could not read {self.path}: {err}")
+            return None
+        except SyntaxError as err:
+            # The file is probably only half edited, so wait for the next save
+            print(f"{self.path}, line {err.lineno}: {err.msg}")
+            return None
+
+        hashes = [
+            hashlib.sha1(statement.encode()).hexdigest() for statement in statements
+        ]
+
+        # Skip the statements that are the same as the last time the file was run
+        start = 0
+        while (
+            start < len(hashes)
+            and start < len(self.hashes)
+            and hashes[start] == self.hashes[start]
+        ):
+            start += 1
+
+        self.hashes = hashes
+
+        if start == len(hashes):
+            return None
+
+        return start, statements[start:]
+
+    def failed(self, index):
+        """
+        Marks a statement as not having run, so that it and the statements after it
+        are run again on the next save even if they have not changed.
+        """
+
+        del self.hashes[index:]
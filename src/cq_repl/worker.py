@@ -0,0 +1,239 @@
+import os
+import queue
+import atexit
+import signal
+import traceback
+import multiprocessing
+
+from cq_repl.timing import stage_times
+from cq_repl.dependencies import statement_names
+
+
+def evaluation_worker(requests, results, cancel_generation, settings):
+    """
+    Runs in a separate process and executes the user's statements there, so that
+    long running CadQuery operations and tessellation do not block the 3D viewer.
+    Finished meshes are sent back to the REPL through the results queue.
+    """
+
+    # The REPL forwards Ctrl-C to this process itself, so take it out of the terminal's process group
+    os.setpgrp()
+
+    # A cancel that arrives while starting up is handled by the cancel generation instead
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from cq_repl import main as repl
+
+    repl.mesh_sink = results
+    repl.apply_settings(settings)
+
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    while True:
+        try:
+            request = requests.get()
+
+            # Statements that were queued before the user cancelled are dropped
+            if request[0] == "run" and request[2] < cancel_generation.value:
+                results.put(("done",))
+                continue
+
+            if request[0] == "run":
+                stage_times.clear()
+
+                try:
+                    repl.run_statement(request[1], request[3])
+                except KeyboardInterrupt:
+                    print("Evaluation cancelled")
+                    print(">>> ", end="", flush=True)
+                except Exception:
+                    traceback.print_exc()
+                    print(">>> ", end="", flush=True)
+
+                    # Socket clients get the error in their reply
+                    results.put(("error", traceback.format_exc()))
+                finally:
+                    # Let the REPL know where the time went before it counts the statement as done
+                    results.put(("stats", dict(stage_times)))
+
+                    # The REPL keeps waiting for the parts that are still shown as boxes
+                    results.put(("streaming", len(repl.streaming)))
+                    results.put(("refining", len(repl.refinements)))
+                    results.put(("done",))
+            elif request[0] == "clear":
+                repl.display_objects.clear()
+            elif request[0] == "cache":
+                repl.print_cache_stats()
+                print(">>> ", end="", flush=True)
+            elif request[0] == "tolerance":
+                repl.set_tolerances(request[1])
+                print(">>> ", end="", flush=True)
+            elif request[0] == "undo":
+                repl.undo_statements(request[1])
+                print(">>> ", end="", flush=True)
+            elif request[0] == "checkpoint":
+                repl.save_checkpoint()
+            elif request[0] == "invalidate":
+                repl.invalidate_results(request[1])
+                print(">>> ", end="", flush=True)
+            elif request[0] == "mem":
+                repl.print_memory()
+                print(">>> ", end="", flush=True)
+            elif request[0] == "hide":
+                repl.hide_objects(request[1])
+            elif request[0] == "show":
+                repl.show_objects(request[1], request[2])
+            elif request[0] == "remove":
+                repl.remove_objects(request[1])
+
+            # Use the idle time to tessellate the parts that are shown as boxes
+            while requests.empty() and repl.stream_parts(repl.stream_budget):
+                results.put(("streaming", len(repl.streaming)))
+
+            # and then to swap in fine meshes for the coarse ones
+            while requests.empty() and repl.refine_next():
+                results.put(("refining", len(repl.refinements)))
+
+            repl.enforce_memory_budget()
+        except KeyboardInterrupt:
+            # A cancel request arrived after the statement had already finished
+            pass
+
+
+class backgroundEvaluator:
+    """
+    Keeps track of the worker process that evaluates statements in the background.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.start()
+
+        # The worker is not a daemon so that it can start its own tessellation pool
+        atexit.register(self.stop)
+
+    def start(self):
+        """
+        Starts a fresh worker process with an empty namespace.
+        """
+
+        context = multiprocessing.get_context("spawn")
+
+        self.requests = context.Queue()
+        self.results = context.Queue()
+        self.cancel_generation = context.Value("i", 0)
+        self.pending = 0
+        self.cancelling = False
+
+        # Assembly parts that the worker is still showing as boxes, and objects it
+        # is still showing with coarse meshes
+        self.streaming = 0
+        self.refining = 0
+
+        # Names that the statements sent to the worker assign, so that the REPL can
+        # tell a variable called stats or undo from the command
+        self.assigned = set()
+
+        self.process = context.Process(
+            target=evaluation_worker,
+            args=(self.requests, self.results, self.cancel_generation, self.settings),
+        )
+        self.process.start()
+
+    @property
+    def busy(self):
+        """
+        Whether the worker still has statements to evaluate.
+        """
+
+        return self.pending > 0
+
+    def submit(self, line, rerun=False):
+        """
+        Queues a complete statement to be run by the worker.
+        """
+
+        names = statement_names(line, {})
+        if names is not None:
+            self.assigned |= names[1]
+
+        self.pending += 1
+        self.requests.put(("run", line, self.cancel_generation.value, rerun))
+
+    def send(self, *request):
+        """
+        Passes a REPL command other than a statement on to the worker.
+        """
+
+        self.requests.put(request)
+
+    def cancel(self):
+        """
+        Interrupts the statement that is running and drops any that are queued.
+        A second cancel before the worker responds restarts the worker, which loses
+        the interpreter state.
+        """
+
+        if not self.busy:
+            return
+
+        if self.cancelling:
+            print("The worker did not respond, restarting it with an empty namespace")
+
+            self.process.terminate()
+            self.process.join()
+            self.start()
+
+            return
+
+        print("Cancelling...")
+
+        self.cancelling = True
+        with self.cancel_generation.get_lock():
+            self.cancel_generation.value += 1
+        os.kill(self.process.pid, signal.SIGINT)
+
+    def drain(self):
+        """
+        Collects all of the display updates the worker has finished so far.
+        """
+
+        updates = []
+
+        # Start over if the worker has died, since its statements will never finish
+        if self.busy and not self.process.is_alive():
+            print(
+                "The worker process stopped unexpectedly, restarting it with an empty namespace"
+            )
+
+            self.start()
+
+            return updates
+
+        while True:
+            try:
+                message = self.results.get_nowait()
+            except queue.Empty:
+                break
+
+            if message[0] == "streaming":
+                self.streaming = message[1]
+            elif message[0] == "refining":
+                self.refining = message[1]
+            elif message[0] == "done":
+                self.pending -= 1
+
+                if self.pending == 0:
+                    self.cancelling = False
+            else:
+                updates.append(message)
+
+        return updates
+
+    def stop(self):
+        """
+        Shuts the worker process down.
+        """
+
+        self.process.terminate()
+        self.process.join()
@@ -0,0 +1,98 @@
+import queue
+import time
+
+import pytest
+
+from cq_repl import main as repl
+from cq_repl.checkpoints import checkpointRing
+from cq_repl.dependencies import dependencyGraph
+from cq_repl.worker import backgroundEvaluator
+
+
+@pytest.fixture
+def settings(tmp_path):
+    """
+    The settings that the REPL starts with by default, without the on-disk
+    cache, and with the test's directory as the working directory.
+    """
+
+    return {
+        "cache_size": 512 * 1024 * 1024,
+        "memo_size": 128,
+        "checkpoints": 0,
+        "stream_budget": None,
+        "cache_dir": None,
+        "disk_cache_size": 2048 * 1024 * 1024,
+        "workers": 1,
+        "tolerance": 1e-3,
+        "angular_tolerance": 0.1,
+        "coarse_tolerance": None,
+        "coarse_angular_tolerance": 0.5,
+        "rerun_dependents": True,
+        "lod_triangles": 10000,
+        "memory_budget": None,
+        "working_dir": str(tmp_path),
+    }
+
+
+@pytest.fixture
+def worker(settings):
+    """
+    Starts a background worker process, and shuts it down after the test.
+    """
+
+    evaluator = backgroundEvaluator(settings)
+    yield evaluator
+    evaluator.stop()
+
+
+@pytest.fixture
+def run_in_worker(worker):
+    """
+    Runs statements in the background worker, and returns the updates it sent
+    back once it has finished with them.
+    """
+
+    def run(*statements, timeout=60):
+        for statement in statements:
+            worker.submit(statement)
+
+        updates = []
+        deadline = time.monotonic() + timeout
+        while worker.busy:
+            assert time.monotonic() < deadline, "The worker did not finish in time"
+
+            updates += worker.drain()
+            time.sleep(0.01)
+
+        return updates
+
+    return run
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    """
+    Sets the REPL up the way the background worker does, so that statements can
+    be run without a window, and returns the queue that the meshes and other
+    display updates are sent to. The state of the REPL is put back afterwards.
+    """
+
+    updates = queue.Queue()
+
+    monkeypatch.setattr(repl, "mesh_sink", updates)
+    monkeypatch.setattr(repl, "display_objects", {})
+    monkeypatch.setattr(repl, "assembly_parts", {})
+    monkeypatch.setattr(repl, "dependency_graph", dependencyGraph())
+    monkeypatch.setattr(repl, "checkpoints", checkpointRing())
+    monkeypatch.setattr(
+        repl,
+        "user_namespace",
+        {
+            "__name__": "__main__",
+            "show_object": repl.show_object,
+            "memoize": repl.memoize,
+        },
+    )
+
+    return updates
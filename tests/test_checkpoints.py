@@ -0,0 +1,150 @@
+import cadquery as cq
+import pytest
+
+from cq_repl import main as repl
+from cq_repl.checkpoints import checkpointRing, copy_value
+
+
+def box_width():
+    """
+    Measures the box that the statements in the REPL tests build.
+    """
+
+    return repl.user_namespace["box"].val().BoundingBox().xlen
+
+
+def test_copy_value_shares_shapes():
+    box = cq.Workplane().box(1, 1, 1)
+    copied = copy_value(box)
+
+    assert copied is not box
+    assert copied.objects is not box.objects
+    assert copied.objects == box.objects
+
+    nested = [[1], 2]
+    copied = copy_value(nested)
+
+    assert copied == nested and copied is not nested
+    assert copied[0] is nested[0]
+
+
+def test_assigned_names_are_restored():
+    namespace = {"a": 1}
+    ring = checkpointRing(5)
+
+    ring.save({}, [])
+    ring.keep(namespace, {"a", "b"}, set())
+    namespace.update(a=2, b=3)
+
+    ring.restore(namespace, 1)
+
+    assert namespace == {"a": 1}
+    assert len(ring) == 0
+
+
+def test_objects_changed_in_place_are_copied():
+    namespace = {"parts": [1]}
+    ring = checkpointRing(5)
+
+    ring.save({}, [])
+    ring.keep(namespace, set(), {"parts"})
+    namespace["parts"].append(2)
+
+    ring.restore(namespace, 1)
+
+    assert namespace["parts"] == [1]
+
+
+def test_names_keep_their_oldest_value_in_a_checkpoint():
+    namespace = {"a": 1}
+    ring = checkpointRing(5)
+
+    ring.save({}, [])
+    ring.keep(namespace, {"a"}, set())
+    namespace["a"] = 2
+    ring.keep(namespace, {"a"}, set())
+    namespace["a"] = 3
+
+    ring.restore(namespace, 1)
+
+    assert namespace["a"] == 1
+
+
+def test_restore_goes_back_several_checkpoints():
+    namespace = {}
+    ring = checkpointRing(5)
+
+    for value in range(3):
+        ring.save({"view": {"value": value}}, [value])
+        ring.keep(namespace, {"a"}, set())
+        namespace["a"] = value
+
+    checkpoint = ring.restore(namespace, 2)
+
+    assert namespace == {"a": 0}
+    assert checkpoint["view"] == {"view": {"value": 1}}
+    assert checkpoint["records"] == [1]
+
+    # Asking for more than there are restores all of them
+    ring.restore(namespace, 10)
+    assert namespace == {}
+    assert ring.restore(namespace, 1) is None
+
+
+def test_oldest_checkpoints_are_dropped():
+    ring = checkpointRing(2)
+
+    for _ in range(3):
+        ring.save({}, [])
+
+    assert len(ring) == 2
+
+
+def test_disabled_ring_keeps_nothing():
+    namespace = {"a": 1}
+    ring = checkpointRing()
+
+    ring.save({}, [])
+    ring.keep(namespace, {"a"}, set())
+
+    assert not ring.enabled
+    assert len(ring) == 0
+
+
+def test_undo_restores_names_and_the_view(sink, monkeypatch):
+    monkeypatch.setattr(repl, "checkpoints", checkpointRing(5))
+
+    repl.run_statement("box = cq.Workplane().box(1, 1, 1)\n")
+    repl.run_statement("lid = cq.Workplane().box(1, 1, 0.1)\n")
+    repl.run_statement("box = cq.Workplane().box(2, 2, 2)\n")
+    sink.queue.clear()
+
+    repl.undo_statements(2)
+
+    assert "lid" not in repl.user_namespace
+    assert set(repl.display_objects) == {"box"}
+    assert box_width() == pytest.approx(1, abs=1e-3)
+    assert ("remove", "lid") in sink.queue
+
+
+def test_undo_includes_statements_that_were_run_again(sink, monkeypatch):
+    monkeypatch.setattr(repl, "checkpoints", checkpointRing(5))
+
+    repl.run_statement("width = 1\n")
+    repl.run_statement("box = cq.Workplane().box(width, 1, 1)\n")
+    repl.run_statement("width = 3\n")
+
+    assert box_width() == pytest.approx(3, abs=1e-3)
+
+    repl.undo_statements(1)
+
+    assert repl.user_namespace["width"] == 1
+    assert box_width() == pytest.approx(1, abs=1e-3)
+
+
+def test_undo_without_checkpoints(sink, capsys):
+    repl.run_statement("width = 1\n")
+    repl.undo_statements(1)
+
+    assert repl.user_namespace["width"] == 1
+    assert "Checkpoints are off" in capsys.readouterr().out
@@ -0,0 +1,160 @@
+from math import pi
+
+import numpy as np
+from vtkmodules.util.numpy_support import vtk_to_numpy
+from vtkmodules.vtkFiltersSources import vtkCubeSource, vtkOutlineSource
+from vtkmodules.vtkRenderingCore import vtkActor
+
+from cq_repl.composite import compositeScene, place_mesh
+
+
+def mesh(source):
+    """
+    Gets the output of a VTK source.
+    """
+
+    source.Update()
+
+    return source.GetOutput()
+
+
+def display_object(**attributes):
+    """
+    Describes a unit cube the way the REPL does for each object it displays.
+    """
+
+    object = {
+        "faces": mesh(vtkCubeSource()),
+        "edges": mesh(vtkOutlineSource()),
+        "color": (1.0, 0.0, 0.0, 1.0),
+        "translation": (0.0, 0.0, 0.0),
+        "rotation": (0.0, 0.0, 0.0),
+    }
+    object.update(attributes)
+
+    return object
+
+
+def points(data):
+    """
+    Gets the points of a mesh as a NumPy array.
+    """
+
+    return vtk_to_numpy(data.GetPoints().GetData())
+
+
+def test_place_mesh_matches_actors():
+    data = mesh(vtkCubeSource())
+    translation = (1.0, 2.0, 3.0)
+    rotation = (pi / 4, pi / 3, pi / 6)
+
+    placed = place_mesh(data, translation, rotation)
+
+    actor = vtkActor()
+    actor.SetPosition(*translation)
+    actor.SetOrientation(*np.degrees(rotation))
+    matrix = np.array(
+        [actor.GetMatrix().GetElement(i, j) for i in range(4) for j in range(4)]
+    )
+    matrix = matrix.reshape(4, 4)
+
+    expected = points(data) @ matrix[:3, :3].T + matrix[:3, 3]
+    assert np.allclose(points(placed), expected, atol=1e-5)
+
+    # The mesh itself is not moved
+    assert np.allclose(points(data).max(axis=0), 0.5)
+
+
+def test_unplaced_meshes_get_their_own_block_data():
+    data = mesh(vtkCubeSource())
+
+    placed = place_mesh(data, (0.0, 0.0, 0.0), (0.0, 0.0, 0.0))
+
+    assert placed is not data
+    assert np.shares_memory(points(placed), points(data))
+
+
+def test_objects_are_blocks():
+    scene = compositeScene()
+    display_objects = {"a": display_object(), "b": display_object()}
+
+    for name in display_objects:
+        scene.invalidate(name)
+    scene.sync(display_objects)
+
+    assert scene.count() == 2
+    assert scene.data["face"].GetNumberOfBlocks() == 2
+
+    block = scene.data["face"].GetBlock(scene.blocks["a"])
+    assert tuple(scene.attributes["face"].GetBlockColor(block)) == (1.0, 0.0, 0.0)
+
+
+def test_only_changed_blocks_are_built_again():
+    scene = compositeScene()
+    display_objects = {"a": display_object(), "b": display_object()}
+
+    for name in display_objects:
+        scene.invalidate(name)
+    scene.sync(display_objects)
+
+    blocks = {name: scene.data["face"].GetBlock(scene.blocks[name]) for name in "ab"}
+
+    # A change of color keeps the block
+    display_objects["a"]["color"] = (0.0, 1.0, 0.0, 0.5)
+    scene.invalidate("a")
+    scene.sync(display_objects)
+
+    block = scene.data["face"].GetBlock(scene.blocks["a"])
+    assert block is blocks["a"]
+    assert tuple(scene.attributes["face"].GetBlockColor(block)) == (0.0, 1.0, 0.0)
+    assert scene.attributes["face"].GetBlockOpacity(block) == 0.5
+
+    # Moving an object builds its block again
+    display_objects["a"]["translation"] = (5.0, 0.0, 0.0)
+    scene.invalidate("a")
+    scene.sync(display_objects)
+
+    block = scene.data["face"].GetBlock(scene.blocks["a"])
+    assert block is not blocks["a"]
+    assert np.allclose(points(block).min(axis=0), (4.5, -0.5, -0.5))
+    assert scene.data["face"].GetBlock(scene.blocks["b"]) is blocks["b"]
+
+
+def test_removed_blocks_are_reused():
+    scene = compositeScene()
+    display_objects = {"a": display_object(), "b": display_object()}
+
+    for name in display_objects:
+        scene.invalidate(name)
+    scene.sync(display_objects)
+
+    index = scene.blocks["a"]
+    del display_objects["a"]
+    scene.invalidate("a")
+    scene.sync(display_objects)
+
+    assert scene.count() == 1
+    assert scene.data["face"].GetBlock(index) is None
+
+    display_objects["c"] = display_object()
+    scene.invalidate("c")
+    scene.sync(display_objects)
+
+    assert scene.blocks["c"] == index
+    assert scene.data["face"].GetNumberOfBlocks() == 2
+
+
+def test_hidden_objects_and_clear():
+    scene = compositeScene()
+    display_objects = {"a": display_object(visible=False)}
+
+    scene.invalidate("a")
+    scene.sync(display_objects)
+
+    block = scene.data["face"].GetBlock(scene.blocks["a"])
+    assert not scene.attributes["face"].GetBlockVisibility(block)
+
+    scene.clear()
+
+    assert scene.count() == 0
+    assert scene.data["face"].GetNumberOfBlocks() == 0
@@ -0,0 +1,111 @@
+from cq_repl.dependencies import (
+    changed_names,
+    dependencyGraph,
+    snapshot,
+    statement_names,
+)
+
+
+def run(graph, namespace, source):
+    """
+    Runs a statement the way the REPL does, followed by the earlier statements
+    that need to run again, and returns the source of those statements.
+    """
+
+    reads, assigned, mutated = statement_names(source, namespace)
+    before = snapshot(namespace, assigned)
+
+    exec(source, namespace)
+
+    dependents = graph.record(
+        source, reads, assigned, mutated, changed_names(before, namespace) | mutated
+    )
+    for dependent in dependents:
+        exec(dependent, namespace)
+
+    return dependents
+
+
+def test_statement_names():
+    assert statement_names("b = a + f(c)\n", {}) == ({"a", "f", "c"}, {"b"}, set())
+    assert statement_names("box.objects['a'] = 1\n", {}) == ({"box"}, set(), {"box"},)
+    assert statement_names("parts.append(a)\n", {}) == (
+        {"parts", "a"},
+        set(),
+        {"parts"},
+    )
+
+
+def test_function_bodies_read_globals():
+    reads, assigned, _ = statement_names("def f():\n    return width * 2\n", {})
+
+    assert "width" in reads
+    assert assigned == {"f"}
+
+
+def test_dependents_run_again_transitively():
+    graph = dependencyGraph()
+    namespace = {}
+
+    for source in ["a = 1\n", "b = a + 1\n", "c = b * 2\n", "d = 5\n"]:
+        assert run(graph, namespace, source) == []
+
+    assert run(graph, namespace, "a = 2\n") == ["b = a + 1\n", "c = b * 2\n"]
+    assert namespace["c"] == 6
+
+
+def test_same_value_runs_nothing():
+    graph = dependencyGraph()
+    namespace = {}
+
+    run(graph, namespace, "a = 1\n")
+    run(graph, namespace, "b = a + 1\n")
+
+    assert run(graph, namespace, "a = 1\n") == []
+
+
+def test_reassigned_name_stops_the_change():
+    graph = dependencyGraph()
+    namespace = {}
+
+    for source in ["x = 1\n", "y = x\n", "y = 5\n", "z = y\n"]:
+        run(graph, namespace, source)
+
+    assert run(graph, namespace, "x = 2\n") == []
+    assert namespace["z"] == 5
+
+
+def test_mutations_are_replayed_on_a_fresh_object():
+    graph = dependencyGraph()
+    namespace = {}
+
+    for source in ["a = 1\n", "parts = []\n", "parts.append(a)\n", "n = len(parts)\n"]:
+        run(graph, namespace, source)
+
+    assert run(graph, namespace, "a = 2\n") == [
+        "parts = []\n",
+        "parts.append(a)\n",
+        "n = len(parts)\n",
+    ]
+    assert namespace["parts"] == [2]
+    assert namespace["n"] == 1
+
+
+def test_statements_without_effects_are_not_recorded():
+    graph = dependencyGraph()
+    namespace = {}
+
+    run(graph, namespace, "a = 1\n")
+    run(graph, namespace, "a + 1\n")
+
+    assert [record["source"] for record in graph.records] == ["a = 1\n"]
+
+
+def test_reassignment_moves_after_what_it_reads():
+    graph = dependencyGraph()
+    namespace = {}
+
+    for source in ["a = 1\n", "b = 2\n", "a = b + 1\n"]:
+        run(graph, namespace, source)
+
+    assert [record["source"] for record in graph.records] == ["b = 2\n", "a = b + 1\n"]
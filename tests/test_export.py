@@ -0,0 +1,236 @@
+import json
+import struct
+from math import degrees, pi
+
+import numpy as np
+import pytest
+from vtkmodules.vtkFiltersCore import vtkTriangleFilter
+from vtkmodules.vtkFiltersSources import vtkCubeSource
+from vtkmodules.vtkRenderingCore import vtkActor
+
+from cq_repl import export
+from cq_repl.export import (
+    placement_matrix,
+    scene_parts,
+    write_glb,
+    write_gltf,
+    write_ply,
+    write_stl,
+)
+
+
+def cube():
+    """
+    Creates a unit cube mesh, which is made of quads rather than triangles.
+    """
+
+    source = vtkCubeSource()
+    source.Update()
+
+    return source.GetOutput()
+
+
+def scene():
+    """
+    Creates the objects of a 3D view with two copies of the same mesh, one of
+    them moved and rotated, and objects that are not exported.
+    """
+
+    data = cube()
+
+    display_objects = {
+        "a": {
+            "faces": data,
+            "color": (1.0, 0.0, 0.0, 1.0),
+            "translation": (0.0, 0.0, 0.0),
+            "rotation": (0.0, 0.0, 0.0),
+        },
+        "b": {
+            "faces": data,
+            "color": (1.0, 0.0, 0.0, 1.0),
+            "translation": (10.0, 0.0, 0.0),
+            "rotation": (0.0, 0.0, pi / 2),
+        },
+        "hidden": {
+            "faces": cube(),
+            "color": (0.0, 1.0, 0.0, 1.0),
+            "translation": (0.0, 0.0, 0.0),
+            "rotation": (0.0, 0.0, 0.0),
+            "visible": False,
+        },
+        "loading": {
+            "faces": cube(),
+            "color": (0.0, 1.0, 0.0, 1.0),
+            "translation": (0.0, 0.0, 0.0),
+            "rotation": (0.0, 0.0, 0.0),
+            "pending": True,
+        },
+    }
+
+    return scene_parts(display_objects)
+
+
+def test_placement_matrix_matches_actors():
+    translation = (1.0, 2.0, 3.0)
+    rotation = (0.3, -0.7, 1.1)
+
+    actor = vtkActor()
+    actor.SetPosition(*translation)
+    actor.SetOrientation(*map(degrees, rotation))
+
+    expected = np.array(
+        [[actor.GetMatrix().GetElement(i, j) for j in range(4)] for i in range(4)]
+    )
+
+    np.testing.assert_allclose(placement_matrix(translation, rotation), expected)
+
+
+def test_scene_parts_skips_hidden_and_loading_objects():
+    parts, loading = scene()
+
+    assert [part["name"] for part in parts] == ["a", "b"]
+    assert parts[0]["key"] == parts[1]["key"]
+    assert loading == 1
+
+
+def test_write_stl(tmp_path):
+    parts, _ = scene()
+    path = tmp_path / "scene.stl"
+
+    write_stl(str(path), parts)
+
+    content = path.read_bytes()
+    (count,) = struct.unpack("<I", content[80:84])
+
+    # Each quad of the cubes is split into two triangles
+    assert count == 24
+    assert len(content) == 84 + 50 * count
+
+    records = np.frombuffer(
+        content[84:],
+        dtype=[
+            ("normal", "<f4", 3),
+            ("vertices", "<f4", (3, 3)),
+            ("attributes", "<u2"),
+        ],
+    )
+    np.testing.assert_allclose(np.linalg.norm(records["normal"], axis=1), 1, rtol=1e-6)
+
+    # The second cube was moved into place
+    second = records["vertices"][12:].reshape(-1, 3)
+    np.testing.assert_allclose(second.min(axis=0), [9.5, -0.5, -0.5], atol=1e-6)
+    np.testing.assert_allclose(second.max(axis=0), [10.5, 0.5, 0.5], atol=1e-6)
+
+
+def test_write_ply(tmp_path):
+    parts, _ = scene()
+    path = tmp_path / "scene.ply"
+
+    write_ply(str(path), parts)
+
+    content = path.read_bytes()
+    header, body = content.split(b"end_header\n")
+    header = header.decode("ascii")
+
+    assert "element vertex 48" in header
+    assert "element face 24" in header
+
+    vertices = np.frombuffer(
+        body[: 48 * 16], dtype=[("position", "<f4", 3), ("color", "u1", 4)]
+    )
+    faces = np.frombuffer(
+        body[48 * 16 :], dtype=[("count", "u1"), ("indices", "<u4", 3)]
+    )
+
+    assert (vertices["color"] == [255, 0, 0, 255]).all()
+    assert (faces["count"] == 3).all()
+
+    # The faces of the second cube refer to its own vertices
+    assert faces["indices"][:12].max() < 24
+    assert faces["indices"][12:].min() >= 24
+
+
+def test_write_gltf_shares_repeated_meshes(tmp_path):
+    parts, _ = scene()
+    path = tmp_path / "scene.gltf"
+
+    write_gltf(str(path), parts)
+
+    document = json.loads(path.read_text())
+    buffer = document["buffers"][0]
+
+    assert buffer["uri"] == "scene.bin"
+    assert (tmp_path / "scene.bin").stat().st_size == buffer["byteLength"]
+
+    assert len(document["meshes"]) == 1
+    assert len(document["materials"]) == 1
+    assert [node.get("mesh") for node in document["nodes"][1:]] == [0, 0]
+
+    # The matrices are stored column by column
+    matrix = np.array(document["nodes"][2]["matrix"]).reshape(4, 4).T
+    np.testing.assert_allclose(matrix, placement_matrix((10, 0, 0), (0, 0, pi / 2)))
+
+    position = document["accessors"][
+        document["meshes"][0]["primitives"][0]["attributes"]["POSITION"]
+    ]
+    assert position["count"] == 24
+    assert position["min"] == [-0.5, -0.5, -0.5]
+
+
+def test_write_glb(tmp_path):
+    parts, _ = scene()
+    path = tmp_path / "scene.glb"
+
+    write_glb(str(path), parts)
+
+    content = path.read_bytes()
+    magic, version, length = struct.unpack("<4sII", content[:12])
+    text_length, text_type = struct.unpack("<I4s", content[12:20])
+
+    assert (magic, version, length) == (b"glTF", 2, len(content))
+    assert text_type == b"JSON"
+    assert text_length % 4 == 0
+
+    document = json.loads(content[20 : 20 + text_length])
+    bin_length, bin_type = struct.unpack(
+        "<I4s", content[20 + text_length : 28 + text_length]
+    )
+
+    assert bin_type == b"BIN\0"
+    assert bin_length == document["buffers"][0]["byteLength"]
+    assert len(content) == 28 + text_length + bin_length
+
+
+@pytest.mark.parametrize("extension", [".stl", ".ply", ".gltf", ".glb"])
+@pytest.mark.parametrize("triangulate", [False, True])
+def test_chunks_do_not_change_the_file(tmp_path, monkeypatch, extension, triangulate):
+    parts, _ = scene()
+
+    # Tessellated shapes are made of triangles, which are written without fans
+    if triangulate:
+        triangles = vtkTriangleFilter()
+        triangles.SetInputData(cube())
+        triangles.Update()
+
+        parts = scene_parts(
+            {
+                "a": {
+                    "faces": triangles.GetOutput(),
+                    "color": (1.0, 0.0, 0.0, 1.0),
+                    "translation": (1.0, 2.0, 3.0),
+                    "rotation": (0.0, pi / 2, 0.0),
+                }
+            }
+        )[0]
+
+    whole = tmp_path / "whole"
+    chunked = tmp_path / "chunked"
+    whole.mkdir()
+    chunked.mkdir()
+
+    export.writers[extension](str(whole / f"scene{extension}"), parts)
+    monkeypatch.setattr(export, "chunk_triangles", 5)
+    export.writers[extension](str(chunked / f"scene{extension}"), parts)
+
+    for path in whole.iterdir():
+        assert path.read_bytes() == (chunked / path.name).read_bytes()
@@ -0,0 +1,167 @@
+import cadquery as cq
+
+from cq_repl.memo import code_hash, keyBuilder, resultCache, uncacheableValue
+
+
+def define(source, namespace=None):
+    """
+    Runs source in a namespace of its own, like the REPL runs the user's code,
+    and returns the namespace.
+    """
+
+    namespace = {} if namespace is None else namespace
+    exec(compile(source, "<input>", "exec"), namespace)
+
+    return namespace
+
+
+def test_plain_values_are_keyed_by_type():
+    builder = keyBuilder({})
+
+    assert builder.value_key(1) == builder.value_key(1)
+    assert builder.value_key(1) != builder.value_key(True)
+    assert builder.value_key([1, 2]) != builder.value_key((1, 2))
+    assert builder.value_key({"a": 1.0}) == builder.value_key({"a": 1.0})
+
+
+def test_objects_that_can_change_are_not_keyed():
+    builder = keyBuilder({})
+
+    try:
+        builder.value_key(cq.Assembly())
+    except uncacheableValue as error:
+        assert str(error) == "Assembly"
+    else:
+        assert False
+
+
+def test_equal_shapes_have_equal_keys():
+    builder = keyBuilder({})
+
+    first = builder.value_key(cq.Workplane().box(1, 2, 3))
+    second = builder.value_key(cq.Workplane().box(1, 2, 3))
+    other = builder.value_key(cq.Workplane().box(1, 2, 4))
+
+    assert first == second
+    assert first != other
+
+
+def test_globals_of_helpers_are_part_of_the_key():
+    namespace = define(
+        "size = 1\n"
+        "def helper():\n"
+        "    return size\n"
+        "def make():\n"
+        "    return helper()\n"
+    )
+
+    first = keyBuilder(namespace).function_key(namespace["make"])
+    namespace["size"] = 2
+    second = keyBuilder(namespace).function_key(namespace["make"])
+
+    assert first != second
+
+
+def test_repl_functions_are_keyed_by_code():
+    repl = define(
+        "state = object()\ndef show():\n    return state\n",
+        {"__name__": "cq_repl.main"},
+    )
+    namespace = define("def make():\n    return show()\n", {"show": repl["show"]})
+
+    # The REPL's state can not be keyed, so it must not be followed
+    key = keyBuilder(namespace).function_key(namespace["make"])
+
+    assert dict(key[6])["show"] == (
+        "function",
+        "cq_repl.main",
+        "show",
+        code_hash(repl["show"].__code__),
+    )
+
+
+def test_hits_return_a_copy_of_the_result():
+    cache = resultCache()
+    namespace = define("def make(size):\n    return [size]\n")
+    make = cache.memoize(namespace["make"])
+
+    first = make(1)
+    second = make(1)
+
+    assert second == first
+    assert second is not first
+    assert make(2) == [2]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_least_recently_used_results_are_dropped():
+    cache = resultCache(max_entries=2)
+    namespace = define("def make(size):\n    return [size]\n")
+    make = cache.memoize(namespace["make"])
+
+    first = make(1)
+    make(2)
+    make(1)
+    make(3)
+
+    assert len(cache.entries) == 2
+    assert make(1) == first
+    assert cache.stats()["misses"] == 3
+
+    make(2)
+    assert cache.stats()["misses"] == 4
+
+
+def test_hits_share_shapes_but_not_labels():
+    cache = resultCache()
+    namespace = define(
+        "def plate(size):\n    return cq.Workplane().box(size, size, 1)\n", {"cq": cq}
+    )
+    plate = cache.memoize(namespace["plate"])
+
+    p1 = plate(5)
+    p1.label = "p1"
+    p2 = plate(5)
+    p2.label = "p2"
+
+    assert p1.label == "p1"
+    assert p2.val() is p1.val()
+
+    parts = cache.memoize(
+        define("def parts():\n    return [plate(1)]\n", {"plate": plate})["parts"]
+    )
+
+    first = parts()
+    assert parts()[0] is not first[0]
+
+
+def test_invalidate_by_name():
+    cache = resultCache()
+    namespace = define(
+        "def make(size):\n    return [size]\ndef other(size):\n    return [size]\n"
+    )
+    make = cache.memoize(namespace["make"])
+    other = cache.memoize(namespace["other"])
+
+    make(1)
+    other(1)
+
+    assert cache.invalidate({"make"}) == 1
+    assert cache.invalidate() == 1
+    assert not cache.entries
+
+
+def test_uncacheable_calls_are_reported_once(capsys):
+    cache = resultCache()
+    namespace = define("def make(assy):\n    return [assy]\n")
+    make = cache.memoize(namespace["make"])
+
+    assy = cq.Assembly()
+    make(assy)
+    make(assy)
+
+    assert cache.stats()["uncached"] == 2
+    assert capsys.readouterr().out == (
+        "make is not being cached, since it uses a Assembly that can be changed in place\n"
+    )
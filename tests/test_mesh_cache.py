@@ -0,0 +1,170 @@
+import os
+
+import numpy as np
+from vtkmodules.vtkFiltersCore import vtkExtractEdges
+from vtkmodules.vtkFiltersSources import vtkSphereSource
+
+from cq_repl.mesh_cache import (
+    diskMeshCache,
+    meshCache,
+    polydata_from_arrays,
+    polydata_to_arrays,
+)
+
+
+def sphere(resolution=16):
+    """
+    Creates a mesh to store in the caches.
+    """
+
+    source = vtkSphereSource()
+    source.SetThetaResolution(resolution)
+    source.SetPhiResolution(resolution)
+    source.Update()
+
+    return source.GetOutput()
+
+
+def edges_of(faces):
+    """
+    Creates an edge mesh, which is made of lines rather than polygons.
+    """
+
+    extract = vtkExtractEdges()
+    extract.SetInputData(faces)
+    extract.Update()
+
+    return extract.GetOutput()
+
+
+def mesh_size(faces, edges):
+    return (faces.GetActualMemorySize() + edges.GetActualMemorySize()) * 1024
+
+
+def test_hits_and_misses():
+    cache = meshCache()
+    faces, edges = sphere(), sphere(8)
+
+    assert cache.get("a") is None
+    cache.put("a", faces, edges)
+
+    assert "a" in cache
+    assert cache.get("a") == (faces, edges)
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["bytes"] == mesh_size(faces, edges)
+
+
+def test_least_recently_used_meshes_are_evicted():
+    meshes = {key: (sphere(), sphere(8)) for key in "abc"}
+    size = mesh_size(*meshes["a"])
+
+    cache = meshCache(max_bytes=2 * size)
+    cache.put("a", *meshes["a"])
+    cache.put("b", *meshes["b"])
+    cache.get("a")
+    cache.put("c", *meshes["c"])
+
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.total_bytes == 2 * size
+
+
+def test_storing_a_key_again_replaces_it():
+    cache = meshCache()
+    small, large = (sphere(8), sphere(8)), (sphere(32), sphere(8))
+
+    cache.put("a", *small)
+    cache.put("a", *large)
+
+    assert cache.get("a") == large
+    assert cache.total_bytes == mesh_size(*large)
+
+
+def test_meshes_larger_than_the_budget_are_not_stored():
+    faces, edges = sphere(), sphere(8)
+
+    cache = meshCache(max_bytes=mesh_size(faces, edges) - 1)
+    cache.put("a", faces, edges)
+
+    assert "a" not in cache
+    assert cache.total_bytes == 0
+
+
+def test_remove_and_clear():
+    cache = meshCache()
+    cache.put("a", sphere(), sphere(8))
+    cache.put("b", sphere(), sphere(8))
+
+    cache.remove("a")
+    cache.remove("missing")
+    assert list(cache.entries) == ["b"]
+
+    cache.clear()
+    assert not cache.entries
+    assert cache.total_bytes == 0
+
+
+def test_arrays_round_trip():
+    faces = sphere()
+    edges = edges_of(faces)
+
+    for mesh in (faces, edges):
+        arrays = polydata_to_arrays(mesh)
+        rebuilt = polydata_from_arrays(arrays)
+
+        assert polydata_to_arrays(rebuilt).keys() == arrays.keys()
+        for name, array in polydata_to_arrays(rebuilt).items():
+            np.testing.assert_array_equal(array, arrays[name])
+
+    assert "normals" in polydata_to_arrays(faces)
+    assert "polys_offsets" in polydata_to_arrays(faces)
+    assert "lines_offsets" in polydata_to_arrays(edges)
+
+
+def test_disk_cache_round_trip(tmp_path):
+    faces = sphere()
+    face_arrays = polydata_to_arrays(faces)
+    edge_arrays = polydata_to_arrays(edges_of(faces))
+
+    cache = diskMeshCache(str(tmp_path), version="1")
+    assert cache.get("a") is None
+
+    cache.put("a", face_arrays, edge_arrays)
+
+    # A new session finds the meshes that an earlier one stored
+    loaded_faces, loaded_edges = diskMeshCache(str(tmp_path), version="1").get("a")
+    for loaded, arrays in ((loaded_faces, face_arrays), (loaded_edges, edge_arrays)):
+        assert loaded.keys() == arrays.keys()
+        for name, array in loaded.items():
+            assert isinstance(array, np.memmap)
+            np.testing.assert_array_equal(array, arrays[name])
+
+    rebuilt = polydata_from_arrays(loaded_faces)
+    assert rebuilt.GetNumberOfPolys() == faces.GetNumberOfPolys()
+
+    # Meshes stored by other library versions are not used
+    assert diskMeshCache(str(tmp_path), version="2").get("a") is None
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    face_arrays = polydata_to_arrays(sphere())
+    edge_arrays = polydata_to_arrays(edges_of(sphere()))
+
+    cache = diskMeshCache(str(tmp_path))
+    cache.put("a", face_arrays, edge_arrays)
+    size = cache.size()
+
+    cache.max_bytes = 2 * size
+    cache.put("b", face_arrays, edge_arrays)
+
+    # Entries are ordered by when they were last used, which a get updates
+    os.utime(cache.entry_path("a"), (1, 1))
+    os.utime(cache.entry_path("b"), (2, 2))
+    cache.get("a")
+
+    cache.put("c", face_arrays, edge_arrays)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["bytes"] == 2 * size
@@ -0,0 +1,129 @@
+import os
+import sys
+
+import pytest
+
+from cq_repl.reload import module_imports, moduleReloader
+
+
+def write(path, source, mtime):
+    """
+    Writes a module with a given mtime, so that edits are seen even when they
+    happen within the resolution of the file system's clock.
+    """
+
+    path.write_text(source)
+    os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def user_package(tmp_path, monkeypatch):
+    """
+    Creates a package of the user's own under the working directory, and forgets
+    the modules that the test imported from it afterwards.
+    """
+
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    package = tmp_path / "reload_parts"
+    package.mkdir()
+    write(package / "__init__.py", "", 1)
+    write(package / "sizes.py", "width = 1\n", 1)
+    write(package / "parts.py", "from .sizes import width\n\ndouble = width * 2\n", 1)
+    write(package / "other.py", "import math\n", 1)
+
+    yield package
+
+    for name in list(sys.modules):
+        if name.split(".")[0] == "reload_parts":
+            del sys.modules[name]
+
+
+def error_messages(updates):
+    return [update[1] for update in updates if update[0] == "error"]
+
+
+def test_module_imports():
+    source = "import os.path\nfrom . import sizes\nfrom ..shared import util\n"
+
+    assert module_imports("lib.parts.box", source, False) == {
+        "os.path",
+        "lib.parts",
+        "lib.parts.sizes",
+        "lib.shared",
+        "lib.shared.util",
+    }
+    assert module_imports("lib", "from .box import *\n", True) == {"lib.box"}
+    assert module_imports("lib", "def (\n", False) == set()
+
+
+def test_reload_order(tmp_path):
+    reloader = moduleReloader(str(tmp_path))
+    reloader.signatures = {name: None for name in "abcde"}
+    reloader.imports = {
+        "a": set(),
+        "b": {"a", "os"},
+        "c": {"b", "a"},
+        "d": set(),
+        "e": {"c"},
+    }
+
+    # Modules come after the modules they import, and unrelated ones are left alone
+    assert reloader.reload_order({"a"}) == ["a", "b", "c", "e"]
+    assert reloader.reload_order({"c"}) == ["c", "e"]
+    assert reloader.reload_order(set()) == []
+
+
+def test_reload_order_with_circular_imports(tmp_path):
+    reloader = moduleReloader(str(tmp_path))
+    reloader.signatures = {"a": None, "b": None}
+    reloader.imports = {"a": {"b"}, "b": {"a"}}
+
+    assert sorted(reloader.reload_order({"a"})) == ["a", "b"]
+
+
+def test_edited_modules_are_reloaded(user_package):
+    reloader = moduleReloader(str(user_package.parent))
+
+    import reload_parts.parts as parts
+
+    reloader.track()
+    assert "reload_parts.sizes" in reloader.signatures
+    assert "math" not in reloader.signatures
+
+    # Saving a module without changing it does not reload anything
+    write(user_package / "sizes.py", "width = 1\n", 2)
+    assert reloader.refresh() == []
+
+    write(user_package / "sizes.py", "width = 3\n", 3)
+
+    reloaded = [module.__name__ for module in reloader.refresh()]
+    assert reloaded == ["reload_parts.sizes", "reload_parts.parts"]
+    assert parts.double == 6
+
+
+def test_deleted_modules_are_forgotten(user_package):
+    reloader = moduleReloader(str(user_package.parent))
+
+    import reload_parts.other
+
+    reloader.track()
+    os.remove(user_package / "other.py")
+
+    assert reloader.refresh() == []
+    assert "reload_parts.other" not in reloader.signatures
+    assert "reload_parts.other" not in sys.modules
+
+
+def test_edited_modules_are_reloaded_in_the_worker(user_package, run_in_worker):
+    updates = run_in_worker(
+        "from reload_parts.parts import double\n", "assert double == 2\n"
+    )
+    assert error_messages(updates) == []
+
+    write(user_package / "sizes.py", "width = 5\n", 2)
+
+    updates = run_in_worker(
+        "from reload_parts.parts import double\n", "assert double == 10\n"
+    )
+    assert error_messages(updates) == []
@@ -0,0 +1,121 @@
+import queue
+
+import pytest
+
+from cq_repl import main as repl
+
+
+def sent(updates):
+    """
+    Collects the display updates that have been sent so far.
+    """
+
+    messages = []
+    while not updates.empty():
+        messages.append(updates.get())
+
+    return messages
+
+
+def test_statements_are_shown(sink):
+    repl.run_statement("box = cq.Workplane().box(1, 2, 3)\n")
+
+    assert repl.user_namespace["box"].label == "box"
+    assert [message[:2] for message in sent(sink)] == [
+        ("mesh", "box"),
+        ("attributes", "box"),
+    ]
+
+
+@pytest.mark.parametrize("rerun", [False, True])
+def test_assignments_without_spaces_are_shown(sink, rerun):
+    repl.run_statement("box=cq.Workplane().box(1, 2, 3)\n", rerun=rerun)
+    repl.run_statement("width=1\n", rerun=rerun)
+
+    assert repl.user_namespace["box"].label == "box"
+    assert [message[:2] for message in sent(sink)] == [
+        ("mesh", "box"),
+        ("attributes", "box"),
+    ]
+
+
+def test_user_names_do_not_change_settings(sink):
+    tolerance = repl.tolerance
+
+    repl.run_statement("tolerance = 0.5\n")
+    repl.run_statement("angular_tolerance = 1\n")
+
+    assert repl.user_namespace["tolerance"] == 0.5
+    assert repl.tolerance == tolerance
+    assert repl.angular_tolerance != 1
+
+
+def test_user_names_do_not_break_the_repl(sink):
+    for statement in [
+        "streaming = True\n",
+        "queue = []\n",
+        "time = 0\n",
+        "checkpoints = None\n",
+        "interacting = 1\n",
+    ]:
+        repl.run_statement(statement)
+
+    assert repl.stream_parts() is False
+    assert repl.queue.Empty is queue.Empty
+
+    repl.run_statement("box = cq.Workplane().box(1, 1, 1)\n")
+    assert "box" in repl.display_objects
+
+
+def test_memoized_results_keep_their_own_labels(sink):
+    repl.run_statement(
+        "@memoize\ndef plate(size):\n    return cq.Workplane().box(size, size, 1)\n\n"
+    )
+    repl.run_statement("p1 = plate(5)\n")
+    repl.run_statement("p2 = plate(5)\n")
+
+    assert repl.user_namespace["p1"].label == "p1"
+    assert repl.user_namespace["p2"].label == "p2"
+    assert set(repl.display_objects) == {"p1", "p2"}
+
+
+@pytest.mark.parametrize(
+    "line, pattern",
+    [
+        ("cache\n", repl.cache_command),
+        ("stats\n", repl.stats_command),
+        ("overlay\n", repl.overlay_command),
+        ("mem\n", repl.mem_command),
+        ("tolerance\n", repl.tolerance_command),
+        ("undo\n", repl.undo_command),
+    ],
+)
+def test_commands_are_run_as_code_once_the_name_is_defined(sink, line, pattern):
+    assert repl.is_command(line, pattern)
+
+    repl.run_statement(f"{line.split()[0]} = 2\n")
+
+    assert not repl.is_command(line, pattern)
+    assert not repl.replTimerCallback().handle_command(line)
+
+
+def test_commands_are_run_as_code_once_the_worker_defines_the_name(
+    sink, worker, monkeypatch
+):
+    monkeypatch.setattr(repl, "background_evaluator", worker)
+    assert repl.is_command("stats\n", repl.stats_command)
+
+    # The REPL knows about the names before the worker has run the statements
+    worker.submit("stats = {}\n")
+    worker.submit("mem, cache = 1, 2\n")
+
+    for name in ["stats", "mem", "cache"]:
+        assert not repl.is_command(f"{name}\n", getattr(repl, f"{name}_command"))
+
+    assert repl.is_command("overlay\n", repl.overlay_command)
+
+
+def test_command_patterns_do_not_match_statements():
+    assert not repl.stats_command.match("stats = 1\n")
+    assert not repl.mem_command.match("mem.clear()\n")
+    assert not repl.cache_command.match("cache[0]\n")
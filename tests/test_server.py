@@ -0,0 +1,126 @@
+import socket
+
+import pytest
+
+from cq_repl.client import connect, send_request
+from cq_repl.server import (
+    parse_address,
+    receive_message,
+    replServer,
+    send_message,
+)
+
+
+@pytest.fixture
+def server(tmp_path):
+    """
+    Starts a server on a Unix socket, and stops it after the test.
+    """
+
+    repl_server = replServer(str(tmp_path / "repl.sock"))
+    yield repl_server
+    repl_server.close()
+
+
+def test_parse_address():
+    assert parse_address("7878") == ("127.0.0.1", 7878)
+    assert parse_address("localhost:7878") == ("localhost", 7878)
+    assert parse_address("/tmp/cq-repl.sock") == "/tmp/cq-repl.sock"
+    assert parse_address("repl.sock") == "repl.sock"
+
+    # Paths that happen to end with a colon and digits are still paths
+    assert parse_address("/tmp/repl:1") == "/tmp/repl:1"
+
+
+def test_messages_are_framed():
+    left, right = socket.socketpair()
+
+    with left, right, right.makefile("rb") as stream:
+        send_message(left, {"code": "x = 1\n"})
+        send_message(left, [1, 2])
+
+        assert receive_message(stream) == {"code": "x = 1\n"}
+        assert receive_message(stream) == [1, 2]
+
+        left.shutdown(socket.SHUT_WR)
+        assert receive_message(stream) is None
+
+
+def test_requests_and_replies(server):
+    connection = connect(server.describe())
+
+    with connection, connection.makefile("rb") as stream:
+        send_message(connection, {"id": 1, "code": "x = 1\n"})
+
+        # The REPL runs the requests on its own thread and replies to them
+        client, request = server.requests.get(timeout=10)
+        assert request == {"id": 1, "code": "x = 1\n"}
+
+        client.send({"id": request["id"], "ok": True})
+        assert receive_message(stream) == {"id": 1, "ok": True}
+
+        # Requests that are not objects are answered straight away
+        reply = send_request(connection, stream, ["x = 1\n"])
+        assert reply == {"ok": False, "error": "Requests must be JSON objects"}
+        assert server.requests.empty()
+
+
+def test_tcp_server_on_loopback():
+    repl_server = replServer("127.0.0.1:0")
+
+    try:
+        host, port = repl_server.describe().split(":")
+        assert host == "127.0.0.1"
+
+        with connect(port) as connection:
+            send_message(connection, {"id": 1, "command": "stats"})
+
+            _, request = repl_server.requests.get(timeout=10)
+            assert request == {"id": 1, "command": "stats"}
+    finally:
+        repl_server.close()
+
+
+def test_other_hosts_are_refused():
+    with pytest.raises(ValueError):
+        replServer("0.0.0.0:7878")
+
+
+def test_other_files_are_left_alone(tmp_path):
+    path = tmp_path / "model.py"
+    path.write_text("x = 1\n")
+
+    with pytest.raises(ValueError):
+        replServer(str(path))
+
+    assert path.read_text() == "x = 1\n"
+
+
+def test_running_servers_are_left_alone(server):
+    with pytest.raises(ValueError):
+        replServer(server.address)
+
+    # The first server still works
+    with connect(server.address) as connection:
+        send_message(connection, {"id": 1, "command": "stats"})
+
+        assert server.requests.get(timeout=10)[1]["id"] == 1
+
+
+def test_stale_sockets_are_replaced(tmp_path):
+    path = str(tmp_path / "repl.sock")
+
+    # A socket that nothing listens on, like one left by a REPL that was killed
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+
+    repl_server = replServer(path)
+
+    try:
+        with connect(path) as connection:
+            send_message(connection, {"id": 1, "command": "stats"})
+
+            assert repl_server.requests.get(timeout=10)[1]["id"] == 1
+    finally:
+        repl_server.close()
@@ -0,0 +1,127 @@
+from cq_repl.statements import (
+    assignment_targets,
+    compile_statement,
+    is_statement,
+    statementAccumulator,
+)
+
+
+def feed(lines, idle_time=60.0):
+    """
+    Adds lines to an accumulator as if they were pasted, and returns the statements
+    that were completed, including the one left at the end of the input.
+    """
+
+    accumulator = statementAccumulator(idle_time)
+
+    ready = []
+    for line in lines:
+        ready += accumulator.add(line)
+
+    last = accumulator.flush(end_of_input=True)
+    if last is not None:
+        ready.append(last)
+
+    return ready
+
+
+def test_compile_statement_is_cached():
+    assert compile_statement("x = 1\n") is compile_statement("x = 1\n")
+    assert compile_statement("x = 1\n", "exec") is not compile_statement("x = 1\n")
+
+
+def test_is_statement():
+    assert is_statement("show = 1\n")
+    assert not is_statement("show box\n")
+
+
+def test_simple_statements_are_ready_at_once():
+    accumulator = statementAccumulator()
+
+    assert accumulator.add("x = 1\n") == ["x = 1\n"]
+    assert accumulator.add("y = x + 1\n") == ["y = x + 1\n"]
+    assert not accumulator
+
+
+def test_blank_lines_and_comments_are_skipped():
+    assert feed(["\n", "# a comment\n", "x = 1\n"]) == ["x = 1\n"]
+
+
+def test_strings_spanning_lines():
+    lines = ['text = """\n', "def f():\n", "\n", '"""\n']
+
+    assert feed(lines) == ["".join(lines)]
+
+
+def test_brackets_and_backslashes_continue_lines():
+    brackets = ["box = box(\n", "    1, 2,\n", "    3)\n"]
+    backslash = ["x = 1 + \\\n", "    2\n"]
+
+    assert feed(brackets + backslash) == ["".join(brackets), "".join(backslash)]
+
+
+def test_compound_block_ends_at_next_top_level_line():
+    accumulator = statementAccumulator(60.0)
+
+    assert accumulator.add("def f():\n") == []
+    assert accumulator.add("    return 1\n") == []
+    assert accumulator.add("x = f()\n") == ["def f():\n    return 1\n", "x = f()\n"]
+
+
+def test_blank_lines_inside_pasted_block():
+    lines = ["def f():\n", "    a = 1\n", "\n", "    return a\n"]
+
+    assert feed(lines) == ["".join(lines)]
+
+
+def test_decorators_wait_for_their_function():
+    lines = ["@decorator\n", "@other(1)\n", "def f():\n", "    pass\n"]
+
+    assert feed(lines + ["f()\n"]) == ["".join(lines), "f()\n"]
+
+
+def test_continuation_clauses_stay_in_block():
+    lines = [
+        "try:\n",
+        "    x = 1\n",
+        "except ValueError:\n",
+        "    x = 2\n",
+        "else:\n",
+        "    x = 3\n",
+        "finally:\n",
+        "    pass\n",
+    ]
+
+    assert feed(lines) == ["".join(lines)]
+
+
+def test_incomplete_block_is_not_flushed():
+    accumulator = statementAccumulator(0.0)
+
+    accumulator.add("for i in range(3):\n")
+
+    assert accumulator.flush(end_of_input=True) is None
+    assert accumulator
+
+
+def test_typed_block_ends_with_blank_line():
+    accumulator = statementAccumulator(0.0)
+
+    accumulator.add("if True:\n")
+    accumulator.add("    x = 1\n")
+    assert accumulator.flush() is None
+
+    accumulator.add("\n")
+    assert accumulator.flush() == "if True:\n    x = 1\n\n"
+
+
+def test_assignment_targets():
+    assert assignment_targets("x=1\n") == ("x",)
+    assert assignment_targets("box = cq.Workplane().box(1, 2, 3)\n") == ("box",)
+    assert assignment_targets("a = b = 1\n") == ("a", "b")
+    assert assignment_targets("a, (b, c) = parts\n") == ("a",)
+    assert assignment_targets("assy.objects['a'].loc = loc\n") == ()
+    assert assignment_targets("x += 1\n") == ()
+    assert assignment_targets("print(a == b)\n") == ()
+    assert assignment_targets("def f(x=1):\n    y = x\n") == ()
+    assert assignment_targets("x = (\n") == ()
@@ -0,0 +1,70 @@
+from collections import OrderedDict
+
+import cadquery as cq
+import numpy as np
+from vtkmodules.util.numpy_support import vtk_to_numpy
+
+from cq_repl import main as repl
+from cq_repl.streaming import part_priority, placeholder_meshes
+
+# An assembly with a small part and a part that is eight times larger
+assembly = """assy = (
+    cq.Assembly()
+    .add(cq.Workplane().box(1, 1, 1), name="small")
+    .add(cq.Workplane().box(2, 2, 2), name="large", loc=cq.Location((5, 0, 0)))
+)
+"""
+
+
+def test_placeholders_fill_the_bounds():
+    bounds = cq.Workplane().box(1, 2, 3).val().BoundingBox()
+
+    faces, edges = placeholder_meshes(bounds)
+
+    for data in (faces, edges):
+        points = vtk_to_numpy(data.GetPoints().GetData())
+        assert np.allclose(points.min(axis=0), (bounds.xmin, bounds.ymin, bounds.zmin))
+        assert np.allclose(points.max(axis=0), (bounds.xmax, bounds.ymax, bounds.zmax))
+
+    assert faces.GetNumberOfPolys() == 6
+    assert edges.GetNumberOfLines() == 12
+
+
+def test_larger_and_closer_parts_come_first():
+    small = cq.Workplane().box(1, 1, 1).val().BoundingBox()
+    large = cq.Workplane().box(2, 2, 2).val().BoundingBox()
+
+    assert part_priority(large, (0, 0, 0)) > part_priority(small, (0, 0, 0))
+
+    # A small part close to the camera looks larger than a large part far away
+    camera = (0, 0, 10)
+    assert part_priority(small, (0, 0, 8), camera) > part_priority(
+        large, (0, 0, -100), camera
+    )
+
+
+def test_assembly_parts_are_streamed(sink, monkeypatch):
+    monkeypatch.setattr(repl, "stream_budget", 0.0)
+    monkeypatch.setattr(repl, "streaming", OrderedDict())
+
+    repl.run_statement(assembly)
+
+    # Both parts are shown as boxes straight away, and the larger one is tessellated first
+    assert list(repl.streaming) == ["large", "small"]
+    assert all("pending" in repl.display_objects[name] for name in repl.streaming)
+    assert {message[1] for message in sink.queue if message[0] == "mesh"} == {
+        "small",
+        "large",
+    }
+
+    sink.queue.clear()
+
+    # The budget is used up by the first part
+    assert repl.stream_parts(0.0)
+    assert list(repl.streaming) == ["small"]
+    assert "pending" not in repl.display_objects["large"]
+    assert [message[1] for message in sink.queue if message[0] == "mesh"] == ["large"]
+
+    assert repl.stream_parts()
+    assert not repl.stream_parts()
+    assert not any("pending" in object for object in repl.display_objects.values())
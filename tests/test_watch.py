@@ -0,0 +1,100 @@
+import os
+
+from cq_repl.watch import fileWatcher, split_statements
+
+model = """\
+import functools
+
+@functools.lru_cache()
+def make(size):
+
+    return size * 2
+
+a = 1; b = 2
+box = make(
+    a + b,
+)
+"""
+
+
+def save(path, source, mtime):
+    """
+    Writes the file with a given mtime, so that saves are seen even when they
+    happen within the resolution of the file system's clock.
+    """
+
+    path.write_text(source)
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_split_statements():
+    assert split_statements(model) == [
+        "import functools\n\n",
+        "@functools.lru_cache()\ndef make(size):\n\n    return size * 2\n\n",
+        "a = 1; b = 2\n\n",
+        "box = make(\n    a + b,\n)\n\n",
+    ]
+
+
+def test_first_poll_runs_everything(tmp_path):
+    path = tmp_path / "model.py"
+    save(path, model, 1)
+
+    watcher = fileWatcher(str(path), interval=0)
+
+    assert watcher.poll() == (0, split_statements(model))
+    assert watcher.poll() is None
+
+
+def test_runs_from_first_changed_statement(tmp_path):
+    path = tmp_path / "model.py"
+    save(path, model, 1)
+
+    watcher = fileWatcher(str(path), interval=0)
+    watcher.poll()
+
+    save(path, model.replace("a = 1", "a = 3"), 2)
+
+    start, statements = watcher.poll()
+    assert start == 2
+    assert statements == split_statements(model.replace("a = 1", "a = 3"))[2:]
+
+
+def test_unchanged_save_runs_nothing(tmp_path):
+    path = tmp_path / "model.py"
+    save(path, model, 1)
+
+    watcher = fileWatcher(str(path), interval=0)
+    watcher.poll()
+
+    save(path, model, 2)
+
+    assert watcher.poll() is None
+
+
+def test_syntax_error_waits_for_next_save(tmp_path, capsys):
+    path = tmp_path / "model.py"
+    save(path, model, 1)
+
+    watcher = fileWatcher(str(path), interval=0)
+    watcher.poll()
+
+    save(path, model + "c = (\n", 2)
+    assert watcher.poll() is None
+    assert "line" in capsys.readouterr().out
+
+    save(path, model + "c = 3\n", 3)
+    assert watcher.poll() == (4, ["c = 3\n\n"])
+
+
+def test_failed_statement_runs_again(tmp_path):
+    path = tmp_path / "model.py"
+    save(path, model, 1)
+
+    watcher = fileWatcher(str(path), interval=0)
+    watcher.poll()
+    watcher.failed(3)
+
+    save(path, model, 2)
+
+    assert watcher.poll() == (3, split_statements(model)[3:])
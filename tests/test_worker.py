@@ -0,0 +1,87 @@
+import time
+
+import numpy as np
+
+from cq_repl.worker import backgroundEvaluator
+
+
+def meshes(updates):
+    """
+    Picks the face meshes out of the updates sent back by the worker, by name.
+    """
+
+    return {update[1]: update[2] for update in updates if update[0] == "mesh"}
+
+
+def errors(updates):
+    """
+    Picks the tracebacks of the statements that failed out of the updates.
+    """
+
+    return [update[1] for update in updates if update[0] == "error"]
+
+
+def test_meshes_are_sent_back(run_in_worker):
+    updates = run_in_worker("box = cq.Workplane().box(1, 2, 3)\n")
+
+    assert errors(updates) == []
+
+    points = meshes(updates)["box"]["points"]
+    assert np.allclose(points.max(axis=0) - points.min(axis=0), (1, 2, 3))
+
+    attributes = [update for update in updates if update[0] == "attributes"]
+    assert [update[1] for update in attributes] == ["box"]
+
+
+def test_namespace_is_kept_between_statements(run_in_worker):
+    updates = run_in_worker(
+        "size = 4\n", "box = cq.Workplane().box(size, size, size)\n"
+    )
+
+    points = meshes(updates)["box"]["points"]
+    assert np.allclose(points.max(axis=0) - points.min(axis=0), (4, 4, 4))
+
+
+def test_errors_are_reported(run_in_worker):
+    updates = run_in_worker("1 / 0\n", "box = cq.Workplane().box(1, 1, 1)\n")
+
+    assert len(errors(updates)) == 1
+    assert "ZeroDivisionError" in errors(updates)[0]
+
+    # The worker carries on with the next statement
+    assert "box" in meshes(updates)
+
+
+def test_settings_are_applied_in_the_worker(settings):
+    triangles = {}
+
+    for tolerance in [1e-3, 0.5]:
+        evaluator = backgroundEvaluator(
+            dict(settings, tolerance=tolerance, angular_tolerance=0.5)
+        )
+
+        try:
+            evaluator.submit("ball = cq.Workplane().sphere(5)\n")
+
+            updates = []
+            deadline = time.monotonic() + 60
+            while evaluator.busy:
+                assert time.monotonic() < deadline, "The worker did not finish in time"
+
+                updates += evaluator.drain()
+                time.sleep(0.01)
+
+            triangles[tolerance] = len(meshes(updates)["ball"]["polys_offsets"]) - 1
+        finally:
+            evaluator.stop()
+
+    assert triangles[0.5] < triangles[1e-3]
+
+
+def test_tolerance_command_is_run_in_the_worker(worker, run_in_worker):
+    before = meshes(run_in_worker("ball = cq.Workplane().sphere(5)\n"))["ball"]
+
+    worker.send("tolerance", ["0.5", "0.5"])
+    after = meshes(run_in_worker("ball = cq.Workplane().sphere(5)\n"))["ball"]
+
+    assert len(after["polys_offsets"]) < len(before["polys_offsets"])